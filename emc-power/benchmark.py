@@ -0,0 +1,45 @@
+import os
+import sys
+from emc_power.bench import STAGES, compare, load, run_suite, save
+
+# --- Настройки бенчмарка ---
+VERSIONS = ['v2', 'v3', 'v4', 'v5']   # Какие версии оптимизатора мерить
+BACKENDS = None                      # None - все бэкенды версии, или ['mna', 'session', 'ngspice']
+REPEAT = 20                          # Повторов на этап (берется медиана)
+OPTIMIZE = True                      # Мерить полную оптимизацию (самый долгий этап)
+RESULTS_PATH = 'benchmark_results.json'
+BASELINE_PATH = 'benchmark_baseline.json'   # Сохраненный эталон для поиска регрессий
+SAVE_BASELINE = False                # True - записать текущий прогон как новый эталон
+THRESHOLD = 0.25                     # Регрессия: этап медленнее эталона более чем на 25%
+
+if __name__ == '__main__':
+    here = os.path.dirname(os.path.abspath(__file__))
+    print(f"\n[BENCH] Версии: {', '.join(VERSIONS)}, повторов: {REPEAT}")
+    results = run_suite(here, VERSIONS, BACKENDS, REPEAT, OPTIMIZE)
+
+    print("\n" + "="*100)
+    print(f"{'Случай':<14} | " + " | ".join(f"{s:>13}" for s in STAGES) + " | вызовов")
+    print("-" * 100)
+    for case, r in results['results'].items():
+        if r['error']:
+            print(f"{case:<14} | ОШИБКА: {r['error']}")
+            continue
+        cells = [f"{r[s] * 1e3:>10.3f} ms" if r.get(s) is not None else f"{'-':>13}" for s in STAGES]
+        print(f"{case:<14} | " + " | ".join(cells) + f" | {r.get('sim_calls', '-')}")
+    print("="*100)
+
+    save(results, os.path.join(here, RESULTS_PATH))
+    print(f"Результаты: {RESULTS_PATH}")
+
+    baseline_path = os.path.join(here, BASELINE_PATH)
+    if SAVE_BASELINE:
+        save(results, baseline_path)
+        print(f"Эталон обновлен: {BASELINE_PATH}")
+    elif os.path.exists(baseline_path):
+        regressions = compare(results, load(baseline_path), THRESHOLD)
+        if regressions:
+            print(f"\nРЕГРЕССИИ относительно {BASELINE_PATH}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"Регрессий относительно {BASELINE_PATH} нет")
@@ -1,4 +1,3 @@
-import matplotlib.pyplot as plt
 import numpy as np  # Добавили импорт numpy
 from PySpice.Spice.Netlist import Circuit
 from PySpice.Unit import *
@@ -21,30 +20,30 @@ def create_pi_filter(L_val, C1_val, C2_val, R_load=50):
     
     return circuit
 
-# Параметры симуляции
-circuit = create_pi_filter(L_val=10, C1_val=0.1, C2_val=0.1)
-simulator = circuit.simulator(temperature=25, nominal_temperature=25)
+REPORT_PATH = 'filter_response.npz' # АЧХ фильтра (частоты + дБ)
+RENDER = 'background' # PNG из .npz: 'background' (отдельный процесс), 'sync' или None (только данные)
 
-# Лог частот от 10кГц до 100МГц
-analysis = simulator.ac(start_frequency=10@u_kHz, 
-                        stop_frequency=100@u_MHz, 
-                        number_of_points=100,  
-                        variation='dec')
+if __name__ == '__main__':
+    from emc_power.report import finish as finish_report, save_sweep
+    # Параметры симуляции
+    circuit = create_pi_filter(L_val=10, C1_val=0.1, C2_val=0.1)
+    simulator = circuit.simulator(temperature=25, nominal_temperature=25)
 
-# Визуализация
-plt.figure(figsize=(10, 6))
-# Считаем усиление (gain) в дБ относительно входного 1В
-# Используем комплексные значения для получения модуля через np.abs
-gain = 20 * np.log10(np.abs(analysis.n2))
+    # Лог частот от 10кГц до 100МГц
+    analysis = simulator.ac(start_frequency=10@u_kHz, 
+                            stop_frequency=100@u_MHz, 
+                            number_of_points=100,  
+                            variation='dec')
 
-plt.semilogx(analysis.frequency, gain)
-plt.axhline(y=-40, color='r', linestyle='--', label='Target -40dB') # Линия цели
-plt.grid(True, which="both", ls="-")
-plt.title("АЧХ П-образного фильтра (Simulation)")
-plt.xlabel("Частота (Гц)")
-plt.ylabel("Затухание (дБ)")
-plt.legend()
+    # Считаем усиление (gain) в дБ относительно входного 1В
+    # Используем комплексные значения для получения модуля через np.abs
+    gain = 20 * np.log10(np.abs(analysis.n2))
 
-# Сохраняем в файл, так как мы внутри Docker
-plt.savefig('/workspace/filter_response.png')
-print("Симуляция завершена. График сохранен в filter_response.png")
\ No newline at end of file
+    # Данные АЧХ в рабочий каталог (не в /workspace контейнера), PNG - отдельный этап
+    label = 'П-фильтр'
+    save_sweep(REPORT_PATH, np.array(analysis.frequency, dtype=float), {label: gain},
+               params=[10, 0.1, 0.1], target_db=-40,
+               title="АЧХ П-образного фильтра (Simulation)", xlabel="Частота (Гц)", ylabel="Затухание (дБ)", grid_alpha=1.0,
+               hlines=[{'y': -40, 'color': 'r', 'linestyle': '--', 'label': 'Target -40dB'}]) # Линия цели
+    png = finish_report(REPORT_PATH, RENDER)
+    print(f"Симуляция завершена. Данные АЧХ: {REPORT_PATH}" + (f", график: {png}" if png else ""))
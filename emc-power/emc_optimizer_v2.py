@@ -2,14 +2,17 @@ import os
 import sys
 import warnings
 import numpy as np
-import matplotlib.pyplot as plt
-from PySpice.Spice.Netlist import Circuit
-from PySpice.Unit import *
-from scipy.optimize import minimize
+from emc_power.objective import v2_objective_batch
+from emc_power.spice_session import spice_session
+from emc_power.cache import EvaluationCache
+from emc_power.watchdog import FAILURE_PENALTY, Watchdog, is_failure
+from emc_power.report import finish as finish_report, save_sweep
 
 # 1. Глушим ворнинги Python
 warnings.filterwarnings("ignore")
 
+Circuit = None # PySpice.Spice.Netlist.Circuit, грузится в simulate_filter
+
 # 2. Контекстный менеджер для очистки терминала от вывода NgSpice
 class SuppressOutput:
     def __enter__(self):
@@ -42,6 +45,14 @@ def get_closest_e24(value):
 def simulate_filter(params, target_freq_khz=150, full_scan=False):
     l_val, c1_val, c2_val = params
     if l_val <= 0 or c1_val <= 0 or c2_val <= 0: return 0
+    if BACKEND == 'session' and not full_scan:
+        # Прогретая сессия NgSpice: netlist не пересобирается, номиналы меняются через alter
+        return spice_session('v2').simulate(params, frequencies=target_freq_khz * 1e3)
+
+    global Circuit
+    if Circuit is None:  # PySpice грузится при первом прогоне NgSpice, а не при импорте скрипта
+        from PySpice.Spice.Netlist import Circuit
+    from PySpice.Unit import u_MHz, u_Ohm, u_V, u_kHz, u_mOhm, u_nH, u_uF, u_uH
 
     circuit = Circuit('EMC_Filter_Pro')
     circuit.SinusoidalVoltageSource('input', 'node_in', circuit.gnd, amplitude=1@u_V)
@@ -62,69 +73,84 @@ def simulate_filter(params, target_freq_khz=150, full_scan=False):
 
     circuit.R('load', 'n2', circuit.gnd, 50@u_Ohm)
 
-    try:
-        with SuppressOutput():
-            simulator = circuit.simulator()
-            if full_scan:
-                # Сканирование диапазона для графика
-                analysis = simulator.ac(start_frequency=10@u_kHz, stop_frequency=100@u_MHz, number_of_points=100, variation='dec')
-                return analysis
-            else:
-                # Точечный замер для оптимизатора
-                freq_hz = target_freq_khz * 1e3
-                analysis = simulator.ac(start_frequency=freq_hz, stop_frequency=freq_hz, number_of_points=1, variation='lin')
-                v_out = abs(complex(analysis.n2[0]))
-                return 20 * np.log10(v_out + 1e-15)
-    except:
-        return 0
+    # Исключения NgSpice не глушатся: сбой расчета отдает Watchdog (SimFailure)
+    with SuppressOutput():
+        simulator = circuit.simulator()
+        if full_scan:
+            # Сканирование диапазона для графика
+            analysis = simulator.ac(start_frequency=10@u_kHz, stop_frequency=100@u_MHz, number_of_points=100, variation='dec')
+            return analysis
+        else:
+            # Точечный замер для оптимизатора
+            freq_hz = target_freq_khz * 1e3
+            analysis = simulator.ac(start_frequency=freq_hz, stop_frequency=freq_hz, number_of_points=1, variation='lin')
+            v_out = abs(complex(analysis.n2[0]))
+            return 20 * np.log10(v_out + 1e-15)
 
 # 5. Настройки и оптимизация
 TARGET_FREQ = 150 # kHz
 TARGET_DB = -60
+BACKEND = 'ngspice' # 'session' - прогретая сессия NgSpice (alter вместо нового netlist)
+REPORT_PATH = 'final_emc_report.npz' # АЧХ итогового фильтра (частоты + дБ)
+RENDER = 'background' # PNG из .npz: 'background' (отдельный процесс), 'sync' или None (только данные)
+SIM_TIMEOUT_S = 10.0 # Дедлайн одной симуляции, с: зависший NgSpice убивается и перезапускается
+SIM_RETRIES = 2 # Повторы после зависания/падения NgSpice; затем расчет - сбой со штрафом FAILURE_PENALTY
+
+# Точечные расчеты - в отдельном процессе-исполнителе; сбой -> SimFailure вместо числа
+WATCHDOG = Watchdog(timeout=SIM_TIMEOUT_S, retries=SIM_RETRIES)
+# Кэш расчетов: path='emc_cache.sqlite' сохраняет результаты между запусками
+CACHE = EvaluationCache(maxsize=4096, path=None)
+simulate_filter = CACHE.wrap(WATCHDOG.wrap(simulate_filter), model=lambda: {'topology': 'v2', 'esr_ohm': 10e-3, 'esl_h': 2e-9, 'dcr_ohm': 50e-3, 'r_source': 50, 'r_load': 50, 'backend': BACKEND})
 
 def objective(params):
     if any(p <= 0.1 for p in params): return 1e6
     gain = simulate_filter(params, TARGET_FREQ)
+    if is_failure(gain): return FAILURE_PENALTY # Сбой NgSpice - не 0 dB, а явный штраф
     return (gain - TARGET_DB)**2 if gain > TARGET_DB else 0
 
-print(f"\n[1/3] Поиск оптимальных параметров (Цель: {TARGET_DB} dB)...")
-res = minimize(objective, [10, 0.1, 0.1], method='Nelder-Mead', tol=1e-2)
-
-if res.success:
-    # 6. Подбор реальных деталей
-    print("[2/3] Подбор компонентов из ряда E24...")
-    ideal_params = res.x
-    real_params = [get_closest_e24(p) for p in ideal_params]
-    
-    final_gain = simulate_filter(real_params, TARGET_FREQ)
-
-    # 7. Вывод отчета
-    print("\n" + "="*45)
-    print(f"{'Компонент':<12} | {'Расчет':<10} | {'E24 (Реальный)':<12}")
-    print("-" * 45)
-    labels = ['L (uH)', 'C1 (uF)', 'C2 (uF)']
-    for i in range(3):
-        print(f"{labels[i]:<12} | {ideal_params[i]:10.3f} | {real_params[i]:12.3f}")
-    print("-" * 45)
-    print(f"Итоговое затухание: {final_gain:.2f} dB")
-    print("="*45)
-
-    # 8. Генерация финального графика
-    print("[3/3] Построение АЧХ финального решения...")
-    analysis = simulate_filter(real_params, full_scan=True)
-    
-    plt.figure(figsize=(10, 6))
-    plt.semilogx(analysis.frequency, 20*np.log10(np.abs(analysis.n2)), label='Финальный фильтр (E24)', color='blue')
-    plt.axhline(y=TARGET_DB, color='red', linestyle='--', label=f'Порог {TARGET_DB} dB')
-    plt.axvline(x=TARGET_FREQ*1e3, color='green', linestyle=':', label=f'Частота помехи {TARGET_FREQ} kHz')
-    
-    plt.title("АЧХ оптимизированного EMC-фильтра")
-    plt.xlabel("Частота (Гц)")
-    plt.ylabel("Затухание (дБ)")
-    plt.grid(True, which="both", ls="-", alpha=0.5)
-    plt.legend()
-    plt.savefig('/workspace/final_emc_report.png')
-    print("\n[ВЫПОЛНЕНО] Отчет сохранен в final_emc_report.png\n")
-
-else:
-    print("\n[ОШИБКА] Не удалось найти решение.")
\ No newline at end of file
+def objective_batch(candidates):
+    """Батч-оценка популяции (N, 3) -> N оценок за один вызов"""
+    return v2_objective_batch(candidates, TARGET_FREQ, TARGET_DB)
+
+if __name__ == '__main__':
+    from scipy.optimize import minimize
+    print(f"\n[1/3] Поиск оптимальных параметров (Цель: {TARGET_DB} dB)...")
+    res = minimize(objective, [10, 0.1, 0.1], method='Nelder-Mead', tol=1e-2)
+    print(f"Симулятор: {WATCHDOG.report()}")
+
+    if res.success:
+        # 6. Подбор реальных деталей
+        print("[2/3] Подбор компонентов из ряда E24...")
+        ideal_params = res.x
+        real_params = [get_closest_e24(p) for p in ideal_params]
+
+        final_gain = simulate_filter(real_params, TARGET_FREQ)
+
+        # 7. Вывод отчета
+        print("\n" + "="*45)
+        print(f"{'Компонент':<12} | {'Расчет':<10} | {'E24 (Реальный)':<12}")
+        print("-" * 45)
+        labels = ['L (uH)', 'C1 (uF)', 'C2 (uF)']
+        for i in range(3):
+            print(f"{labels[i]:<12} | {ideal_params[i]:10.3f} | {real_params[i]:12.3f}")
+        print("-" * 45)
+        print(f"Итоговое затухание: {final_gain:.2f} dB")
+        print(f"Кэш симуляций: {CACHE.hits} попаданий / {CACHE.misses} промахов")
+        print("="*45)
+
+        # 8. Данные АЧХ финального решения (один свип), PNG - отдельный этап
+        print("[3/3] АЧХ финального решения...")
+        analysis = simulate_filter(real_params, full_scan=True)
+        label = 'Финальный фильтр (E24)'
+        save_sweep(REPORT_PATH, np.array(analysis.frequency, dtype=float),
+                   {label: 20*np.log10(np.abs(np.array(analysis.n2)))},
+                   params=[float(p) for p in real_params], target_db=TARGET_DB, target_freq_khz=TARGET_FREQ,
+                   title="АЧХ оптимизированного EMC-фильтра", xlabel="Частота (Гц)", ylabel="Затухание (дБ)",
+                   styles={label: {'color': 'blue'}},
+                   hlines=[{'y': TARGET_DB, 'color': 'red', 'linestyle': '--', 'label': f'Порог {TARGET_DB} dB'}],
+                   vlines=[{'x': TARGET_FREQ*1e3, 'color': 'green', 'linestyle': ':', 'label': f'Частота помехи {TARGET_FREQ} kHz'}])
+        png = finish_report(REPORT_PATH, RENDER)
+        print(f"\n[ВЫПОЛНЕНО] Данные АЧХ: {REPORT_PATH}" + (f", график: {png}" if png else "") + "\n")
+
+    else:
+        print("\n[ОШИБКА] Не удалось найти решение.")
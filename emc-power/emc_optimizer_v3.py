@@ -2,13 +2,16 @@ import os
 import sys
 import warnings
 import numpy as np
-import matplotlib.pyplot as plt
-from PySpice.Spice.Netlist import Circuit
-from PySpice.Unit import *
-from scipy.optimize import minimize
+from emc_power.objective import v3_objective_batch
+from emc_power.spice_session import spice_session
+from emc_power.cache import EvaluationCache
+from emc_power.watchdog import FAILURE_PENALTY, Watchdog, is_failure
+from emc_power.report import finish as finish_report, save_sweep
 
 warnings.filterwarnings("ignore")
 
+Circuit = None # PySpice.Spice.Netlist.Circuit, грузится в simulate_filter
+
 class SuppressOutput:
     def __enter__(self):
         self.outnull = os.open(os.devnull, os.O_WRONLY); self.errnull = os.open(os.devnull, os.O_WRONLY)
@@ -28,6 +31,14 @@ def get_closest_e24(value):
 
 def simulate_filter(params, target_freq_khz=150, r_load=50, full_scan=False):
     l_val, c1_val, c2_val = params
+    if BACKEND == 'session' and not full_scan:
+        # Прогретая сессия NgSpice: netlist не пересобирается, номиналы меняются через alter
+        return spice_session('v3').simulate(params, r_load=r_load, frequencies=target_freq_khz * 1e3)
+    global Circuit
+    if Circuit is None:  # PySpice грузится при первом прогоне NgSpice, а не при импорте скрипта
+        from PySpice.Spice.Netlist import Circuit
+    from PySpice.Unit import u_MHz, u_Ohm, u_V, u_kHz, u_mOhm, u_nH, u_uF, u_uH
+
     circuit = Circuit('EMC_Optimizer_V3_Clean')
     
     # ИСХОДНИК: переименовали 'in' в 'input_gen'
@@ -41,19 +52,29 @@ def simulate_filter(params, target_freq_khz=150, r_load=50, full_scan=False):
     
     circuit.R('load', 'n2', circuit.gnd, r_load@u_Ohm)
 
-    try:
-        with SuppressOutput():
-            sim = circuit.simulator()
-            if full_scan:
-                return sim.ac(start_frequency=10@u_kHz, stop_frequency=100@u_MHz, number_of_points=100, variation='dec')
-            else:
-                f = target_freq_khz * 1e3
-                res = sim.ac(start_frequency=f, stop_frequency=f, number_of_points=1, variation='lin')
-                return 20 * np.log10(abs(complex(res.n2[0])) + 1e-15)
-    except: return 0
+    # Исключения NgSpice не глушатся: сбой расчета отдает Watchdog (SimFailure)
+    with SuppressOutput():
+        sim = circuit.simulator()
+        if full_scan:
+            return sim.ac(start_frequency=10@u_kHz, stop_frequency=100@u_MHz, number_of_points=100, variation='dec')
+        else:
+            f = target_freq_khz * 1e3
+            res = sim.ac(start_frequency=f, stop_frequency=f, number_of_points=1, variation='lin')
+            return 20 * np.log10(abs(complex(res.n2[0])) + 1e-15)
 
 TARGET_FREQ = 150
 TARGET_DB = -60
+BACKEND = 'ngspice' # 'session' - прогретая сессия NgSpice (alter вместо нового netlist)
+REPORT_PATH = 'v3_stability.npz' # АЧХ итогового фильтра при 50 и 10 Ом (частоты + дБ)
+RENDER = 'background' # PNG из .npz: 'background' (отдельный процесс), 'sync' или None (только данные)
+SIM_TIMEOUT_S = 10.0 # Дедлайн одной симуляции, с: зависший NgSpice убивается и перезапускается
+SIM_RETRIES = 2 # Повторы после зависания/падения NgSpice; затем расчет - сбой со штрафом FAILURE_PENALTY
+
+# Точечные расчеты - в отдельном процессе-исполнителе; сбой -> SimFailure вместо числа
+WATCHDOG = Watchdog(timeout=SIM_TIMEOUT_S, retries=SIM_RETRIES)
+# Кэш расчетов: path='emc_cache.sqlite' сохраняет результаты между запусками
+CACHE = EvaluationCache(maxsize=4096, path=None)
+simulate_filter = CACHE.wrap(WATCHDOG.wrap(simulate_filter), model=lambda: {'topology': 'v3', 'esr_ohm': 15e-3, 'esl_h': 3e-9, 'dcr_ohm': 60e-3, 'r_source': 50, 'backend': BACKEND})
 
 def objective(params):
     l, c1, c2 = params
@@ -61,6 +82,7 @@ def objective(params):
     
     gain_50 = simulate_filter(params, TARGET_FREQ, r_load=50)
     gain_10 = simulate_filter(params, TARGET_FREQ, r_load=10)
+    if is_failure(gain_50) or is_failure(gain_10): return FAILURE_PENALTY # Сбой NgSpice - не 0 dB, а явный штраф
     worst_gain = max(gain_50, gain_10)
     
     error = (worst_gain - TARGET_DB)**2 if worst_gain > TARGET_DB else 0
@@ -69,34 +91,40 @@ def objective(params):
     
     return error + size_penalty
 
-print(f"\n[V3] Оптимизация: Минимум габаритов + Стабильность импеданса...")
-res = minimize(objective, [10, 0.1, 0.1], method='Nelder-Mead', tol=1e-2)
+def objective_batch(candidates):
+    """Батч-оценка популяции (N, 3) -> N оценок за один вызов"""
+    return v3_objective_batch(candidates, TARGET_FREQ, TARGET_DB)
 
-if res.success:
-    real_p = [get_closest_e24(p) for p in res.x]
-    
-    print("\n" + "="*50)
-    print(f"{'Компонент':<15} | {'Результат (E24)':<15}")
-    print("-" * 50)
-    print(f"{'L (uH)':<15} | {real_p[0]:.3f}")
-    print(f"{'C1 (uF)':<15} | {real_p[1]:.3f}")
-    print(f"{'C2 (uF)':<15} | {real_p[2]:.3f}")
-    print("-" * 50)
-    print(f"Затухание (50 Ом): {simulate_filter(real_p, TARGET_FREQ, 50):.2f} dB")
-    print(f"Затухание (10 Ом): {simulate_filter(real_p, TARGET_FREQ, 10):.2f} dB")
-    print("="*50)
-
-    # Строим график для двух случаев нагрузки
-    print("[ГРАФИК] Сохраняем сравнение стабильности в v3_stability.png...")
-    ana_50 = simulate_filter(real_p, full_scan=True, r_load=50)
-    ana_10 = simulate_filter(real_p, full_scan=True, r_load=10)
-
-    plt.figure(figsize=(10, 6))
-    plt.semilogx(ana_50.frequency, 20*np.log10(np.abs(ana_50.n2)), label='Нагрузка 50 Ом', color='blue')
-    plt.semilogx(ana_10.frequency, 20*np.log10(np.abs(ana_10.n2)), label='Нагрузка 10 Ом', color='orange')
-    plt.axhline(y=TARGET_DB, color='red', linestyle='--', alpha=0.5)
-    plt.title("Стабильность фильтра при изменении нагрузки")
-    plt.xlabel("Частота (Гц)"); plt.ylabel("Затухание (дБ)"); plt.grid(True, which="both", alpha=0.3)
-    plt.legend(); plt.savefig('/workspace/v3_stability.png')
-    
-    print("Результат: ✅ Чисто и оптимально.\n")
\ No newline at end of file
+if __name__ == '__main__':
+    from scipy.optimize import minimize
+    print(f"\n[V3] Оптимизация: Минимум габаритов + Стабильность импеданса...")
+    res = minimize(objective, [10, 0.1, 0.1], method='Nelder-Mead', tol=1e-2)
+    print(f"Симулятор: {WATCHDOG.report()}")
+
+    if res.success:
+        real_p = [get_closest_e24(p) for p in res.x]
+
+        print("\n" + "="*50)
+        print(f"{'Компонент':<15} | {'Результат (E24)':<15}")
+        print("-" * 50)
+        print(f"{'L (uH)':<15} | {real_p[0]:.3f}")
+        print(f"{'C1 (uF)':<15} | {real_p[1]:.3f}")
+        print(f"{'C2 (uF)':<15} | {real_p[2]:.3f}")
+        print("-" * 50)
+        print(f"Затухание (50 Ом): {simulate_filter(real_p, TARGET_FREQ, 50):.2f} dB")
+        print(f"Затухание (10 Ом): {simulate_filter(real_p, TARGET_FREQ, 10):.2f} dB")
+        print(f"Кэш симуляций: {CACHE.hits} попаданий / {CACHE.misses} промахов")
+        print("="*50)
+
+        # АЧХ для двух случаев нагрузки: один свип на нагрузку, PNG - отдельный этап
+        ana = {r: simulate_filter(real_p, full_scan=True, r_load=r) for r in (50, 10)}
+        save_sweep(REPORT_PATH, np.array(ana[50].frequency, dtype=float),
+                   {f'Нагрузка {r} Ом': 20*np.log10(np.abs(np.array(a.n2))) for r, a in ana.items()},
+                   params=[float(p) for p in real_p], target_db=TARGET_DB, target_freq_khz=TARGET_FREQ,
+                   title="Стабильность фильтра при изменении нагрузки", xlabel="Частота (Гц)", ylabel="Затухание (дБ)", grid_alpha=0.3,
+                   styles={'Нагрузка 50 Ом': {'color': 'blue'}, 'Нагрузка 10 Ом': {'color': 'orange'}},
+                   hlines=[{'y': TARGET_DB, 'color': 'red', 'linestyle': '--', 'alpha': 0.5}])
+        png = finish_report(REPORT_PATH, RENDER)
+        print(f"[ОТЧЕТ] Данные АЧХ: {REPORT_PATH}" + (f", график: {png}" if png else ""))
+
+        print("Результат: ✅ Чисто и оптимально.\n")
@@ -2,14 +2,17 @@ import os
 import sys
 import warnings
 import numpy as np
-import matplotlib.pyplot as plt
-from PySpice.Spice.Netlist import Circuit
-from PySpice.Unit import *
-from scipy.optimize import minimize
+from emc_power.objective import v4_objective_batch
+from emc_power.spice_session import spice_session
+from emc_power.cache import EvaluationCache
+from emc_power.watchdog import FAILURE_PENALTY, Watchdog, is_failure
+from emc_power.report import finish as finish_report, save_sweep
 
 # Отключаем мусор в консоли
 warnings.filterwarnings("ignore")
 
+Circuit = None # PySpice.Spice.Netlist.Circuit, грузится в simulate_filter
+
 class SuppressOutput:
     def __enter__(self):
         self.outnull = os.open(os.devnull, os.O_WRONLY); self.errnull = os.open(os.devnull, os.O_WRONLY)
@@ -29,6 +32,14 @@ def get_closest_e24(value):
 
 def simulate_filter(params, target_freq_khz=150, r_load=50, full_scan=False):
     l_val, c1_val, c2_val = params
+    if BACKEND == 'session' and not full_scan:
+        # Прогретая сессия NgSpice: netlist не пересобирается, номиналы меняются через alter
+        return spice_session('v4').simulate(params, r_load=r_load, frequencies=target_freq_khz * 1e3)
+    global Circuit
+    if Circuit is None:  # PySpice грузится при первом прогоне NgSpice, а не при импорте скрипта
+        from PySpice.Spice.Netlist import Circuit
+    from PySpice.Unit import u_MHz, u_Ohm, u_V, u_kHz, u_mOhm, u_nH, u_uF, u_uH
+
     circuit = Circuit('EMC_Optimizer_V4')
     circuit.SinusoidalVoltageSource('input', 'input_gen', circuit.gnd, amplitude=1@u_V)
     circuit.R('source', 'input_gen', 'n1', 50@u_Ohm)
@@ -39,20 +50,30 @@ def simulate_filter(params, target_freq_khz=150, r_load=50, full_scan=False):
     circuit.C(2, 'n2', 'c2_i', c2_val@u_uF); circuit.R('c2r', 'c2_i', 'c2_l', 15@u_mOhm); circuit.L('c2l', 'c2_l', circuit.gnd, 3@u_nH)
     circuit.R('load', 'n2', circuit.gnd, r_load@u_Ohm)
 
-    try:
-        with SuppressOutput():
-            sim = circuit.simulator()
-            if full_scan:
-                return sim.ac(start_frequency=10@u_kHz, stop_frequency=100@u_MHz, number_of_points=100, variation='dec')
-            else:
-                f = target_freq_khz * 1e3
-                res = sim.ac(start_frequency=f, stop_frequency=f, number_of_points=1, variation='lin')
-                return 20 * np.log10(abs(complex(res.n2[0])) + 1e-15)
-    except: return 0
+    # Исключения NgSpice не глушатся: сбой расчета отдает Watchdog (SimFailure)
+    with SuppressOutput():
+        sim = circuit.simulator()
+        if full_scan:
+            return sim.ac(start_frequency=10@u_kHz, stop_frequency=100@u_MHz, number_of_points=100, variation='dec')
+        else:
+            f = target_freq_khz * 1e3
+            res = sim.ac(start_frequency=f, stop_frequency=f, number_of_points=1, variation='lin')
+            return 20 * np.log10(abs(complex(res.n2[0])) + 1e-15)
 
 # --- ГЛОБАЛЬНЫЕ ЦЕЛИ ---
 TARGET_FREQ = 150 # kHz
 TARGET_DB = -60   # Целевое затухание
+BACKEND = 'ngspice' # 'session' - прогретая сессия NgSpice (alter вместо нового netlist)
+REPORT_PATH = 'v4_final_report.npz' # АЧХ итогового фильтра при 50 и 10 Ом (частоты + дБ)
+RENDER = 'background' # PNG из .npz: 'background' (отдельный процесс), 'sync' или None (только данные)
+SIM_TIMEOUT_S = 10.0 # Дедлайн одной симуляции, с: зависший NgSpice убивается и перезапускается
+SIM_RETRIES = 2 # Повторы после зависания/падения NgSpice; затем расчет - сбой со штрафом FAILURE_PENALTY
+
+# Точечные расчеты - в отдельном процессе-исполнителе; сбой -> SimFailure вместо числа
+WATCHDOG = Watchdog(timeout=SIM_TIMEOUT_S, retries=SIM_RETRIES)
+# Кэш расчетов: path='emc_cache.sqlite' сохраняет результаты между запусками
+CACHE = EvaluationCache(maxsize=4096, path=None)
+simulate_filter = CACHE.wrap(WATCHDOG.wrap(simulate_filter), model=lambda: {'topology': 'v4', 'esr_ohm': 15e-3, 'esl_h': 3e-9, 'dcr_ohm': 60e-3, 'r_source': 50, 'backend': BACKEND})
 
 def objective(params):
     l, c1, c2 = params
@@ -61,6 +82,7 @@ def objective(params):
     # Симуляция в двух режимах нагрузки
     gain_50 = simulate_filter(params, TARGET_FREQ, r_load=50)
     gain_10 = simulate_filter(params, TARGET_FREQ, r_load=10)
+    if is_failure(gain_50) or is_failure(gain_10): return FAILURE_PENALTY # Сбой NgSpice - не 0 dB, а явный штраф
     
     worst_gain = max(gain_50, gain_10)
     
@@ -72,42 +94,50 @@ def objective(params):
     # Коэффициент 10 для L, так как катушки больше и дороже кондеров.
     return (l * 10.0) + (c1 * 1.0) + (c2 * 1.0)
 
-print(f"\n[V4] СТАРТ: Поиск минимальных габаритов при стабильном затухании < {TARGET_DB} dB...")
-
-# Начинаем с запасом, чтобы Nelder-Mead было откуда "спускаться"
-initial_guess = [20, 1.0, 1.0]
-res = minimize(objective, initial_guess, method='Nelder-Mead', tol=1e-3)
-
-if res.success:
-    real_p = [get_closest_e24(p) for p in res.x]
-    db_50 = simulate_filter(real_p, TARGET_FREQ, 50)
-    db_10 = simulate_filter(real_p, TARGET_FREQ, 10)
-
-    print("\n" + "="*55)
-    print(f"{'Компонент':<18} | {'Расчет':<12} | {'E24 (Финал)':<12}")
-    print("-" * 55)
-    labels = ['L (uH)', 'C1 (uF)', 'C2 (uF)']
-    for i in range(3):
-        print(f"{labels[i]:<18} | {res.x[i]:10.3f}   | {real_p[i]:12.3f}")
-    print("-" * 55)
-    print(f"Затухание (High-Z 50 Ohm): {db_50:.2f} dB")
-    print(f"Затухание (Low-Z 10 Ohm):  {db_10:.2f} dB")
-    print("="*55)
-
-    if max(db_50, db_10) <= TARGET_DB:
-        print("СТАТУС: ТЗ ВЫПОЛНЕНО ✅ (Даже в худшем случае)")
-    else:
-        print("СТАТУС: НУЖЕН ПЕРЕСМОТР ❌ (Затухание недостаточно)")
-
-    # Построение финального графика АЧХ
-    ana_50 = simulate_filter(real_p, full_scan=True, r_load=50)
-    ana_10 = simulate_filter(real_p, full_scan=True, r_load=10)
-
-    plt.figure(figsize=(10, 6))
-    plt.semilogx(ana_50.frequency, 20*np.log10(np.abs(ana_50.n2)), label='Нагрузка 50 Ом', color='blue', lw=2)
-    plt.semilogx(ana_10.frequency, 20*np.log10(np.abs(ana_10.n2)), label='Нагрузка 10 Ом', color='orange', linestyle='--')
-    plt.axhline(y=TARGET_DB, color='red', linestyle=':', label='Target -60 dB')
-    plt.title(f"Финальная АЧХ фильтра (V4): L={real_p[0]}uH, C={real_p[1]}uF")
-    plt.xlabel("Частота (Гц)"); plt.ylabel("Затухание (дБ)"); plt.grid(True, which="both", alpha=0.4)
-    plt.legend(); plt.savefig('/workspace/v4_final_report.png')
-    print("\n[ВЫПОЛНЕНО] График сохранен в v4_final_report.png\n")
\ No newline at end of file
+def objective_batch(candidates):
+    """Батч-оценка популяции (N, 3) -> N оценок за один вызов"""
+    return v4_objective_batch(candidates, TARGET_FREQ, TARGET_DB)
+
+if __name__ == '__main__':
+    from scipy.optimize import minimize
+    print(f"\n[V4] СТАРТ: Поиск минимальных габаритов при стабильном затухании < {TARGET_DB} dB...")
+
+    # Начинаем с запасом, чтобы Nelder-Mead было откуда "спускаться"
+    initial_guess = [20, 1.0, 1.0]
+    res = minimize(objective, initial_guess, method='Nelder-Mead', tol=1e-3)
+    print(f"Симулятор: {WATCHDOG.report()}")
+
+    if res.success:
+        real_p = [get_closest_e24(p) for p in res.x]
+        db_50 = simulate_filter(real_p, TARGET_FREQ, 50)
+        db_10 = simulate_filter(real_p, TARGET_FREQ, 10)
+
+        print("\n" + "="*55)
+        print(f"{'Компонент':<18} | {'Расчет':<12} | {'E24 (Финал)':<12}")
+        print("-" * 55)
+        labels = ['L (uH)', 'C1 (uF)', 'C2 (uF)']
+        for i in range(3):
+            print(f"{labels[i]:<18} | {res.x[i]:10.3f}   | {real_p[i]:12.3f}")
+        print("-" * 55)
+        print(f"Затухание (High-Z 50 Ohm): {db_50:.2f} dB")
+        print(f"Затухание (Low-Z 10 Ohm):  {db_10:.2f} dB")
+        print(f"Кэш симуляций: {CACHE.hits} попаданий / {CACHE.misses} промахов")
+        print("="*55)
+
+        if is_failure(db_50) or is_failure(db_10):
+            print("СТАТУС: СБОЙ СИМУЛЯЦИИ ❌ (Итоговый дизайн не рассчитан)")
+        elif max(db_50, db_10) <= TARGET_DB:
+            print("СТАТУС: ТЗ ВЫПОЛНЕНО ✅ (Даже в худшем случае)")
+        else:
+            print("СТАТУС: НУЖЕН ПЕРЕСМОТР ❌ (Затухание недостаточно)")
+
+        # АЧХ для двух случаев нагрузки: один свип на нагрузку, PNG - отдельный этап
+        ana = {r: simulate_filter(real_p, full_scan=True, r_load=r) for r in (50, 10)}
+        save_sweep(REPORT_PATH, np.array(ana[50].frequency, dtype=float),
+                   {f'Нагрузка {r} Ом': 20*np.log10(np.abs(np.array(a.n2))) for r, a in ana.items()},
+                   params=[float(p) for p in real_p], target_db=TARGET_DB, target_freq_khz=TARGET_FREQ,
+                   title=f"Финальная АЧХ фильтра (V4): L={real_p[0]}uH, C={real_p[1]}uF", xlabel="Частота (Гц)", ylabel="Затухание (дБ)", grid_alpha=0.4,
+                   styles={'Нагрузка 50 Ом': {'color': 'blue', 'lw': 2}, 'Нагрузка 10 Ом': {'color': 'orange', 'linestyle': '--'}},
+                   hlines=[{'y': TARGET_DB, 'color': 'red', 'linestyle': ':', 'label': 'Target -60 dB'}])
+        png = finish_report(REPORT_PATH, RENDER)
+        print(f"\n[ВЫПОЛНЕНО] Данные АЧХ: {REPORT_PATH}" + (f", график: {png}" if png else "") + "\n")
@@ -2,16 +2,30 @@ import os
 import sys
 import warnings
 import numpy as np
-import matplotlib.pyplot as plt # Добавлено для графиков
-from PySpice.Spice.Netlist import Circuit
-from PySpice.Unit import *
-from scipy.optimize import minimize
+from emc_power.circuits import v5_gain_db
+from emc_power.objective import leakage_ma, v5_feasible, v5_mask_margin, v5_objective_batch, v5_size_cost, vectorized
+from emc_power.eseries import discrete_search, snap
+from emc_power.mask import cispr_style_mask
+from emc_power.montecarlo import yield_analysis
+from emc_power.corners import V5_CORNERS, v5_corner_margin, v5_worst_corner
+from emc_power.mna import MNA_TOLERANCE_DB
+from emc_power.spice_session import spice_session
+from emc_power.cache import EvaluationCache
+from emc_power.trace import event, span, traced
+from emc_power.report import finish as finish_report, save_sweep
+from emc_power.rom import FilterRom, fit_v5_rom
+from emc_power.catalog import catalog_search, load_catalog, part_gain_db, part_summary
+from emc_power.emission import CISPR32_CLASS_B, predict_emission, trapezoid, load_waveform
 
 # Отключаем лишние предупреждения
 warnings.filterwarnings("ignore")
 
+# PySpice и SciPy грузятся по месту: первый прогон NgSpice / выбранный OPTIMIZER, не импорт скрипта
+Circuit = None
+
 class SuppressOutput:
     """Контекстный менеджер для подавления вывода NgSpice в консоль"""
+    @traced('v5.suppress_output')
     def __enter__(self):
         self.outnull = os.open(os.devnull, os.O_WRONLY)
         self.errnull = os.open(os.devnull, os.O_WRONLY)
@@ -19,6 +33,7 @@ class SuppressOutput:
         self.old_stderr = os.dup(sys.stderr.fileno())
         os.dup2(self.outnull, sys.stdout.fileno())
         os.dup2(self.errnull, sys.stderr.fileno())
+    @traced('v5.suppress_output')
     def __exit__(self, *_):
         os.dup2(self.old_stdout, sys.stdout.fileno())
         os.dup2(self.old_stderr, sys.stderr.fileno())
@@ -27,14 +42,10 @@ class SuppressOutput:
         os.close(self.outnull)
         os.close(self.errnull)
 
+@traced('v5.get_closest_e24')
 def get_closest_e24(value):
     """Округление до ближайшего номинала из стандартного ряда E24"""
-    if value <= 0: return 0
-    e24 = [1.0, 1.1, 1.2, 1.3, 1.5, 1.6, 1.8, 2.0, 2.2, 2.4, 2.7, 3.0, 3.3, 3.6, 3.9, 4.3, 4.7, 5.1, 5.6, 6.2, 6.8, 7.5, 8.2, 9.1]
-    exp = np.floor(np.log10(value))
-    base = value / (10**exp)
-    closest = min(e24, key=lambda x: abs(x - base))
-    return round(closest * (10**exp), 4)
+    return snap(value, 'E24')
 
 # --- Глобальные константы проектирования ---
 TARGET_FREQ = 150        # Частота анализа (кГц)
@@ -42,146 +53,315 @@ TARGET_DB = -60          # Целевое затухание (дБ)
 MAX_LEAKAGE_MA = 3.5     # Максимальный ток утечки (нормы безопасности)
 LOAD_CURRENT_A = 10.0    # Рабочий ток нагрузки
 DCR_OHM = 0.005          # Сопротивление обмоток дросселя (5 мОм)
+BACKEND = 'mna'          # 'mna' - встроенный NumPy-решатель, 'session' - прогретая NgSpice, 'ngspice' - PySpice/NgSpice
+OPTIMIZER = 'nelder-mead'  # 'nelder-mead', 'de' (батч-популяция), 'multistart' (пул процессов), 'pareto' (фронт компромиссов), 'surrogate' (ГП + EI),
+                           # 'slsqp' / 'trust-constr' (точные градиенты MNA, ограничения вместо штрафов)
+BOUNDS = [(0.01, 20.0), (0.1, 50.0), (0.1, 48.0)]  # Cy сверху ограничен утечкой (3.5 мА -> ~48 нФ)
+N_STARTS = 32            # Число стартов мультистарта (латинский гиперкуб)
+SURROGATE_EVALS = 60     # Бюджет реальных симуляций для OPTIMIZER = 'surrogate'
+SERIES = 'E24'           # Ряд номиналов для сборки: E12 / E24 / E48 / E96
+LIMIT_MASK = None        # cispr_style_mask(TARGET_DB) - проверка всей полосы 150 кГц - 30 МГц вместо одной точки
+CAP_ESL = 3e-9           # ESL Cx/Cy для проверки по маске (как в V3/V4), Гн
+CORNERS = None           # V5_CORNERS - ТЗ в худшем из углов (нагрузка, источник, связь, DCR(T)); nelder-mead/de/multistart/surrogate + дискретный поиск
+CATALOG = None           # load_catalog('parts.csv') - реальные детали (ток дросселя >= LOAD_CURRENT_A) вместо ряда SERIES
+CAP_VOLTAGE_V = 275      # Мин. класс напряжения конденсаторов из каталога, В
+YIELD_SAMPLES = 0        # 20000 - Монте-Карло по допускам деталей для итогового дизайна (с LIMIT_MASK - по маске)
+REPORT_PATH = 'emc_report.npz'  # Проверочный свип итогового дизайна (частоты + АЧХ DM/CM)
+DM_NOISE = None          # trapezoid(100e3, 0.4, 20e-9, amplitude=10) - шум DM преобразователя (t, v); прогноз эмиссии
+CM_NOISE = None          # То же для CM (или load_waveform('cm_noise.csv'))
+RENDER = 'background'    # PNG из .npz: 'background' (отдельный процесс), 'sync' или None (только данные)
+VERIFY_SPICE = False     # True - сверить итоговый дизайн с NgSpice (нужны PySpice и libngspice)
 
-def simulate_full_filter(params, mode='DM', frequencies=None):
+@traced('v5.simulate_full_filter')
+def simulate_full_filter(params, mode='DM', frequencies=None, backend=None):
     """
     params: [cx_uF, lcm_mH, cy_nF]
     Если frequencies задан (array), возвращает массив значений для графика.
+    backend: 'mna', 'session' или 'ngspice' (по умолчанию BACKEND).
     """
-    cx, lcm, cy = params
-    circuit = Circuit('EMC_Final_V5')
+    backend = backend or BACKEND
+    if backend == 'mna':
+        # Одна батч-система на все частоты, без запуска NgSpice
+        if frequencies is None:
+            return float(v5_gain_db(params, mode, TARGET_FREQ * 1e3, dcr=DCR_OHM)[0])
+        return v5_gain_db(params, mode, frequencies, dcr=DCR_OHM)
+    if backend == 'session':
+        # Netlist уже загружен в libngspice, меняются только номиналы (alter)
+        f = TARGET_FREQ * 1e3 if frequencies is None else frequencies
+        return spice_session('v5', dcr=DCR_OHM).simulate(params, mode, frequencies=f)
+
+    global Circuit
+    if Circuit is None:
+        from PySpice.Spice.Netlist import Circuit
+    from PySpice.Unit import u_mH, u_nF, u_Ohm, u_uF, u_V
+
+    with span('v5.netlist'):
+        cx, lcm, cy = params
+        circuit = Circuit('EMC_Final_V5')
     
-    if mode == 'DM':
-        circuit.SinusoidalVoltageSource('input', 'n_in_p', 'n_in_n', amplitude=1@u_V)
-        circuit.R('rs1', 'n_in_p', 'n1_p', 25@u_Ohm)
-        circuit.R('rs2', 'n_in_n', 'n1_n', 25@u_Ohm)
-    else: # Common Mode
-        circuit.SinusoidalVoltageSource('input', 'n_common', circuit.gnd, amplitude=1@u_V)
-        circuit.R('rs1', 'n_common', 'n1_p', 25@u_Ohm)
-        circuit.R('rs2', 'n_common', 'n1_n', 25@u_Ohm)
-
-    circuit.C('x1', 'n1_p', 'n1_n', cx@u_uF)
-    circuit.L('cm1', 'n1_p', 'n2_p', lcm@u_mH)
-    circuit.L('cm2', 'n1_n', 'n2_n', lcm@u_mH)
-    circuit.K('k_core', 'Lcm1', 'Lcm2', 0.995)
-    circuit.R('dcr1', 'n2_p', 'n3_p', DCR_OHM@u_Ohm)
-    circuit.R('dcr2', 'n2_n', 'n3_n', DCR_OHM@u_Ohm)
-    circuit.C('y1', 'n3_p', circuit.gnd, cy@u_nF)
-    circuit.C('y2', 'n3_n', circuit.gnd, cy@u_nF)
-    circuit.R('load', 'n3_p', 'n3_n', 50@u_Ohm)
+        if mode == 'DM':
+            circuit.SinusoidalVoltageSource('input', 'n_in_p', 'n_in_n', amplitude=1@u_V)
+            circuit.R('rs1', 'n_in_p', 'n1_p', 25@u_Ohm)
+            circuit.R('rs2', 'n_in_n', 'n1_n', 25@u_Ohm)
+        else: # Common Mode
+            circuit.SinusoidalVoltageSource('input', 'n_common', circuit.gnd, amplitude=1@u_V)
+            circuit.R('rs1', 'n_common', 'n1_p', 25@u_Ohm)
+            circuit.R('rs2', 'n_common', 'n1_n', 25@u_Ohm)
+
+        circuit.C('x1', 'n1_p', 'n1_n', cx@u_uF)
+        circuit.L('cm1', 'n1_p', 'n2_p', lcm@u_mH)
+        circuit.L('cm2', 'n1_n', 'n2_n', lcm@u_mH)
+        circuit.K('k_core', 'Lcm1', 'Lcm2', 0.995)
+        circuit.R('dcr1', 'n2_p', 'n3_p', DCR_OHM@u_Ohm)
+        circuit.R('dcr2', 'n2_n', 'n3_n', DCR_OHM@u_Ohm)
+        circuit.C('y1', 'n3_p', circuit.gnd, cy@u_nF)
+        circuit.C('y2', 'n3_n', circuit.gnd, cy@u_nF)
+        circuit.R('load', 'n3_p', 'n3_n', 50@u_Ohm)
 
     with SuppressOutput():
-        sim = circuit.simulator()
+        with span('v5.ngspice_launch'):
+            sim = circuit.simulator()
         if frequencies is None:
             # Точечный расчет для оптимизатора
             f = TARGET_FREQ * 1e3
-            res = sim.ac(start_frequency=f, stop_frequency=f, number_of_points=1, variation='lin')
-            v_out = abs(complex(res.n3_p[0] - res.n3_n[0])) if mode == 'DM' else abs(complex(res.n3_p[0]))
+            with span('v5.ngspice_ac'):
+                res = sim.ac(start_frequency=f, stop_frequency=f, number_of_points=1, variation='lin')
+            with span('v5.unpack'):
+                v_out = abs(complex(res.n3_p[0] - res.n3_n[0])) if mode == 'DM' else abs(complex(res.n3_p[0]))
             return 20 * np.log10(v_out + 1e-15)
         else:
-            # Широкий диапазон для графика
-            res = sim.ac(start_frequency=frequencies[0], stop_frequency=frequencies[-1], 
-                         number_of_points=len(frequencies), variation='dec')
-            if mode == 'DM':
-                v_out = [abs(complex(p - n)) for p, n in zip(res.n3_p, res.n3_n)]
-            else:
-                v_out = [abs(complex(p)) for p in res.n3_p]
-            return 20 * np.log10(np.array(v_out) + 1e-15)
+            # Широкий диапазон для графика: NgSpice считает свою log-сетку (точек на декаду),
+            # результат интерполируется на запрошенные частоты
+            frequencies = np.asarray(frequencies, dtype=float)
+            decades = np.log10(frequencies[-1] / frequencies[0])
+            per_decade = max(1, int(np.ceil((len(frequencies) - 1) / max(decades, 1e-12))))
+            with span('v5.ngspice_ac'):
+                res = sim.ac(start_frequency=frequencies[0], stop_frequency=frequencies[-1],
+                             number_of_points=per_decade, variation='dec')
+            with span('v5.unpack'):
+                if mode == 'DM':
+                    v_out = [abs(complex(p - n)) for p, n in zip(res.n3_p, res.n3_n)]
+                else:
+                    v_out = [abs(complex(p)) for p in res.n3_p]
+                db = 20 * np.log10(np.array(v_out) + 1e-15)
+            return np.interp(np.log10(frequencies), np.log10(np.array(res.frequency, dtype=float)), db)
 
+# Кэш расчетов: path='emc_cache.sqlite' сохраняет результаты между запусками
+CACHE = EvaluationCache(maxsize=4096, path=None)
+# model - функция: BACKEND/TARGET_FREQ/DCR_OHM, измененные после импорта (bench, сервис), меняют ключ
+simulate_full_filter = CACHE.wrap(simulate_full_filter, model=lambda: {
+    'topology': 'v5', 'dcr_ohm': DCR_OHM, 'coupling': 0.995, 'r_source': 25, 'r_load': 50,
+    'target_freq_khz': TARGET_FREQ, 'backend': BACKEND})
+
+@traced('v5.objective')
 def objective(params):
     cx_val, lcm_val, cy_val = params
-    if any(p <= 0.001 for p in params): return 1e12
+    if any(p <= 0.001 for p in params):
+        event('v5.objective.eval', params=params, branch='tiny', score=1e12)
+        return 1e12
     leakage_ma = 230 * 2 * np.pi * 50 * (cy_val * 1e-9) * 1000
     if leakage_ma > MAX_LEAKAGE_MA:
-        return 1e9 + (leakage_ma - MAX_LEAKAGE_MA) * 1000
+        score = 1e9 + (leakage_ma - MAX_LEAKAGE_MA) * 1000
+        event('v5.objective.eval', params=params, branch='leakage', leakage_ma=leakage_ma, score=score)
+        return score
 
-    gain_dm = simulate_full_filter(params, mode='DM')
-    gain_cm = simulate_full_filter(params, mode='CM')
-    worst_case = max(gain_dm, gain_cm)
+    if CORNERS is not None:
+        # Все углы одним батч-решением MNA, в зачет идет худший
+        excess = v5_corner_margin(params, CORNERS, TARGET_FREQ, TARGET_DB, DCR_OHM, mask=LIMIT_MASK,
+                                  esl=CAP_ESL if LIMIT_MASK is not None else None)[0]
+    elif LIMIT_MASK is not None:
+        # Худший запас по всей полосе маски: один адаптивный свип DM+CM (MNA, с ESL)
+        excess = v5_mask_margin(params, LIMIT_MASK, dcr=DCR_OHM, esl=CAP_ESL)[0]
+    else:
+        gain_dm = simulate_full_filter(params, mode='DM')
+        gain_cm = simulate_full_filter(params, mode='CM')
+        excess = max(gain_dm, gain_cm) - TARGET_DB
     
     penalty = 0
-    if worst_case > TARGET_DB:
-        penalty = 5e6 + (worst_case - TARGET_DB)**2 * 5000
+    if excess > 0:
+        penalty = 5e6 + excess**2 * 5000
     
     size_cost = (lcm_val * 1) + (cx_val * 1) + (cy_val * 1)
+    event('v5.objective.eval', params=params, branch='penalty' if penalty else 'ok', excess_db=excess,
+          score=penalty + size_cost)
     return penalty + size_cost
 
-# --- Основной цикл ---
-print(f"\n[V5] СТАРТ: Комплексная оптимизация DM + CM фильтра...")
-print(f"Цель: {TARGET_DB} dB на {TARGET_FREQ} кГц. Ток нагрузки: {LOAD_CURRENT_A} A")
+def objective_batch(candidates):
+    """Батч-оценка популяции (N, 3) -> N оценок за один вызов"""
+    return v5_objective_batch(candidates, TARGET_FREQ, TARGET_DB, MAX_LEAKAGE_MA, DCR_OHM,
+                              mask=LIMIT_MASK, esl=CAP_ESL, corners=CORNERS)
 
-initial_guess = [0.47, 5.0, 4.0] 
-res = minimize(objective, initial_guess, method='Nelder-Mead', tol=1e-3)
+if __name__ == '__main__':
+    # --- Основной цикл ---
+    print(f"\n[V5] СТАРТ: Комплексная оптимизация DM + CM фильтра...")
+    print(f"Цель: {TARGET_DB} dB на {TARGET_FREQ} кГц. Ток нагрузки: {LOAD_CURRENT_A} A")
 
-if res.success:
-    p = res.x
-    real_p = [get_closest_e24(p[0]), get_closest_e24(p[1]), get_closest_e24(p[2])]
-    
-    # Финальные замеры
-    final_dm = simulate_full_filter(real_p, mode='DM')
-    final_cm = simulate_full_filter(real_p, mode='CM')
-    p_loss = 2 * (LOAD_CURRENT_A**2 * DCR_OHM)
-
-    print("\n" + "="*65)
-    print(f"{'Компонент':<30} | {'Номинал E24':<15}")
-    print("-" * 65)
-    print(f"{'X-конденсатор (Cx)':<30} | {real_p[0]:>10.3f} uF")
-    print(f"{'Синфазный дроссель (Lcm)':<30} | {real_p[1]:>10.3f} mH")
-    print(f"{'Y-конденсаторы (Cy)':<30} | {real_p[2]:>10.3f} nF")
-    print("-" * 65)
-    print(f"Затухание DM (Дифференциальное): {final_dm:>8.2f} dB")
-    print(f"Затухание CM (Синфазное):        {final_cm:>8.2f} dB")
-    print(f"Статические потери мощности:     {p_loss:>8.2f} W")
-    print("="*65)
-
-    # --- Построение графиков ---
-    print("\nГенерация графиков АЧХ...")
-    f_axis = np.logspace(4, 7.5, 400) # Задаем желаемый диапазон
-    
-    # Важно: Нам нужно получить объект результата, чтобы вытащить оттуда частоты
-    cx, lcm, cy = real_p
-    circuit_dm = Circuit('Plot_DM')
-    
-    def get_plot_data(params, mode='DM'):
-        cx, lcm, cy = params
-        circuit = Circuit('EMC_Plot')
-        if mode == 'DM':
-            circuit.SinusoidalVoltageSource('input', 'n_in_p', 'n_in_n', amplitude=1@u_V)
-            circuit.R('rs1', 'n_in_p', 'n1_p', 25@u_Ohm); circuit.R('rs2', 'n_in_n', 'n1_n', 25@u_Ohm)
+    initial_guess = [0.47, 5.0, 4.0] 
+    if OPTIMIZER == 'de':
+        from scipy.optimize import differential_evolution
+        res = differential_evolution(vectorized(objective_batch), BOUNDS, vectorized=True,
+                                     updating='deferred', seed=0, tol=1e-6)
+    elif OPTIMIZER == 'multistart':
+        # Прогретый симулятор в каждом процессе; NgSpice-точность - через сессию
+        from emc_power.multistart import multistart
+        res = multistart(BOUNDS, n_starts=N_STARTS, seed=0, objective_kwargs=dict(
+            target_freq_khz=TARGET_FREQ, target_db=TARGET_DB, max_leakage_ma=MAX_LEAKAGE_MA,
+            dcr=DCR_OHM, mask=LIMIT_MASK, esl=CAP_ESL, corners=CORNERS,
+            backend='mna' if BACKEND == 'mna' else 'session'))
+        print(f"Мультистарт: {len(res.runs)} стартов, {res.nfev} вычислений, "
+              f"снято досрочно: {sum(r['cancelled'] for r in res.runs)}")
+    elif OPTIMIZER == 'pareto':
+        # Архив недоминируемых решений: габариты / запас / утечка / потери за один прогон
+        from scipy.optimize import OptimizeResult
+        from emc_power.pareto import explore, v5_objectives
+        archive = explore(BOUNDS, lambda c: v5_objectives(c, TARGET_FREQ, TARGET_DB, LOAD_CURRENT_A, DCR_OHM),
+                          max_leakage_ma=MAX_LEAKAGE_MA)
+        print(f"Фронт Парето: {len(archive)} точек из {archive.offered} кандидатов")
+        print(f"{'Запас, dB':>10} | {'Cx, uF':>8} {'Lcm, mH':>8} {'Cy, nF':>8} | {'Габариты':>8} {'Утечка':>7} {'Потери':>7}")
+        for margin in (0, -3, -6, -10):
+            x, f = archive.best('size', margin_db=margin)
+            if x is not None:
+                print(f"{-margin:>10} | {x[0]:>8.2f} {x[1]:>8.2f} {x[2]:>8.2f} | {f[0]:>8.2f} {f[2]:>5.2f}mA {f[3]:>6.2f}W")
+        x, f = archive.best('size', margin_db=0)
+        res = OptimizeResult(x=x, fun=None if f is None else f[0], success=x is not None)
+    elif OPTIMIZER == 'surrogate':
+        # Моделируется только превышение ТЗ (гладкое), габариты и утечка считаются точно
+        from emc_power.surrogate import surrogate_minimize
+
+        def excess_db(params):
+            if CORNERS is not None:
+                return float(v5_corner_margin(params, CORNERS, TARGET_FREQ, TARGET_DB, DCR_OHM, mask=LIMIT_MASK,
+                                              esl=CAP_ESL if LIMIT_MASK is not None else None)[0])
+            if LIMIT_MASK is not None:
+                return float(v5_mask_margin(params, LIMIT_MASK, dcr=DCR_OHM, esl=CAP_ESL)[0])
+            return max(simulate_full_filter(params, mode='DM'), simulate_full_filter(params, mode='CM')) - TARGET_DB
+        cy_max = min(BOUNDS[2][1], MAX_LEAKAGE_MA / float(leakage_ma(1.0)))
+        res = surrogate_minimize(excess_db, v5_size_cost, BOUNDS[:2] + [(BOUNDS[2][0], cy_max)],
+                                 max_evals=SURROGATE_EVALS)
+        print(f"Суррогатная модель: {res.nfev} реальных расчетов, запас {-res.constraint:.2f} dB")
+    elif OPTIMIZER in ('slsqp', 'trust-constr'):
+        # ТЗ и утечка - настоящие ограничения, производные затухания - чувствительность MNA
+        from emc_power.constrained import v5_constrained_minimize
+        res = v5_constrained_minimize(initial_guess, TARGET_FREQ, TARGET_DB, MAX_LEAKAGE_MA, DCR_OHM, BOUNDS,
+                                      method='SLSQP' if OPTIMIZER == 'slsqp' else 'trust-constr',
+                                      mask=LIMIT_MASK, esl=CAP_ESL if LIMIT_MASK is not None else None)
+        print(f"{OPTIMIZER}: {res.nit} итераций, {res.nfev} вычислений, запас {res.margin_db:.3f} dB")
+    else:
+        from scipy.optimize import minimize
+        res = minimize(objective, initial_guess, method='Nelder-Mead', tol=1e-3)
+
+    if res.success:
+        p = res.x
+        # Дискретный поиск: самая дешевая комбинация номиналов ряда, реально выполняющая ТЗ
+        def feasible(cands):
+            return v5_feasible(cands, TARGET_FREQ, TARGET_DB, MAX_LEAKAGE_MA, DCR_OHM,
+                               mask=LIMIT_MASK, esl=CAP_ESL, corners=CORNERS)
+        parts = None
+        if CATALOG is not None:
+            # Реальные детали: ближайшие по номиналу на ток нагрузки / класс напряжения, ТЗ - с их паразитами
+            rows, checked = catalog_search(p, CATALOG, LOAD_CURRENT_A, CAP_VOLTAGE_V, TARGET_FREQ, TARGET_DB,
+                                           MAX_LEAKAGE_MA, mask=LIMIT_MASK)
+            if rows is not None:
+                parts = part_summary(CATALOG, rows, LOAD_CURRENT_A, TARGET_FREQ)
+                real_p = [parts['cx_uF'], parts['lcm_mH'], parts['cy_nF']]
+                print(f"Каталог ({len(CATALOG)} деталей): проверено {checked} комбинаций")
+            else:
+                print(f"ВНИМАНИЕ: в каталоге нет комбинации деталей, выполняющей ТЗ; снап к ряду {SERIES}")
+        if parts is None:
+            best, checked = discrete_search(p, feasible, v5_size_cost, series=SERIES)
+            if best is not None:
+                real_p = [float(v) for v in best]
+                print(f"Дискретный поиск {SERIES}: проверено {checked} комбинаций")
+            else:
+                real_p = [snap(v, SERIES) for v in p]
+                print(f"ВНИМАНИЕ: в окрестности оптимума нет комбинации {SERIES}, выполняющей ТЗ")
+
+        # Финальные замеры (для деталей каталога - с их DCR, связью и ESR/ESL)
+        if parts is not None:
+            final_dm, final_cm, p_loss = parts['dm_db'], parts['cm_db'], parts['loss_w']
         else:
-            circuit.SinusoidalVoltageSource('input', 'n_common', circuit.gnd, amplitude=1@u_V)
-            circuit.R('rs1', 'n_common', 'n1_p', 25@u_Ohm); circuit.R('rs2', 'n_common', 'n1_n', 25@u_Ohm)
-        
-        circuit.C('x1', 'n1_p', 'n1_n', cx@u_uF)
-        circuit.L('cm1', 'n1_p', 'n2_p', lcm@u_mH); circuit.L('cm2', 'n1_n', 'n2_n', lcm@u_mH)
-        circuit.K('k_core', 'Lcm1', 'Lcm2', 0.995)
-        circuit.R('dcr1', 'n2_p', 'n3_p', DCR_OHM@u_Ohm); circuit.R('dcr2', 'n2_n', 'n3_n', DCR_OHM@u_Ohm)
-        circuit.C('y1', 'n3_p', circuit.gnd, cy@u_nF); circuit.C('y2', 'n3_n', circuit.gnd, cy@u_nF)
-        circuit.R('load', 'n3_p', 'n3_n', 50@u_Ohm)
+            final_dm = simulate_full_filter(real_p, mode='DM')
+            final_cm = simulate_full_filter(real_p, mode='CM')
+            p_loss = 2 * (LOAD_CURRENT_A**2 * DCR_OHM)
 
-        with SuppressOutput():
-            sim = circuit.simulator()
-            res = sim.ac(start_frequency=10@u_kHz, stop_frequency=30@u_MHz, number_of_points=100, variation='dec')
-            freqs = np.array(res.frequency)
-            v_out = [abs(complex(p - n)) for p, n in zip(res.n3_p, res.n3_n)] if mode == 'DM' else [abs(complex(p)) for p in res.n3_p]
-            return freqs, 20 * np.log10(np.array(v_out) + 1e-15)
+        # Контроль встроенного решателя по NgSpice на итоговых номиналах
+        if VERIFY_SPICE and BACKEND != 'ngspice' and parts is None:
+            try:
+                spice_dm = simulate_full_filter(real_p, mode='DM', backend='ngspice')
+                spice_cm = simulate_full_filter(real_p, mode='CM', backend='ngspice')
+            except (ImportError, OSError) as exc:
+                print(f"Сверка с NgSpice пропущена: {type(exc).__name__}: {exc}")
+            else:
+                deviation = max(abs(final_dm - spice_dm), abs(final_cm - spice_cm))
+                if deviation > MNA_TOLERANCE_DB:
+                    print(f"ВНИМАНИЕ: расхождение {BACKEND} с NgSpice {deviation:.3f} dB > {MNA_TOLERANCE_DB} dB")
 
-    freq_dm, db_dm = get_plot_data(real_p, mode='DM')
-    freq_cm, db_cm = get_plot_data(real_p, mode='CM')
+        print("\n" + "="*65)
+        print(f"{'Компонент':<30} | {'Номинал ' + (SERIES if parts is None else 'каталог'):<15}")
+        print("-" * 65)
+        print(f"{'X-конденсатор (Cx)':<30} | {real_p[0]:>10.3f} uF")
+        print(f"{'Синфазный дроссель (Lcm)':<30} | {real_p[1]:>10.3f} mH")
+        print(f"{'Y-конденсаторы (Cy)':<30} | {real_p[2]:>10.3f} nF")
+        if parts is not None:
+            for name, part in parts['parts'].items():
+                print(f"{'  ' + name + ': ' + part['part']:<30} | {part['footprint']}")
+        print("-" * 65)
+        print(f"Затухание DM (Дифференциальное): {final_dm:>8.2f} dB")
+        print(f"Затухание CM (Синфазное):        {final_cm:>8.2f} dB")
+        print(f"Статические потери мощности:     {p_loss:>8.2f} W")
+        if CORNERS is not None:
+            worst = v5_worst_corner(real_p, CORNERS, TARGET_FREQ, DCR_OHM)
+            print(f"Худший из {worst['corners']} углов: DM {worst['dm_db']:>7.2f} dB, CM {worst['cm_db']:>7.2f} dB")
+            print("  " + ", ".join(f"{k}={v}" for k, v in worst['corner'].items()))
+        if YIELD_SAMPLES:
+            mc = yield_analysis(real_p, n_samples=YIELD_SAMPLES, target_freq_khz=TARGET_FREQ, target_db=TARGET_DB,
+                                max_leakage_ma=MAX_LEAKAGE_MA, dcr=DCR_OHM, mask=LIMIT_MASK,
+                                esl=CAP_ESL if LIMIT_MASK is not None else None)
+            print("-" * 65)
+            print(f"Выход годных (Cx ±10%, Cy ±20%, Lcm ±30%, {mc['samples']} шт.): {mc['yield'] * 100:>6.1f} %"
+                  + (" - по маске" if LIMIT_MASK is not None else ""))
+            if CORNERS is not None:
+                print("  Допуски - в номинальной рабочей точке: углы CORNERS в выходе годных не учтены")
+            print(f"  DM: p50 {mc['dm_db']['p50']:>7.2f} dB, p99 {mc['dm_db']['p99']:>7.2f} dB, худший {mc['dm_db']['max']:>7.2f} dB")
+            print(f"  CM: p50 {mc['cm_db']['p50']:>7.2f} dB, p99 {mc['cm_db']['p99']:>7.2f} dB, худший {mc['cm_db']['max']:>7.2f} dB")
+            print(f"  Утечка: худшая {mc['leakage_ma']['max']:>5.2f} mA")
+        if DM_NOISE is not None or CM_NOISE is not None:
+            # Гармоники шума x передаточная функция фильтра, без транзиента NgSpice
+            emission = predict_emission(real_p, DM_NOISE, CM_NOISE, limit=CISPR32_CLASS_B, dcr=DCR_OHM)
+            print("-" * 65)
+            for mode in ('DM', 'CM'):
+                if mode in emission:
+                    freqs, level = emission[mode]
+                    i = np.argmax(level - CISPR32_CLASS_B(freqs))
+                    print(f"Эмиссия {mode}: худшая гармоника {freqs[i] / 1e3:>8.1f} kHz, {level[i]:>6.1f} dBuV")
+            print(f"Запас до CISPR 32 класс B:       {-emission['margin_db']:>8.2f} dB")
+        print(f"Кэш симуляций: {CACHE.hits} попаданий / {CACHE.misses} промахов")
+        print("="*65)
 
-    plt.figure(figsize=(10, 6))
-    plt.semilogx(freq_dm, db_dm, label='Differential Mode (DM)', color='blue', lw=2)
-    plt.semilogx(freq_cm, db_cm, label='Common Mode (CM)', color='red', lw=2, linestyle='--')
-    
-    plt.axvline(x=TARGET_FREQ*1e3, color='green', linestyle=':', label=f'Target {TARGET_FREQ}kHz')
-    plt.axhline(y=TARGET_DB, color='black', linestyle='-', alpha=0.3)
-    
-    plt.title(f'EMI Filter Performance\nCx={real_p[0]}uF, Lcm={real_p[1]}mH, Cy={real_p[2]}nF')
-    plt.xlabel('Frequency (Hz)')
-    plt.ylabel('Attenuation (dB)')
-    plt.grid(True, which="both", ls="-", alpha=0.5)
-    plt.legend()
-    
-    plt.savefig('emc_report.png', dpi=300)
-    print("✅ График сохранен: emc_report.png")
-    print("СТАТУС: ✅ Расчет завершен успешно\n")
\ No newline at end of file
+        # --- Данные отчета: один проверочный свип, картинка - отдельный этап ---
+        with span('v5.plot'):
+            f_axis = np.logspace(4, np.log10(30e6), 400)
+            if parts is not None:
+                curves = {'Differential Mode (DM)': part_gain_db(CATALOG, rows, 'DM', f_axis)[0],
+                          'Common Mode (CM)': part_gain_db(CATALOG, rows, 'CM', f_axis)[0]}
+                rom = FilterRom.from_dict(parts['rom'])
+            else:
+                curves = {'Differential Mode (DM)': simulate_full_filter(real_p, mode='DM', frequencies=f_axis),
+                          'Common Mode (CM)': simulate_full_filter(real_p, mode='CM', frequencies=f_axis)}
+                # ROM (полюса-вычеты DM/CM) хранится в отчете: дальнейшие запросы затухания без симуляции
+                rom = fit_v5_rom(real_p, dcr=DCR_OHM)
+            save_sweep(REPORT_PATH, f_axis, curves, params=list(real_p), rom=rom.to_dict(),
+                       parts=parts and {name: part['part'] for name, part in parts['parts'].items()}, target_db=TARGET_DB,
+                       target_freq_khz=TARGET_FREQ, dpi=300,
+                       title=f'EMI Filter Performance\nCx={real_p[0]}uF, Lcm={real_p[1]}mH, Cy={real_p[2]}nF',
+                       styles={'Differential Mode (DM)': {'color': 'blue', 'lw': 2},
+                               'Common Mode (CM)': {'color': 'red', 'lw': 2, 'linestyle': '--'}},
+                       vlines=[{'x': TARGET_FREQ * 1e3, 'color': 'green', 'linestyle': ':', 'label': f'Target {TARGET_FREQ}kHz'}],
+                       hlines=[{'y': TARGET_DB, 'color': 'black', 'linestyle': '-', 'alpha': 0.3}],
+                       mask=None if LIMIT_MASK is None else np.column_stack([LIMIT_MASK.freqs, LIMIT_MASK.levels]).tolist())
+            print(f"Данные АЧХ сохранены: {REPORT_PATH} (ROM порядка {rom.models['DM'].order}/{rom.models['CM'].order}, "
+                  f"ошибка {rom.error_db:.3f} dB)")
+            png = finish_report(REPORT_PATH, RENDER)
+            if png:
+                print(f"✅ График {'строится в фоне' if RENDER == 'background' else 'сохранен'}: {png}")
+        print("СТАТУС: ✅ Расчет завершен успешно\n")
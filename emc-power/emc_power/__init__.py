@@ -0,0 +1,7 @@
+"""Библиотека расчета ЭМС-фильтров проекта emc-power."""
+
+# Публичный API (только NumPy при импорте). Функция objective перекрывает одноименный
+# подмодуль как атрибут пакета; сам модуль доступен через from emc_power.objective import ...
+from .api import attenuation, objective, optimize, plot, simulate, snap
+
+__all__ = ['simulate', 'objective', 'snap', 'optimize', 'plot', 'attenuation']
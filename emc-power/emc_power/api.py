@@ -0,0 +1,145 @@
+"""
+Программный интерфейс V5 без побочных эффектов при импорте.
+
+simulate / objective / snap / optimize - то же, что делает emc_optimizer_v5.py,
+но в виде функций с параметрами вместо глобальных TARGET_*. Импорт модуля
+тянет только NumPy; SciPy загружается при оптимизации, PySpice - только для
+backend='session', matplotlib - только при построении графика.
+"""
+import numpy as np
+
+from .circuits import V5_DCR_OHM, v5_gain_db
+from .eseries import snap
+from .objective import leakage_ma, v5_feasible, v5_objective_batch, v5_size_cost
+
+__all__ = ['simulate', 'objective', 'snap', 'optimize', 'plot', 'attenuation']
+
+BOUNDS = ((0.01, 20.0), (0.1, 50.0), (0.1, 48.0))
+INITIAL_GUESS = (0.47, 5.0, 4.0)
+
+
+def simulate(params, mode='DM', frequencies=150e3, backend='mna', dcr=V5_DCR_OHM, **model):
+    """
+    Затухание V5, дБ. params: [cx_uF, lcm_mH, cy_nF] или массив (..., 3).
+    Скалярная частота и один набор -> float, иначе массив (..., F).
+    backend: 'mna' (NumPy) или 'session' (NgSpice, PySpice грузится при первом вызове).
+    """
+    if backend == 'session':
+        from .spice_session import spice_session
+        return spice_session('v5', dcr=dcr, **model).simulate(params, mode, frequencies=frequencies)
+    gain = v5_gain_db(params, mode, frequencies, dcr=dcr, **model)
+    return float(gain.ravel()[0]) if gain.size == 1 else gain
+
+
+def objective(params, target_freq_khz=150, target_db=-60, max_leakage_ma=3.5, dcr=V5_DCR_OHM,
+              mask=None, esl=None, backend='mna'):
+    """Оценка V5 (габариты + штрафы, как objective() скрипта); float для одного набора"""
+    scores = v5_objective_batch(params, target_freq_khz, target_db, max_leakage_ma, dcr,
+                                mask=mask, esl=esl, backend=backend)
+    return float(scores[0]) if np.ndim(params) == 1 else scores
+
+
+def optimize(target_freq_khz=150, target_db=-60, max_leakage_ma=3.5, load_current_a=10.0,
+             dcr=V5_DCR_OHM, series='E24', method='slsqp', mask=None, esl=None, x0=INITIAL_GUESS,
+             bounds=BOUNDS, corners=None, catalog=None, cap_voltage_v=0.0):
+    """
+    Полный цикл V5: непрерывный оптимум, дискретный поиск по ряду, финальные замеры.
+    method: 'slsqp' / 'trust-constr' (градиенты MNA), 'de', 'nelder-mead'.
+    corners (corners.V5_CORNERS или своя сетка) - ТЗ в худшем из углов; только 'de' / 'nelder-mead'.
+    catalog (Catalog или путь CSV/Parquet) - реальные детали вместо ряда series: дроссели на ток
+    >= load_current_a, конденсаторы класса >= cap_voltage_v, замеры с паразитами деталей ('parts').
+    Возвращает dict с номиналами и характеристиками (готов к json.dumps) и ROM АЧХ
+    собранного дизайна ('rom', см. attenuation).
+    """
+    from .eseries import discrete_search
+    from .rom import fit_v5_rom
+
+    kwargs = dict(target_freq_khz=target_freq_khz, target_db=target_db, max_leakage_ma=max_leakage_ma, dcr=dcr)
+    if catalog is not None and corners is not None:
+        raise ValueError("Анализ углов с каталогом деталей не поддерживается")
+    if method in ('slsqp', 'trust-constr'):
+        if corners is not None:
+            raise ValueError("Анализ углов поддерживают методы 'de' и 'nelder-mead'")
+        from .constrained import v5_constrained_minimize
+        res = v5_constrained_minimize(x0, bounds=bounds, method='SLSQP' if method == 'slsqp' else method,
+                                      mask=mask, esl=esl, **kwargs)
+    elif method == 'de':
+        from scipy.optimize import differential_evolution
+        from .objective import vectorized
+        res = differential_evolution(vectorized(v5_objective_batch, mask=mask, esl=esl, corners=corners, **kwargs), bounds,
+                                     vectorized=True, updating='deferred', seed=0, tol=1e-6)
+    elif method == 'nelder-mead':
+        from scipy.optimize import minimize
+        res = minimize(lambda p: v5_objective_batch(p, mask=mask, esl=esl, corners=corners, **kwargs)[0], x0,
+                       method='Nelder-Mead', tol=1e-3)
+    else:
+        raise ValueError(f"Неизвестный метод: {method}")
+
+    if catalog is not None:
+        from .catalog import catalog_search, load_catalog, part_summary
+        catalog = load_catalog(catalog) if isinstance(catalog, str) else catalog
+        rows, checked = catalog_search(res.x, catalog, load_current_a, cap_voltage_v, target_freq_khz, target_db,
+                                       max_leakage_ma, mask=mask)
+        if rows is not None:
+            return {'continuous': [float(v) for v in res.x], 'series': 'catalog', 'feasible': True,
+                    'checked': checked, **part_summary(catalog, rows, load_current_a, target_freq_khz)}
+
+    def feasible(cands):
+        return v5_feasible(cands, mask=mask, esl=esl, corners=corners, **kwargs)
+
+    best, checked = discrete_search(res.x, feasible, v5_size_cost, series=series)
+    as_built = [float(v) for v in (best if best is not None else snap(res.x, series))]
+    f = target_freq_khz * 1e3
+    design = {
+        'continuous': [float(v) for v in res.x],
+        'cx_uF': as_built[0], 'lcm_mH': as_built[1], 'cy_nF': as_built[2],
+        'series': series, 'feasible': best is not None, 'checked': checked,
+        'dm_db': simulate(as_built, 'DM', f, dcr=dcr, esl=esl), 'cm_db': simulate(as_built, 'CM', f, dcr=dcr, esl=esl),
+        'leakage_ma': float(leakage_ma(as_built[2])), 'loss_w': 2 * load_current_a**2 * dcr,
+        'size_cost': float(v5_size_cost(as_built)),
+        'rom': fit_v5_rom(as_built, dcr=dcr, esl=esl).to_dict(),
+    }
+    if catalog is not None:
+        design['parts'] = None  # В каталоге нет выполнимой комбинации - дизайн по ряду series
+    if corners is not None:
+        from .corners import v5_worst_corner
+        worst = v5_worst_corner(as_built, corners, target_freq_khz, dcr, esl=esl)
+        design['worst_corner'] = dict(worst, corner={k: repr(v) if not isinstance(v, float) else v
+                                                     for k, v in worst['corner'].items()})
+    return design
+
+
+def attenuation(design, frequencies, mode='DM'):
+    """
+    Затухание сохраненного дизайна по его ROM (dict из optimize или словарь 'rom'), дБ.
+    Без симуляции; mode 'DM', 'CM' или 'worst' (худшее из двух).
+    """
+    from .rom import FilterRom
+
+    rom = FilterRom.from_dict(design.get('rom', design))
+    gain = rom.worst_db(frequencies) if mode == 'worst' else rom.gain_db(frequencies, mode)
+    return float(gain) if np.ndim(gain) == 0 else gain
+
+
+def plot(design, path='emc_report.png', target_freq_khz=150, target_db=-60, dcr=V5_DCR_OHM):
+    """
+    График АЧХ DM/CM дизайна (dict из optimize или [cx, lcm, cy]). Свип сохраняется
+    рядом как .npz (emc_power.report), PNG строится из него; matplotlib грузится здесь.
+    """
+    import os
+    from .report import render, save_sweep
+
+    params = [design['cx_uF'], design['lcm_mH'], design['cy_nF']] if isinstance(design, dict) else list(design)
+    freqs = np.logspace(4, np.log10(30e6), 400)
+    sweep = save_sweep(os.path.splitext(path)[0] + '.npz', freqs,
+                       {'Differential Mode (DM)': simulate(params, 'DM', freqs, dcr=dcr),
+                        'Common Mode (CM)': simulate(params, 'CM', freqs, dcr=dcr)},
+                       params=[float(v) for v in params], rom=design.get('rom') if isinstance(design, dict) else None,
+                       target_db=target_db, target_freq_khz=target_freq_khz, dpi=300,
+                       title=f'EMI Filter Performance\nCx={params[0]}uF, Lcm={params[1]}mH, Cy={params[2]}nF',
+                       styles={'Differential Mode (DM)': {'color': 'blue', 'lw': 2},
+                               'Common Mode (CM)': {'color': 'red', 'lw': 2, 'linestyle': '--'}},
+                       vlines=[{'x': target_freq_khz * 1e3, 'color': 'green', 'linestyle': ':',
+                                'label': f'Target {target_freq_khz}kHz'}],
+                       hlines=[{'y': target_db, 'color': 'black', 'linestyle': '-', 'alpha': 0.3}])
+    return render(sweep, path)
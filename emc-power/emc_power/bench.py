@@ -0,0 +1,255 @@
+"""
+Бенчмарк версий оптимизатора (V2-V5) и бэкендов симуляции.
+
+Скрипты emc_optimizer_v*.py выполняют оптимизацию прямо на уровне модуля,
+поэтому они не импортируются, а загружаются через AST: берутся импорты,
+определения функций/классов и присваивания до первого "рабочего" оператора
+(блок if __name__ == '__main__', баннер print, цикл), плюс литеральные
+присваивания ниже (initial_guess).
+Глобальные константы (BACKEND) подменяются до выполнения определений, так что
+CACHE.wrap и прочее видят нужный бэкенд.
+
+Каждый случай (скрипт, бэкенд) меряется в отдельном процессе (spawn), чтобы
+"запуск" был действительно холодным. Этапы, с, медиана повторов:
+netlist_build, launch (первый вызов), single_point, sweep, optimization, e24_snap.
+"""
+import ast
+import json
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+from .watchdog import is_failure
+
+SCRIPTS = {
+    'v2': {'simulate': 'simulate_filter', 'sweep': {'full_scan': True}, 'backends': ('ngspice', 'session')},
+    'v3': {'simulate': 'simulate_filter', 'sweep': {'full_scan': True}, 'backends': ('ngspice', 'session')},
+    'v4': {'simulate': 'simulate_filter', 'sweep': {'full_scan': True}, 'backends': ('ngspice', 'session')},
+    'v5': {'simulate': 'simulate_full_filter', 'sweep': {'frequencies': np.logspace(4, np.log10(30e6), 100)},
+           'backends': ('mna', 'session', 'ngspice')},
+}
+STAGES = ('netlist_build', 'launch', 'single_point', 'sweep', 'optimization', 'e24_snap')
+_RUN_STATEMENTS = (ast.Expr, ast.If, ast.For, ast.While, ast.With, ast.Try, ast.Pass)
+
+
+def _is_filterwarnings(node):
+    # warnings.filterwarnings(...) в шапке скрипта - часть настройки, а не запуска
+    return (isinstance(node, ast.Expr) and isinstance(node.value, ast.Call)
+            and getattr(node.value.func, 'attr', None) == 'filterwarnings')
+
+
+def _is_literal(node):
+    try:
+        ast.literal_eval(node)
+        return True
+    except ValueError:
+        return False
+
+
+def _is_main_guard(node):
+    return (isinstance(node, ast.If) and isinstance(node.test, ast.Compare)
+            and getattr(node.test.left, 'id', None) == '__name__')
+
+
+def _statements(tree):
+    # Тело блока if __name__ == '__main__' разворачивается: это и есть "рабочая" часть скрипта
+    for node in tree.body:
+        if _is_main_guard(node):
+            yield ast.Pass()
+            yield from node.body
+        else:
+            yield node
+
+
+def load_definitions(path, overrides=None):
+    """
+    Определения скрипта без его модульного запуска -> namespace (dict).
+    overrides: {имя_глобальной_константы: значение}.
+    """
+    with open(path, encoding='utf-8') as fh:
+        tree = ast.parse(fh.read(), filename=path)
+    overrides = overrides or {}
+
+    body, running = [], False
+    for node in _statements(tree):
+        if not running and isinstance(node, _RUN_STATEMENTS) and not _is_filterwarnings(node):
+            running = True
+        if isinstance(node, ast.Assign):
+            names = [t.id for t in node.targets if isinstance(t, ast.Name)]
+            for name in names:
+                if name in overrides:
+                    node.value = ast.copy_location(ast.Constant(overrides[name]), node.value)
+            if running and not _is_literal(node.value):
+                continue
+        elif running:
+            continue
+        body.append(node)
+
+    module = ast.fix_missing_locations(ast.Module(body=body, type_ignores=[]))
+    directory = os.path.dirname(os.path.abspath(path))
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    ns = {'__name__': 'bench_' + os.path.splitext(os.path.basename(path))[0], '__file__': path}
+    exec(compile(module, path, 'exec'), ns)
+    ns['__tree__'] = tree
+    return ns
+
+
+def optimization_call(ns):
+    """Выражение minimize(objective, ...) из модульного кода скрипта (его x0 и tol)"""
+    for node in ast.walk(ns['__tree__']):
+        if isinstance(node, ast.Call) and getattr(node.func, 'id', None) == 'minimize':
+            return ast.fix_missing_locations(ast.Expression(body=node))
+    raise LookupError('minimize(...) не найден')
+
+
+def _initial_guess(ns, path):
+    # Второй аргумент minimize(...) - стартовая точка скрипта
+    node = ast.fix_missing_locations(ast.Expression(body=optimization_call(ns).body.args[1]))
+    return np.asarray(eval(compile(node, path, 'eval'), ns), dtype=float)
+
+
+def _median_time(fn, repeat):
+    times = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        fn(i)
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times))
+
+
+def _netlist_build(version, backend, ns, repeat):
+    from . import circuits, spice_session
+    if backend == 'mna':
+        build = (lambda: circuits.build_v5_filter('DM').compile()) if version == 'v5' \
+            else (lambda: circuits.build_pi_filter(version).compile())
+    elif backend == 'session':
+        build = spice_session._v5_netlist if version == 'v5' else (lambda: spice_session._pi_netlist(version))
+    else:
+        return None  # ngspice: меряется внутри вызовов через подмену Circuit
+    return _median_time(lambda i: build(), repeat)
+
+
+def _timed_circuit(ns, log):
+    # Подмена Circuit в namespace скрипта: время от конструктора до .simulator() - сборка netlist.
+    # Скрипт грузит PySpice сам при первом прогоне (Circuit = None) - подмена его опережает
+    if 'Circuit' not in ns:
+        return
+    base = ns['Circuit']
+    if base is None:
+        from PySpice.Spice.Netlist import Circuit as base
+
+    class TimedCircuit(base):
+        def __init__(self, *args, **kwargs):
+            self._bench_t0 = time.perf_counter()
+            super().__init__(*args, **kwargs)
+
+        def simulator(self, *args, **kwargs):
+            log.append(time.perf_counter() - self._bench_t0)
+            return super().simulator(*args, **kwargs)
+
+    ns['Circuit'] = TimedCircuit
+
+
+def run_case(version, backend, path, repeat=20, optimize=True):
+    """Замер одного случая (скрипт, бэкенд) в текущем процессе -> dict"""
+    spec = SCRIPTS[version]
+    out = {'version': version, 'backend': backend, 'error': None}
+    try:
+        ns = load_definitions(path, {'BACKEND': backend})
+        build_log = []
+        if backend == 'ngspice':
+            _timed_circuit(ns, build_log)
+        simulate = getattr(ns[spec['simulate']], '__wrapped__', ns[spec['simulate']])  # без кэша
+        x0 = _initial_guess(ns, path)
+
+        def point(i):
+            value = simulate(list(x0 * (1 + 1e-3 * i)))
+            if is_failure(value):
+                raise RuntimeError(f'{value} (нет NgSpice?)')
+            return value
+
+        out['netlist_build'] = _netlist_build(version, backend, ns, repeat)
+        t0 = time.perf_counter()
+        point(0)
+        out['launch'] = time.perf_counter() - t0
+        out['single_point'] = _median_time(lambda i: point(i + 1), repeat)
+        if backend == 'ngspice':
+            out['netlist_build'] = float(np.median(build_log)) if build_log else None
+
+        sweep_kwargs = spec['sweep']
+        out['sweep_points'] = len(sweep_kwargs['frequencies']) if 'frequencies' in sweep_kwargs else 'dec 100'
+        out['sweep'] = _median_time(lambda i: simulate(list(x0), **sweep_kwargs), max(1, repeat // 5))
+
+        if optimize:
+            # minimize импортируется в __main__ скрипта, которого load_definitions не исполняет
+            from scipy.optimize import minimize
+            ns.setdefault('minimize', minimize)
+            cache = ns['CACHE']
+            misses = cache.misses
+            t0 = time.perf_counter()
+            res = eval(compile(optimization_call(ns), path, 'eval'), ns)
+            out['optimization'] = time.perf_counter() - t0
+            out['nfev'] = int(res.nfev)
+            out['sim_calls'] = cache.misses - misses
+            out['fun'] = float(res.fun)
+            x = res.x
+        else:
+            x = x0
+        snap = ns['get_closest_e24']
+        out['e24_snap'] = _median_time(lambda i: [snap(v) for v in x], repeat) / len(x)
+    except Exception as exc:
+        out['error'] = f'{type(exc).__name__}: {exc}'
+    return out
+
+
+def run_suite(directory='.', versions=None, backends=None, repeat=20, optimize=True):
+    """Все случаи, каждый в свежем процессе. Возвращает dict для JSON"""
+    results = {}
+    ctx = get_context('spawn')
+    for version in versions or SCRIPTS:
+        path = os.path.join(directory, f'emc_optimizer_{version}.py')
+        for backend in SCRIPTS[version]['backends']:
+            if backends and backend not in backends:
+                continue
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                results[f'{version}/{backend}'] = pool.submit(run_case, version, backend, path,
+                                                              repeat, optimize).result()
+    return {'meta': {'python': platform.python_version(), 'numpy': np.__version__,
+                     'platform': platform.platform(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                     'repeat': repeat},
+            'results': results}
+
+
+def compare(results, baseline, threshold=0.25, min_abs=1e-3):
+    """
+    Регрессии относительно сохраненного baseline: этап медленнее на threshold (доля)
+    и больше чем на min_abs секунд. Возвращает список строк.
+    """
+    regressions = []
+    for case, new in results['results'].items():
+        old = baseline.get('results', {}).get(case)
+        if not old or new.get('error') or old.get('error'):
+            continue
+        for stage in STAGES:
+            a, b = old.get(stage), new.get(stage)
+            if a is None or b is None:
+                continue
+            if b > a * (1 + threshold) and b - a > min_abs:
+                regressions.append(f'{case} {stage}: {a * 1e3:.3f} -> {b * 1e3:.3f} ms ({b / a:.2f}x)')
+    return regressions
+
+
+def save(results, path):
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump(results, fh, indent=2, ensure_ascii=False)
+
+
+def load(path):
+    with open(path, encoding='utf-8') as fh:
+        return json.load(fh)
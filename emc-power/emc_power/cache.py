@@ -0,0 +1,147 @@
+"""
+Кэш результатов симуляции с адресацией по содержимому.
+
+Ключ - хэш квантованных номиналов, остальных аргументов вызова (режим, нагрузка,
+сетка частот, backend) и констант модели (DCR, связь, паразитные параметры).
+В памяти держится ограниченный LRU, опционально результаты пишутся в SQLite
+и переживают перезапуск скрипта. Счетчики hits/misses показывают, сколько
+SPICE-прогонов сэкономлено.
+"""
+import atexit
+import hashlib
+import inspect
+import io
+import json
+import sqlite3
+from collections import OrderedDict
+from functools import wraps
+
+import numpy as np
+
+
+def model_hash(model):
+    """Хэш констант модели: любое изменение DCR/связи/паразитов дает новый ключ"""
+    return hashlib.sha1(json.dumps(model, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _quantize(value, digits):
+    # Значащие цифры: соседние точки симплекса Nelder-Mead попадают в один ключ
+    arr = np.atleast_1d(np.asarray(value, dtype=float))
+    return [float(f'{v:.{digits}g}') for v in arr.ravel()]
+
+
+def _encode(value):
+    buf = io.BytesIO()
+    np.save(buf, np.asarray(value), allow_pickle=False)
+    return buf.getvalue()
+
+
+def _decode(blob):
+    arr = np.load(io.BytesIO(blob), allow_pickle=False)
+    return float(arr) if arr.ndim == 0 else arr
+
+
+class EvaluationCache:
+    def __init__(self, maxsize=4096, path=None, digits=6, commit_every=256):
+        self.maxsize = maxsize
+        self.path = path
+        self.digits = digits
+        self.commit_every = commit_every
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._lru = OrderedDict()
+        self._db = None
+        self._pending = 0
+
+    def _connect(self):
+        if self._db is None and self.path:
+            self._db = sqlite3.connect(self.path)
+            self._db.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value BLOB)')
+            atexit.register(self.close)
+        return self._db
+
+    def key(self, params, model=None, **call):
+        """Ключ вызова: params квантуются, массивы (сетка частот) хэшируются побайтно"""
+        parts = {'params': _quantize(params, self.digits), 'model': model_hash(model or {})}
+        for name, value in sorted(call.items()):
+            if isinstance(value, np.ndarray) or isinstance(value, (list, tuple)):
+                value = hashlib.sha1(np.asarray(value, dtype=float).tobytes()).hexdigest()
+            parts[name] = value
+        return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get(self, key):
+        if key in self._lru:
+            self._lru.move_to_end(key)
+            self.hits += 1
+            return self._lru[key]
+        db = self._connect()
+        if db is not None:
+            row = db.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                value = _decode(row[0])
+                self._remember(key, value)
+                self.hits += 1
+                self.disk_hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def _remember(self, key, value):
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    def put(self, key, value):
+        self._remember(key, value)
+        db = self._connect()
+        if db is not None:
+            db.execute('INSERT OR REPLACE INTO results VALUES (?, ?)', (key, _encode(value)))
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                db.commit()
+                self._pending = 0
+
+    def close(self):
+        if self._db is not None:
+            self._db.commit()
+            self._db.close()
+            self._db = None
+
+    def wrap(self, simulate, model=None):
+        """
+        Мемоизация функции симуляции вида f(params, ...). Ключ строится по всем
+        аргументам вызова; кэшируются только числа и массивы (объекты анализа
+        PySpice из full_scan проходят мимо кэша). model может быть функцией без
+        аргументов - тогда константы модели читаются при каждом вызове (глобалы
+        скрипта, измененные после импорта, попадают в ключ).
+        """
+        signature = inspect.signature(simulate)
+
+        @wraps(simulate)
+        def cached(params, *args, **kwargs):
+            bound = signature.bind(params, *args, **kwargs)
+            bound.apply_defaults()
+            call = dict(bound.arguments)
+            call.pop(next(iter(signature.parameters)))
+            key = self.key(params, model() if callable(model) else model, **call)
+            value = self.get(key)
+            if isinstance(value, np.ndarray):
+                return value.copy()
+            if value is None:
+                value = simulate(params, *args, **kwargs)
+                # Сбой симуляции (SimFailure из watchdog) - не число, его не запоминаем
+                if isinstance(value, (float, np.floating)):
+                    self.put(key, value)
+                elif isinstance(value, np.ndarray):
+                    self.put(key, value.copy())  # Вызывающий может менять свой массив
+            return value
+
+        cached.cache = self
+        return cached
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'disk_hits': self.disk_hits,
+                'hit_rate': self.hits / total if total else 0.0, 'size': len(self._lru)}
@@ -0,0 +1,282 @@
+"""
+Каталог реальных компонентов вместо идеального снапа к ряду E24.
+
+Записи (дроссели, X- и Y-конденсаторы) грузятся из CSV/Parquet в столбцы NumPy.
+Индекс - отсортированные log-номиналы подмножества, выбранного фильтрами
+(тип, мин. номинальный ток, мин. класс напряжения, корпус). Пороги фильтров
+приводятся к уровням, реально встречающимся в каталоге, поэтому индексы строятся
+один раз на комбинацию уровней и кэшируются; запрос - np.searchsorted по готовому
+массиву (микросекунды). Собранный дизайн считается с паразитами выбранных деталей:
+DCR и связь дросселя, ESR/ESL конденсаторов.
+
+Столбцы: part, kind ('choke' | 'x' | 'y'), value (Гн / Ф), rated_current_a, voltage_v,
+footprint, dcr_ohm, coupling, esr_ohm, esl_h. Отсутствующие числовые столбцы -
+NaN (в модели берутся константы V5).
+"""
+import csv
+import os
+
+import numpy as np
+
+from .circuits import V5_CAP_ESL, V5_CAP_ESR, V5_COUPLING, V5_DCR_OHM, v5_template, v5_values
+from .mask import adaptive_sweep, worst_margin
+from .objective import leakage_ma, v5_size_cost
+
+TEXT_COLUMNS = ('part', 'kind', 'footprint')
+NUMBER_COLUMNS = ('value', 'rated_current_a', 'voltage_v', 'dcr_ohm', 'coupling', 'esr_ohm', 'esl_h')
+KINDS = ('choke', 'x', 'y')
+# Параметр V5 -> тип детали и множитель единиц (uF, mH, nF -> СИ)
+V5_PART_KINDS = (('x', 1e-6), ('choke', 1e-3), ('y', 1e-9))
+ENUM_CHUNK = 1 << 16  # Комбинаций деталей за один шаг перебора (цена, утечка)
+EVAL_CHUNK = 256     # Комбинаций за одно батч-решение MNA
+
+
+class Catalog:
+    """Каталог деталей: столбцы-массивы одинаковой длины и кэш индексов"""
+    def __init__(self, columns):
+        n = len(columns['value'])
+        self.columns = {}
+        for name in TEXT_COLUMNS:
+            self.columns[name] = np.asarray(columns.get(name, [''] * n), dtype=str)
+        for name in NUMBER_COLUMNS:
+            col = columns.get(name)
+            self.columns[name] = np.full(n, np.nan) if col is None else np.asarray(col, dtype=float)
+        unknown = set(self.columns['kind']) - set(KINDS)
+        if unknown:
+            raise ValueError(f"Неизвестные типы деталей: {sorted(unknown)}")
+        self._levels = {name: np.unique(np.nan_to_num(self.columns[name], nan=np.inf))
+                        for name in ('rated_current_a', 'voltage_v')}
+        self._indexes = {}
+
+    def __len__(self):
+        return len(self.columns['value'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def row(self, i):
+        """Запись детали: dict столбец -> значение"""
+        return {name: str(col[i]) if name in TEXT_COLUMNS else (None if np.isnan(col[i]) else float(col[i]))
+                for name, col in self.columns.items()}
+
+    def _level(self, name, minimum):
+        # Порог -> наименьший уровень каталога >= порога: равносильные запросы делят один индекс
+        levels = self._levels[name]
+        i = np.searchsorted(levels, minimum)
+        return levels[i] if i < len(levels) else np.inf
+
+    def index(self, kind, min_current=0.0, min_voltage=0.0, footprint=None):
+        """
+        (log10 различных номиналов по возрастанию, начала их групп, номера строк) подмножества;
+        строится один раз. Строки отсортированы по номиналу, внутри номинала - лучшая первой
+        (дроссель - меньший DCR, конденсатор - меньший ESL).
+        """
+        if footprint is not None and not isinstance(footprint, str):
+            footprint = tuple(sorted(footprint))
+        key = (kind, self._level('rated_current_a', min_current), self._level('voltage_v', min_voltage), footprint)
+        if key not in self._indexes:
+            c = self.columns
+            ok = c['kind'] == kind
+            # Не указанный в каталоге ток/напряжение считается неограниченным
+            if key[1] > self._levels['rated_current_a'][0]:
+                ok &= ~(c['rated_current_a'] < key[1])
+            if key[2] > self._levels['voltage_v'][0]:
+                ok &= ~(c['voltage_v'] < key[2])
+            if footprint is not None:
+                ok &= np.isin(c['footprint'], [footprint] if isinstance(footprint, str) else footprint)
+            rows = np.flatnonzero(ok)
+            prefer = (np.nan_to_num(c['dcr_ohm'][rows], nan=V5_DCR_OHM) if kind == 'choke'
+                      else np.nan_to_num(c['esl_h'][rows], nan=V5_CAP_ESL))
+            rows = rows[np.lexsort((prefer, c['value'][rows]))]
+            logv, starts = np.unique(np.log10(c['value'][rows]), return_index=True)
+            self._indexes[key] = (logv, starts, rows)
+        return self._indexes[key]
+
+    def nearest(self, kind, value, count=1, min_current=0.0, min_voltage=0.0, footprint=None, per_value=1):
+        """
+        Строки деталей count различных номиналов, ближайших к value (в логарифме), при
+        номинальном токе >= min_current, классе напряжения >= min_voltage и корпусе footprint:
+        per_value лучших строк на номинал (None - все). Порядок - по удаленности номинала.
+        Пример: дроссели на ток нагрузки пяти номиналов, ближайших к 20 мГн -
+        catalog.nearest('choke', 20e-3, count=5, min_current=LOAD_CURRENT_A).
+        """
+        logv, starts, rows = self.index(kind, min_current, min_voltage, footprint)
+        pos = np.searchsorted(logv, np.log10(value))
+        lo, hi = max(0, pos - count), min(len(logv), pos + count)
+        near = lo + np.argsort(np.abs(logv[lo:hi] - np.log10(value)), kind='stable')[:count]
+        ends = np.append(starts[1:], len(rows))
+        return np.concatenate([rows[starts[i]:ends[i] if per_value is None else min(ends[i], starts[i] + per_value)]
+                               for i in near]) if len(near) else rows[:0]
+
+
+def load_catalog(path):
+    """Каталог из CSV (заголовок - имена столбцов) или Parquet (нужен pyarrow)"""
+    if os.path.splitext(path)[1].lower() in ('.parquet', '.pq'):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise ImportError("Для каталога в Parquet нужен pyarrow (pip install pyarrow)") from exc
+        table = pq.read_table(path)
+        return Catalog({name: table.column(name).to_numpy(zero_copy_only=False) for name in table.column_names})
+    with open(path, newline='', encoding='utf-8') as fh:
+        reader = csv.reader(fh)
+        header = [h.strip() for h in next(reader)]
+        data = list(zip(*reader))
+    columns = {}
+    for name, col in zip(header, data):
+        if name in NUMBER_COLUMNS:
+            columns[name] = np.array([float(v) if v.strip() else np.nan for v in col])
+        else:
+            columns[name] = np.array(col)
+    return Catalog(columns)
+
+
+def save_catalog(catalog, path):
+    """Каталог в CSV (для Parquet - через pyarrow.Table.from_pydict(catalog.columns))"""
+    names = TEXT_COLUMNS + NUMBER_COLUMNS
+    with open(path, 'w', newline='', encoding='utf-8') as fh:
+        writer = csv.writer(fh)
+        writer.writerow(names)
+        writer.writerows(zip(*(catalog[name] for name in names)))
+    return path
+
+
+def demo_catalog(rows=30000, seed=0):
+    """
+    Синтетический каталог для примеров и замеров (не реальные детали): номиналы E12,
+    DCR дросселя растет с индуктивностью и падает с номинальным током, ESL - с корпусом.
+    """
+    rng = np.random.default_rng(seed)
+    e12 = np.array([1.0, 1.2, 1.5, 1.8, 2.2, 2.7, 3.3, 3.9, 4.7, 5.6, 6.8, 8.2])
+    kind = rng.choice(KINDS, rows, p=[0.4, 0.3, 0.3])
+    decade = {'choke': (-4, -1), 'x': (-8, -5), 'y': (-11, -8)}
+    value = np.empty(rows)
+    for k, (lo, hi) in decade.items():
+        m = kind == k
+        value[m] = [float(f'{v:.2g}') for v in rng.choice(e12, m.sum()) * 10.0**rng.integers(lo, hi + 1, m.sum())]
+    choke, cap = kind == 'choke', kind != 'choke'
+    current = np.where(choke, rng.choice([0.5, 1, 2, 3, 4, 6, 8, 10, 12, 16, 20, 25, 30], rows), np.nan)
+    voltage = np.where(choke, rng.choice([250, 300, 500], rows),
+                       np.where(kind == 'x', rng.choice([275, 310, 440], rows), rng.choice([250, 300, 500], rows)))
+    footprint = np.where(choke, rng.choice(['THT-V', 'THT-H'], rows), rng.choice(['THT-7.5', 'THT-15', 'SMD-2220'], rows))
+    dcr = np.where(choke, V5_DCR_OHM * np.sqrt(value / 10e-3) * 10 / np.nan_to_num(current, nan=1)
+                   * rng.uniform(0.7, 1.3, rows), np.nan)
+    coupling = np.where(choke, rng.uniform(0.990, 0.998, rows), np.nan)
+    esr = np.where(cap, rng.uniform(5e-3, 40e-3, rows), np.nan)
+    esl = np.where(cap, np.select([footprint == 'SMD-2220', footprint == 'THT-7.5'], [1.5e-9, 3e-9], 6e-9)
+                   * rng.uniform(0.8, 1.2, rows), np.nan)
+    part = np.array([f'{k.upper()}-{i:05d}' for i, k in enumerate(kind)])
+    return Catalog({'part': part, 'kind': kind, 'value': value, 'rated_current_a': current, 'voltage_v': voltage,
+                    'footprint': footprint, 'dcr_ohm': dcr, 'coupling': coupling, 'esr_ohm': esr, 'esl_h': esl})
+
+
+def part_values(catalog, rows):
+    """
+    Строки деталей (N, 3) [Cx, Lcm, Cy] -> (params (N, 3) в uF/mH/nF, значения элементов
+    шаблона V5 с паразитами: DCR и k дросселя, ESR/ESL каждого конденсатора).
+    """
+    rows = np.atleast_2d(rows)
+    c = catalog.columns
+    params = np.stack([c['value'][rows[:, i]] / scale for i, (_, scale) in enumerate(V5_PART_KINDS)], axis=-1)
+
+    def col(name, i, default):
+        return np.nan_to_num(c[name][rows[:, i]], nan=default)
+
+    values = v5_values(params, k=col('coupling', 1, V5_COUPLING), dcr=col('dcr_ohm', 1, V5_DCR_OHM),
+                       esr=V5_CAP_ESR, esl=V5_CAP_ESL)
+    for cap, i in (('x1', 0), ('y1', 2), ('y2', 2)):
+        values[f'R{cap}_esr'] = col('esr_ohm', i, V5_CAP_ESR)
+        values[f'L{cap}_esl'] = col('esl_h', i, V5_CAP_ESL)
+    return params, values
+
+
+def part_response(catalog, rows, mode='DM', frequencies=150e3):
+    """Комплексный выход V5, собранного из деталей каталога (с их паразитами), (N, F)"""
+    _, values = part_values(catalog, rows)
+    res = v5_template(mode, True).solve(frequencies, values)
+    return res.n3_p - res.n3_n if mode == 'DM' else res.n3_p
+
+
+def part_gain_db(catalog, rows, mode='DM', frequencies=150e3):
+    """Затухание V5 из деталей каталога, дБ (N, F)"""
+    return 20 * np.log10(np.abs(part_response(catalog, rows, mode, frequencies)) + 1e-15)
+
+
+def part_excess(catalog, rows, target_freq_khz=150, target_db=-60, mask=None):
+    """Худшее из DM/CM превышение требования для комбинаций деталей, дБ (N,)"""
+    def response(freqs):
+        return np.maximum(part_gain_db(catalog, rows, 'DM', freqs), part_gain_db(catalog, rows, 'CM', freqs))
+
+    if mask is None:
+        return response(target_freq_khz * 1e3)[:, 0] - target_db
+    freqs, gains = adaptive_sweep(response, *mask.band, mask=mask)
+    return worst_margin(freqs, gains, mask)
+
+
+def catalog_search(x0, catalog, load_current_a=10.0, cap_voltage_v=0.0, target_freq_khz=150, target_db=-60,
+                   max_leakage_ma=3.5, mask=None, footprints=None, counts=(3, 6, 12)):
+    """
+    Самая дешевая выполнимая комбинация реальных деталей вокруг непрерывного оптимума
+    x0 = [cx_uF, lcm_mH, cy_nF]: по count ближайших различных номиналов каждого типа
+    (лучшая деталь номинала; дроссели на ток >= load_current_a, конденсаторы класса
+    >= cap_voltage_v), проверка ТЗ с паразитами деталей. Окрестность растет по counts,
+    пока нет решения, и еще на шаг после (как discrete_search). Комбинации перебираются
+    и считаются порциями (ENUM_CHUNK / EVAL_CHUNK) - память не зависит от counts.
+    footprints: {'choke' | 'x' | 'y': корпус или список корпусов}.
+    Возвращает (строки [Cx, Lcm, Cy] или None, число проверенных комбинаций).
+    """
+    footprints = footprints or {}
+    best, best_cost, checked = None, np.inf, 0
+    options = [np.zeros(0, dtype=int)] * 3
+    found = False
+    for count in counts:
+        if found:
+            break
+        found = best is not None
+        prev = [len(o) for o in options]
+        # Новые номиналы - в конец: комбинации прошлых шагов - те, где все индексы < prev
+        for i, (x, (kind, scale)) in enumerate(zip(x0, V5_PART_KINDS)):
+            near = catalog.nearest(kind, x * scale, count, min_current=load_current_a if kind == 'choke' else 0.0,
+                                   min_voltage=cap_voltage_v if kind != 'choke' else 0.0, footprint=footprints.get(kind))
+            options[i] = np.concatenate([options[i], near[~np.isin(near, options[i])]])
+        shape = tuple(len(o) for o in options)
+        values = [catalog['value'][o] / scale for o, (_, scale) in zip(options, V5_PART_KINDS)]
+        total = int(np.prod(shape))
+        for start in range(0, total, ENUM_CHUNK):
+            idx = np.unravel_index(np.arange(start, min(start + ENUM_CHUNK, total)), shape)
+            params = np.stack([v[i] for v, i in zip(values, idx)], axis=-1)
+            costs = v5_size_cost(params)
+            keep = ((costs < best_cost) & (leakage_ma(params[:, 2]) <= max_leakage_ma)
+                    & np.any([i >= p for i, p in zip(idx, prev)], axis=0))
+            order = np.flatnonzero(keep)[np.argsort(costs[keep], kind='stable')]
+            rows = np.stack([o[i[order]] for o, i in zip(options, idx)], axis=-1)
+            # По возрастанию цены: первая выполнимая порция закрывает этот кусок перебора
+            for lo in range(0, len(rows), EVAL_CHUNK):
+                ok = part_excess(catalog, rows[lo:lo + EVAL_CHUNK], target_freq_khz, target_db, mask) <= 0
+                checked += len(ok)
+                if ok.any():
+                    first = lo + np.argmax(ok)
+                    best, best_cost = rows[first], costs[order[first]]
+                    break
+    return best, checked
+
+
+def part_summary(catalog, rows, load_current_a=10.0, target_freq_khz=150):
+    """Характеристики собранного из деталей дизайна и его ROM (готово к json.dumps)"""
+    from .rom import fit_filter_rom
+
+    rows = np.asarray(rows, dtype=int)
+    params, values = part_values(catalog, rows)
+    f = target_freq_khz * 1e3
+    dcr = float(values['Rdcr1'][0])
+    return {
+        'parts': {name: catalog.row(r) for name, r in zip(('cx', 'lcm', 'cy'), rows)},
+        # Номиналы в единицах V5 без хвостов деления (2.2e-8 / 1e-9 -> 22.0)
+        'cx_uF': float(f'{params[0, 0]:.12g}'), 'lcm_mH': float(f'{params[0, 1]:.12g}'),
+        'cy_nF': float(f'{params[0, 2]:.12g}'),
+        'dm_db': float(part_gain_db(catalog, rows, 'DM', f)[0, 0]),
+        'cm_db': float(part_gain_db(catalog, rows, 'CM', f)[0, 0]),
+        'leakage_ma': float(leakage_ma(params[0, 2])), 'loss_w': 2 * load_current_a**2 * dcr,
+        'size_cost': float(v5_size_cost(params[0])),
+        'rom': fit_filter_rom(lambda mode, freqs: part_response(catalog, rows, mode, freqs)[0]).to_dict(),
+    }
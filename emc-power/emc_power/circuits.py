@@ -0,0 +1,246 @@
+"""
+Топологии фильтров проекта в виде шаблонов MNA.
+
+Схемы повторяют netlist'ы скриптов emc_optimizer_v*.py один в один, чтобы
+встроенный решатель и NgSpice считали одну и ту же модель.
+"""
+import numpy as np
+
+from .mna import Netlist
+
+# --- Модель V5 (CMC + Cx + Cy) ---
+V5_R_SOURCE = 25.0       # Сопротивления источника (LISN-подобные), Ом
+V5_R_LOAD = 50.0         # Нагрузка, Ом
+V5_COUPLING = 0.995      # Коэффициент связи обмоток дросселя
+V5_DCR_OHM = 0.005       # Сопротивление обмоток дросселя, Ом
+V5_CAP_ESR = 15e-3       # Паразиты конденсаторов как в V3/V4 (если включены), Ом
+V5_CAP_ESL = 3e-9        # Гн
+
+# --- Модели П-фильтра V2-V4 (паразитные параметры: ESR/ESL конденсаторов, DCR дросселя) ---
+PI_R_SOURCE = 50.0
+PI_MODELS = {
+    'v2': {'esr': 10e-3, 'esl': 2e-9, 'dcr': 50e-3},
+    'v3': {'esr': 15e-3, 'esl': 3e-9, 'dcr': 60e-3},
+    'v4': {'esr': 15e-3, 'esl': 3e-9, 'dcr': 60e-3},
+}
+
+_TEMPLATES = {}
+
+
+def build_v5_filter(mode='DM', cap_parasitics=False, impedances=False):
+    """
+    Netlist фильтра V5; номиналы Cx/Lcm/Cy и параметры модели подставляются при решении.
+    cap_parasitics=True добавляет ESR/ESL последовательно с Cx и Cy (собственный резонанс).
+    impedances=True - источник и нагрузка комплексные (Zrs1, Zrs2, Zload) для анализа углов.
+    """
+    circuit = Netlist(f'EMC_Final_V5_{mode}')
+    res = circuit.Z if impedances else circuit.R
+
+    def cap(name, n1, n2, value):
+        if not cap_parasitics:
+            circuit.C(name, n1, n2, value)
+            return
+        circuit.C(name, n1, f'{name}_i', value)
+        circuit.R(f'{name}_esr', f'{name}_i', f'{name}_l', V5_CAP_ESR)
+        circuit.L(f'{name}_esl', f'{name}_l', n2, V5_CAP_ESL)
+
+    if mode == 'DM':
+        circuit.V('input', 'n_in_p', 'n_in_n')
+        res('rs1', 'n_in_p', 'n1_p', V5_R_SOURCE)
+        res('rs2', 'n_in_n', 'n1_n', V5_R_SOURCE)
+    else:  # Common Mode
+        circuit.V('input', 'n_common', circuit.gnd)
+        res('rs1', 'n_common', 'n1_p', V5_R_SOURCE)
+        res('rs2', 'n_common', 'n1_n', V5_R_SOURCE)
+
+    cap('x1', 'n1_p', 'n1_n', 1e-6)
+    circuit.L('cm1', 'n1_p', 'n2_p', 1e-3)
+    circuit.L('cm2', 'n1_n', 'n2_n', 1e-3)
+    circuit.K('k_core', 'Lcm1', 'Lcm2', V5_COUPLING)
+    circuit.R('dcr1', 'n2_p', 'n3_p', V5_DCR_OHM)
+    circuit.R('dcr2', 'n2_n', 'n3_n', V5_DCR_OHM)
+    cap('y1', 'n3_p', circuit.gnd, 1e-9)
+    cap('y2', 'n3_n', circuit.gnd, 1e-9)
+    res('load', 'n3_p', 'n3_n', V5_R_LOAD)
+    return circuit
+
+
+def v5_template(mode='DM', cap_parasitics=False, impedances=False):
+    """Скомпилированный шаблон V5 (строится один раз на режим)"""
+    key = ('v5', mode, cap_parasitics, impedances)
+    if key not in _TEMPLATES:
+        _TEMPLATES[key] = build_v5_filter(mode, cap_parasitics, impedances).compile()
+    return _TEMPLATES[key]
+
+
+def v5_values(params, r_source=V5_R_SOURCE, r_load=V5_R_LOAD, k=V5_COUPLING, dcr=V5_DCR_OHM,
+              esr=None, esl=None):
+    """
+    params: [cx_uF, lcm_mH, cy_nF] или массив (..., 3) -> значения элементов в СИ.
+    esr/esl заданы - значения для шаблона с паразитами конденсаторов.
+    """
+    p = np.asarray(params, dtype=float)
+    cx, lcm, cy = p[..., 0] * 1e-6, p[..., 1] * 1e-3, p[..., 2] * 1e-9
+    values = {
+        'Rrs1': r_source, 'Rrs2': r_source,
+        'Cx1': cx, 'Lcm1': lcm, 'Lcm2': lcm, 'Kk_core': k,
+        'Rdcr1': dcr, 'Rdcr2': dcr,
+        'Cy1': cy, 'Cy2': cy, 'Rload': r_load,
+    }
+    if esr is not None or esl is not None:
+        for cap in ('x1', 'y1', 'y2'):
+            values[f'R{cap}_esr'] = V5_CAP_ESR if esr is None else esr
+            values[f'L{cap}_esl'] = V5_CAP_ESL if esl is None else esl
+    return values
+
+
+def v5_response(params, mode='DM', frequencies=150e3, **model):
+    """
+    Комплексное выходное напряжение V5 (DM: V(n3_p) - V(n3_n), CM: V(n3_p)); форма (..., F).
+    model: r_source, r_load, k, dcr и esr/esl (включают паразиты конденсаторов).
+    """
+    parasitics = model.get('esr') is not None or model.get('esl') is not None
+    res = v5_template(mode, parasitics).solve(frequencies, v5_values(params, **model))
+    return res.n3_p - res.n3_n if mode == 'DM' else res.n3_p
+
+
+def v5_gain_db(params, mode='DM', frequencies=150e3, **model):
+    """Затухание V5 в дБ (1 В на входе), как в simulate_full_filter"""
+    return 20 * np.log10(np.abs(v5_response(params, mode, frequencies, **model)) + 1e-15)
+
+
+# --- Модель V5 на плате: дорожки между элементами как RLC-лестницы, ESR/ESL конденсаторов ---
+PCB_TRACE = {'r': 1e-3, 'l': 7e-9, 'c': 1e-12}  # Звено ~1 см дорожки: Ом, Гн, Ф на землю
+
+
+def add_trace(circuit, name, n1, n2, segments, r=PCB_TRACE['r'], l=PCB_TRACE['l'], c=PCB_TRACE['c']):
+    """Дорожка n1 -> n2 из segments звеньев: R и L последовательно, C на землю в конце звена"""
+    prev = n1
+    for i in range(segments):
+        nxt = n2 if i == segments - 1 else f'{name}_{i}'
+        circuit.R(f'{name}_{i}', prev, f'{name}_{i}_m', r)
+        circuit.L(f'{name}_{i}', f'{name}_{i}_m', nxt, l)
+        circuit.C(f'{name}_{i}', nxt, circuit.gnd, c)
+        prev = nxt
+
+
+def build_v5_board(mode='DM', segments=10):
+    """
+    V5 с паразитами платы: ESR/ESL у Cx/Cy и дорожки (по segments звеньев) от
+    источника к Cx, от Cx к дросселю, от дросселя к Cy и от Cy к нагрузке.
+    Имена номиналов те же, что у build_v5_filter(cap_parasitics=True) - годится v5_values(..., esl=...).
+    При segments=10 - 260 неизвестных (DM).
+    """
+    circuit = Netlist(f'EMC_Board_V5_{mode}_{segments}')
+
+    def cap(name, n1, n2, value):
+        circuit.C(name, n1, f'{name}_i', value)
+        circuit.R(f'{name}_esr', f'{name}_i', f'{name}_l', V5_CAP_ESR)
+        circuit.L(f'{name}_esl', f'{name}_l', n2, V5_CAP_ESL)
+
+    if mode == 'DM':
+        circuit.V('input', 'n_in_p', 'n_in_n')
+        circuit.R('rs1', 'n_in_p', 's_p', V5_R_SOURCE)
+        circuit.R('rs2', 'n_in_n', 's_n', V5_R_SOURCE)
+    else:  # Common Mode
+        circuit.V('input', 'n_common', circuit.gnd)
+        circuit.R('rs1', 'n_common', 's_p', V5_R_SOURCE)
+        circuit.R('rs2', 'n_common', 's_n', V5_R_SOURCE)
+
+    for line in ('p', 'n'):
+        add_trace(circuit, f't1{line}', f's_{line}', f'n1_{line}', segments)
+        add_trace(circuit, f't2{line}', f'n1_{line}', f'c_{line}', segments)
+        add_trace(circuit, f't3{line}', f'n2_{line}', f'y_{line}', segments)
+        add_trace(circuit, f't4{line}', f'y_{line}', f'n3_{line}', segments)
+    cap('x1', 'n1_p', 'n1_n', 1e-6)
+    circuit.L('cm1', 'c_p', 'd_p', 1e-3)
+    circuit.L('cm2', 'c_n', 'd_n', 1e-3)
+    circuit.K('k_core', 'Lcm1', 'Lcm2', V5_COUPLING)
+    circuit.R('dcr1', 'd_p', 'n2_p', V5_DCR_OHM)
+    circuit.R('dcr2', 'd_n', 'n2_n', V5_DCR_OHM)
+    cap('y1', 'y_p', circuit.gnd, 1e-9)
+    cap('y2', 'y_n', circuit.gnd, 1e-9)
+    circuit.R('load', 'n3_p', 'n3_n', V5_R_LOAD)
+    return circuit
+
+
+def v5_board_template(mode='DM', segments=10):
+    """Шаблон V5 на плате; от SPARSE_MIN_SIZE неизвестных - разреженный (emc_power.sparse)"""
+    key = ('v5_board', mode, segments)
+    if key not in _TEMPLATES:
+        _TEMPLATES[key] = build_v5_board(mode, segments).compile()
+    return _TEMPLATES[key]
+
+
+def v5_board_gain_db(params, mode='DM', frequencies=150e3, segments=10, **model):
+    """Затухание V5 с паразитами платы в дБ; model - как у v5_values (esr/esl конденсаторов)"""
+    model.setdefault('esl', V5_CAP_ESL)
+    res = v5_board_template(mode, segments).solve(frequencies, v5_values(params, **model))
+    v = res.n3_p - res.n3_n if mode == 'DM' else res.n3_p
+    return 20 * np.log10(np.abs(v) + 1e-15)
+
+
+# Параметр оптимизации -> элементы схемы и множитель единиц (uF, mH, nF -> СИ)
+V5_PARAM_ELEMENTS = (('Cx1',), ('Lcm1', 'Lcm2'), ('Cy1', 'Cy2'))
+V5_PARAM_SCALE = (1e-6, 1e-3, 1e-9)
+
+
+def v5_gain_db_grad(params, mode='DM', frequencies=150e3, **model):
+    """
+    Затухание V5 в дБ и его точные производные по [cx_uF, lcm_mH, cy_nF]
+    (прямая чувствительность MNA). Возвращает (gain (..., F), grad (..., F, 3)).
+    """
+    parasitics = model.get('esr') is not None or model.get('esl') is not None
+    names = [name for group in V5_PARAM_ELEMENTS for name in group]
+    tpl = v5_template(mode, parasitics)
+    res, dx = tpl.solve_sensitivity(frequencies, v5_values(params, **model), names)
+
+    def out(x):
+        return x[..., tpl.nodes['n3_p']] - x[..., tpl.nodes['n3_n']] if mode == 'DM' else x[..., tpl.nodes['n3_p']]
+
+    v = out(res.x)
+    gain = 20 * np.log10(np.abs(v) + 1e-15)
+    # d(20 log10 |v|) = 20 / ln10 * Re(conj(v) dv) / |v|^2
+    scale = 20 / np.log(10) / np.maximum(np.abs(v)**2, 1e-30)
+    grad = []
+    for group, unit in zip(V5_PARAM_ELEMENTS, V5_PARAM_SCALE):
+        dv = sum(out(dx[name]) for name in group)
+        grad.append(scale * np.real(np.conj(v) * dv) * unit)
+    return gain, np.stack(grad, axis=-1)
+
+
+def build_pi_filter(version='v4'):
+    """Netlist П-фильтра V2-V4; номиналы L/C1/C2 и нагрузка подставляются при решении"""
+    model = PI_MODELS[version]
+    circuit = Netlist(f'EMC_Optimizer_{version.upper()}')
+    circuit.V('input', 'input_gen', circuit.gnd)
+    circuit.R('source', 'input_gen', 'n1', PI_R_SOURCE)
+    circuit.C(1, 'n1', 'c1_i', 1e-6)
+    circuit.R('c1r', 'c1_i', 'c1_l', model['esr'])
+    circuit.L('c1l', 'c1_l', circuit.gnd, model['esl'])
+    circuit.L(1, 'n1', 'l1_i', 1e-6)
+    circuit.R('l1r', 'l1_i', 'n2', model['dcr'])
+    circuit.C(2, 'n2', 'c2_i', 1e-6)
+    circuit.R('c2r', 'c2_i', 'c2_l', model['esr'])
+    circuit.L('c2l', 'c2_l', circuit.gnd, model['esl'])
+    circuit.R('load', 'n2', circuit.gnd, 50.0)
+    return circuit
+
+
+def pi_template(version='v4'):
+    key = ('pi', version)
+    if key not in _TEMPLATES:
+        _TEMPLATES[key] = build_pi_filter(version).compile()
+    return _TEMPLATES[key]
+
+
+def pi_values(params, r_load=50.0):
+    """params: [L_uH, C1_uF, C2_uF] или массив (..., 3) -> значения элементов в СИ"""
+    p = np.asarray(params, dtype=float)
+    return {'L1': p[..., 0] * 1e-6, 'C1': p[..., 1] * 1e-6, 'C2': p[..., 2] * 1e-6, 'Rload': r_load}
+
+
+def pi_gain_db(params, version='v4', frequencies=150e3, r_load=50.0):
+    """Затухание П-фильтра V(n2) в дБ; r_load может быть массивом, совместимым по форме с params"""
+    res = pi_template(version).solve(frequencies, pi_values(params, r_load))
+    return 20 * np.log10(np.abs(res.n2) + 1e-15)
@@ -0,0 +1,123 @@
+"""
+Командная строка V5: python -m emc_power --target-db -60 --max-leakage-ma 3.5 ...
+
+Параметры ТЗ передаются аргументами, результат - таблица или JSON (--json).
+--batch jobs.jsonl|csv - пакет заданий на пуле процессов с дозаписью в --output
+и возобновлением по --checkpoint.
+--synthesize - перебор топологий (emc_power.topology) вместо одной схемы V5.
+Загружаются только нужные модули: SciPy при оптимизации, matplotlib при --plot.
+"""
+import argparse
+import json
+import sys
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='emc_power', description='Оптимизация EMI-фильтра V5 (DM + CM)')
+    parser.add_argument('--freq-khz', type=float, default=150, help='частота анализа, кГц (150)')
+    parser.add_argument('--target-db', type=float, default=-60, help='целевое затухание, дБ (-60)')
+    parser.add_argument('--max-leakage-ma', type=float, default=3.5, help='предельный ток утечки, мА (3.5)')
+    parser.add_argument('--load-current', type=float, default=10.0, help='ток нагрузки, А (10)')
+    parser.add_argument('--dcr', type=float, default=0.005, help='сопротивление обмотки, Ом (0.005)')
+    parser.add_argument('--series', default='E24', choices=['E12', 'E24', 'E48', 'E96'], help='ряд номиналов')
+    parser.add_argument('--method', choices=['slsqp', 'trust-constr', 'de', 'nelder-mead'],
+                        help='метод поиска (slsqp; с --corners - de)')
+    parser.add_argument('--mask', action='store_true', help='проверка всей полосы по маске в духе CISPR')
+    parser.add_argument('--esl', type=float, default=3e-9, help='ESL конденсаторов для --mask, Гн')
+    parser.add_argument('--corners', action='store_true',
+                        help='ТЗ в худшем из углов: нагрузка, источник, связь, DCR(T) (методы de / nelder-mead; по умолчанию de)')
+    parser.add_argument('--synthesize', action='store_true',
+                        help='перебор топологий (одна/две ступени, DM-дроссель, второй Cx) с ранжированием по габаритам')
+    parser.add_argument('--margin-db', type=float, default=0.0, help='требуемый запас ниже цели для --synthesize, дБ')
+    parser.add_argument('--catalog', metavar='PARTS', help='каталог деталей CSV/Parquet вместо ряда --series')
+    parser.add_argument('--cap-voltage', type=float, default=0.0, help='мин. класс напряжения конденсаторов из каталога, В')
+    parser.add_argument('--plot', metavar='PNG', help='сохранить график АЧХ')
+    parser.add_argument('--json', action='store_true', help='вывод в JSON')
+    parser.add_argument('--batch', metavar='JOBS', help='файл заданий JSONL/CSV (поля - аргументы optimize)')
+    parser.add_argument('--output', default='results.jsonl', help='результаты пакета: .jsonl или .csv')
+    parser.add_argument('--checkpoint', help='контрольная точка пакета (возобновление после прерывания)')
+    parser.add_argument('--workers', type=int, default=None, help='процессов для пакета / сервиса (по числу ядер)')
+    parser.add_argument('--serve', action='store_true', help='локальный HTTP-сервис расчетов (emc_power.service)')
+    parser.add_argument('--host', default='127.0.0.1', help='адрес сервиса (127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='порт сервиса (8765)')
+    parser.add_argument('--socket', metavar='PATH', help='Unix-сокет сервиса вместо TCP')
+    return parser
+
+
+def synthesize_main(args, mask):
+    from .topology import synthesize
+    ranking = synthesize(workers=args.workers, target_freq_khz=args.freq_khz, target_db=args.target_db,
+                         max_leakage_ma=args.max_leakage_ma, load_current_a=args.load_current, dcr=args.dcr,
+                         series=args.series, margin_db=args.margin_db, mask=mask)
+    if args.json:
+        json.dump(ranking, sys.stdout, ensure_ascii=False)
+        sys.stdout.write('\n')
+    else:
+        print(f"{'Топология':<12} | {'Габариты':>8} {'Запас, dB':>9} {'Утечка':>7} {'Потери':>7} | Номиналы {args.series}")
+        for r in ranking:
+            values = ', '.join(f"{label.split(',')[0]}={v:g}" for label, v in zip(r['labels'], r['values']))
+            status = '' if r['feasible'] else '  (ТЗ не выполнено)'
+            print(f"{r['topology']:<12} | {r['size_cost']:>8.2f} {r['margin_db']:>9.2f} {r['leakage_ma']:>5.2f}mA "
+                  f"{r['loss_w']:>6.2f}W | {values}{status}")
+    return 0 if any(r['feasible'] for r in ranking) else 1
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.corners:
+        if args.method in ('slsqp', 'trust-constr'):
+            parser.error("--corners поддерживают методы de и nelder-mead")
+        if args.catalog:
+            parser.error("--corners не совместим с --catalog")
+    # Градиентные методы не умеют углы: для --corners по умолчанию de
+    args.method = args.method or ('de' if args.corners else 'slsqp')
+    if args.serve:
+        from .service import serve
+        serve(args.host, args.port, args.socket, args.workers)
+        return 0
+    if args.batch:
+        from .jobs import run_jobs
+        done, skipped = run_jobs(args.batch, args.output, args.checkpoint, args.workers)
+        print(f"Пакет: выполнено {done}, пропущено готовых {skipped} -> {args.output}")
+        return 0
+
+    from .api import optimize, plot
+
+    mask = esl = None
+    if args.mask:
+        from .mask import cispr_style_mask
+        mask, esl = cispr_style_mask(args.target_db), args.esl
+    if args.synthesize:
+        return synthesize_main(args, mask)
+    corners = None
+    if args.corners:
+        from .corners import V5_CORNERS
+        corners = V5_CORNERS
+    design = optimize(args.freq_khz, args.target_db, args.max_leakage_ma, args.load_current, args.dcr,
+                      args.series, args.method, mask=mask, esl=esl, corners=corners, catalog=args.catalog,
+                      cap_voltage_v=args.cap_voltage)
+    if args.plot:
+        design['plot'] = plot(design, args.plot, args.freq_khz, args.target_db, args.dcr)
+
+    if args.json:
+        json.dump(design, sys.stdout, ensure_ascii=False)
+        sys.stdout.write('\n')
+    else:
+        print(f"{'X-конденсатор (Cx)':<30} | {design['cx_uF']:>10.3f} uF")
+        print(f"{'Синфазный дроссель (Lcm)':<30} | {design['lcm_mH']:>10.3f} mH")
+        print(f"{'Y-конденсаторы (Cy)':<30} | {design['cy_nF']:>10.3f} nF")
+        if design.get('parts'):
+            print("Детали: " + ", ".join(f"{name} {part['part']} ({part['footprint']})"
+                                         for name, part in design['parts'].items()))
+        elif args.catalog:
+            print("ВНИМАНИЕ: в каталоге нет комбинации деталей, выполняющей ТЗ; номиналы ряда " + args.series)
+        print(f"Затухание DM / CM: {design['dm_db']:.2f} / {design['cm_db']:.2f} dB, "
+              f"утечка {design['leakage_ma']:.2f} mA, потери {design['loss_w']:.2f} W")
+        if corners is not None:
+            worst = design['worst_corner']
+            print(f"Худший из {worst['corners']} углов: DM {worst['dm_db']:.2f} dB, CM {worst['cm_db']:.2f} dB "
+                  f"({', '.join(f'{k}={v}' for k, v in worst['corner'].items())})")
+        if not design['feasible']:
+            print(f"ВНИМАНИЕ: в окрестности оптимума нет комбинации {args.series}, выполняющей ТЗ")
+    return 0 if design['feasible'] else 1
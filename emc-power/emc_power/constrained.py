@@ -0,0 +1,71 @@
+"""
+Градиентная оптимизация V5 с настоящими ограничениями (SLSQP / trust-constr).
+
+Вместо штрафов objective() (1e12, 1e9 + ..., 5e6 + ...) задача ставится явно:
+минимум габаритов cx + lcm + cy при затухании DM и CM не хуже ТЗ и токе утечки
+не выше нормы. Производные затухания - точные (прямая чувствительность MNA,
+v5_gain_db_grad), переменные - log10 номиналов, чтобы шаги были соразмерны.
+"""
+import numpy as np
+from scipy.optimize import NonlinearConstraint, minimize
+
+from .circuits import V5_DCR_OHM, v5_gain_db_grad
+from .objective import leakage_ma
+
+LN10 = np.log(10)
+MASK_POINTS_PER_DECADE = 16  # Сетка частот для ограничений по маске
+
+
+def v5_constrained_minimize(x0, target_freq_khz=150, target_db=-60, max_leakage_ma=3.5,
+                            dcr=V5_DCR_OHM, bounds=((0.01, 20.0), (0.1, 50.0), (0.1, 48.0)),
+                            method='SLSQP', mask=None, esl=None, tol=1e-6, maxiter=200):
+    """
+    x0: [cx_uF, lcm_mH, cy_nF]. mask (LimitMask) заменяет точку target_freq_khz
+    ограничениями на фиксированной лог-сетке полосы маски.
+    Возвращает OptimizeResult SciPy; x - в исходных единицах.
+    """
+    if mask is not None:
+        f_lo, f_hi = mask.band
+        n = int(np.ceil(np.log10(f_hi / f_lo) * MASK_POINTS_PER_DECADE)) + 1
+        freqs = np.clip(np.logspace(np.log10(f_lo), np.log10(f_hi), n), f_lo, f_hi)
+        limit = mask(freqs)
+    else:
+        freqs = np.array([target_freq_khz * 1e3])
+        limit = np.array([float(target_db)])
+    model = {'dcr': dcr} if esl is None else {'dcr': dcr, 'esl': esl}
+
+    def size(z):
+        p = 10**z
+        return p.sum(), p * LN10
+
+    def attenuation(z):
+        # Запас по каждой частоте и каждому режиму (>= 0 - ТЗ выполнено)
+        p = 10**z
+        values, jacs = [], []
+        for mode in ('DM', 'CM'):
+            gain, grad = v5_gain_db_grad(p, mode, freqs, **model)
+            values.append(limit - gain)
+            jacs.append(-grad * p * LN10)
+        return np.concatenate(values), np.vstack(jacs)
+
+    def leakage(z):
+        return max_leakage_ma - leakage_ma(10**z[2])
+
+    def leakage_jac(z):
+        return np.array([0.0, 0.0, -leakage_ma(10**z[2]) * LN10])
+
+    z0 = np.log10(np.clip(np.asarray(x0, dtype=float), [b[0] for b in bounds], [b[1] for b in bounds]))
+    z_bounds = [(np.log10(lo), np.log10(hi)) for lo, hi in bounds]
+
+    if method == 'trust-constr':
+        constraints = [NonlinearConstraint(lambda z: attenuation(z)[0], 0, np.inf, jac=lambda z: attenuation(z)[1]),
+                       NonlinearConstraint(leakage, 0, np.inf, jac=leakage_jac)]
+    else:
+        constraints = [{'type': 'ineq', 'fun': lambda z: attenuation(z)[0], 'jac': lambda z: attenuation(z)[1]},
+                       {'type': 'ineq', 'fun': leakage, 'jac': leakage_jac}]
+
+    res = minimize(size, z0, jac=True, method=method, bounds=z_bounds, constraints=constraints,
+                   tol=tol, options={'maxiter': maxiter})
+    res.x = 10**res.x
+    res.margin_db = float(attenuation(np.log10(res.x))[0].min())
+    return res
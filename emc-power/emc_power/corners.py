@@ -0,0 +1,131 @@
+"""
+Анализ углов (worst case) V5: нагрузка, импеданс источника, связь дросселя, DCR при температуре.
+
+Каждая ось углов - отдельная ось батча MNA, поэтому все углы кандидата (и всей
+популяции) решаются одним np.linalg.solve: новый угол стоит ширины массива, а
+не еще одного запуска симулятора. Нагрузка и источник задаются числом (Ом),
+комплексным числом или Impedance - реактивным двухполюсником, зависящим от частоты.
+"""
+import numpy as np
+
+from .circuits import V5_COUPLING, V5_DCR_OHM, V5_R_LOAD, V5_R_SOURCE, v5_template, v5_values
+from .mask import adaptive_sweep, worst_margin
+
+COPPER_TEMPCO = 0.00393  # ТКС меди, 1/K
+REF_TEMP_C = 25.0        # Температура, при которой задан DCR
+
+CORNER_AXES = ('load', 'source', 'k', 'temp_c')
+CHUNK_ENTRIES = 4_000_000  # Предел элементов матриц A на одно решение (~64 МБ complex128)
+
+
+class Impedance:
+    """Двухполюсник из R, L, C (последовательно или параллельно) -> Z(f), Ом"""
+    def __init__(self, r=0.0, l=0.0, c=None, parallel=False):
+        self.r, self.l, self.c, self.parallel = r, l, c, parallel
+
+    def __call__(self, frequencies):
+        w = 2 * np.pi * np.asarray(frequencies, dtype=float)
+        if self.parallel:
+            y = (1 / self.r if self.r else 0) + (1 / (1j * w * self.l) if self.l else 0) + (1j * w * self.c if self.c else 0)
+            return 1 / y
+        return self.r + 1j * w * self.l + (1 / (1j * w * self.c) if self.c else 0)
+
+    def __repr__(self):
+        parts = [f'{self.r:g} Ом'] if self.r else []
+        parts += [f'{self.l * 1e6:g} мкГн'] if self.l else []
+        parts += [f'{self.c * 1e6:g} мкФ'] if self.c else []
+        return (' || ' if self.parallel else ' + ').join(parts)
+
+
+# Типовая сетка: резистивные и реактивные нагрузки, LISN-подобный источник (R || L),
+# разброс связи дросселя и DCR от -40 до +125 °C -> 4 * 2 * 3 * 3 = 72 угла
+V5_CORNERS = {
+    'load': (V5_R_LOAD, 10.0, Impedance(r=10.0, l=20e-6), Impedance(r=2.0, c=10e-6)),
+    'source': (V5_R_SOURCE, Impedance(r=V5_R_SOURCE, l=50e-6, parallel=True)),
+    'k': (0.99, V5_COUPLING, 0.998),
+    'temp_c': (-40.0, REF_TEMP_C, 125.0),
+}
+
+
+def dcr_at(dcr, temp_c, ref_c=REF_TEMP_C):
+    """DCR обмотки при температуре temp_c (линейный ТКС меди)"""
+    return dcr * (1 + COPPER_TEMPCO * (np.asarray(temp_c, dtype=float) - ref_c))
+
+
+def _impedances(items, freqs):
+    # Ось угла x частоты: Impedance вычисляется на сетке, числа растягиваются
+    return np.array([z(freqs) if callable(z) else np.full(freqs.shape, z, dtype=complex) for z in items])
+
+
+def corner_values(params, frequencies, corners=None, dcr=V5_DCR_OHM, esl=None):
+    """
+    Значения элементов шаблона V5 с комплексными импедансами: батч (..., load, source, k, temp_c).
+    Оси, отсутствующие в corners, имеют длину 1 и номинальное значение.
+    """
+    corners = V5_CORNERS if corners is None else corners
+    freqs = np.atleast_1d(np.asarray(frequencies, dtype=float))
+    p = np.asarray(params, dtype=float)
+    p = p.reshape(p.shape[:-1] + (1,) * len(CORNER_AXES) + (3,))
+
+    load = _impedances(corners.get('load', (V5_R_LOAD,)), freqs)[:, None, None, None, :]
+    source = _impedances(corners.get('source', (V5_R_SOURCE,)), freqs)[:, None, None, :]
+    k = np.asarray(corners.get('k', (V5_COUPLING,)), dtype=float)[:, None]
+    dcr_t = dcr_at(dcr, corners.get('temp_c', (REF_TEMP_C,)))
+
+    values = v5_values(p, k=k, dcr=dcr_t, esl=esl)
+    for name in ('Rrs1', 'Rrs2', 'Rload'):
+        del values[name]
+    values.update({'Zrs1': source, 'Zrs2': source, 'Zload': load})
+    return values
+
+
+def v5_corner_gain_db(params, mode='DM', frequencies=150e3, corners=None, dcr=V5_DCR_OHM, esl=None):
+    """Затухание V5 во всех углах одним решением: форма (..., load, source, k, temp_c, F)"""
+    res = v5_template(mode, esl is not None, impedances=True).solve(
+        frequencies, corner_values(params, frequencies, corners, dcr, esl))
+    v = res.n3_p - res.n3_n if mode == 'DM' else res.n3_p
+    return 20 * np.log10(np.abs(v) + 1e-15)
+
+
+def _worst_over_corners(p, freqs, corners, dcr, esl):
+    # max по DM/CM и всем углам -> (N, F); кандидаты режутся на куски, чтобы батч
+    # (кандидаты x углы x частоты) матриц A не выходил за CHUNK_ENTRIES
+    corners = V5_CORNERS if corners is None else corners
+    n = v5_template('DM', esl is not None, impedances=True).size
+    systems = np.size(freqs) * np.prod([len(corners.get(axis, (None,))) for axis in CORNER_AXES])
+    step = max(1, int(CHUNK_ENTRIES // (systems * n * n)))
+    axes = tuple(range(1, 1 + len(CORNER_AXES)))
+    out = []
+    for i in range(0, len(p), step):
+        q = p[i:i + step]
+        gains = np.maximum(v5_corner_gain_db(q, 'DM', freqs, corners, dcr, esl),
+                           v5_corner_gain_db(q, 'CM', freqs, corners, dcr, esl))
+        out.append(gains.max(axis=axes))
+    return np.concatenate(out)
+
+
+def v5_corner_margin(candidates, corners=None, target_freq_khz=150, target_db=-60, dcr=V5_DCR_OHM,
+                     mask=None, esl=None, tol_db=0.5):
+    """
+    Худшее по углам превышение требования, дБ (> 0 - нарушение), (N,).
+    mask (LimitMask) - проверка всей полосы адаптивным свипом, иначе точка target_freq_khz.
+    """
+    p = np.atleast_2d(np.asarray(candidates, dtype=float))
+    if mask is None:
+        return _worst_over_corners(p, target_freq_khz * 1e3, corners, dcr, esl)[:, 0] - target_db
+    freqs, gains = adaptive_sweep(lambda f: _worst_over_corners(p, f, corners, dcr, esl),
+                                  *mask.band, tol_db=tol_db, mask=mask)
+    return worst_margin(freqs, gains, mask)
+
+
+def v5_worst_corner(params, corners=None, target_freq_khz=150, dcr=V5_DCR_OHM, esl=None):
+    """Худший угол дизайна в точке target_freq_khz: затухания DM/CM и значения осей угла"""
+    corners = V5_CORNERS if corners is None else corners
+    f = target_freq_khz * 1e3
+    dm = v5_corner_gain_db(params, 'DM', f, corners, dcr, esl)[..., 0]
+    cm = v5_corner_gain_db(params, 'CM', f, corners, dcr, esl)[..., 0]
+    worst = np.maximum(dm, cm)
+    index = np.unravel_index(np.argmax(worst), worst.shape)
+    corner = {axis: corners.get(axis, (None,))[i] for axis, i in zip(CORNER_AXES, index) if axis in corners}
+    return {'dm_db': float(dm[index]), 'cm_db': float(cm[index]), 'corner': corner,
+            'corners': int(worst.size), 'spread_db': float(worst.max() - worst.min())}
@@ -0,0 +1,112 @@
+"""
+Стандартные ряды номиналов (E12/E24/E48/E96) и дискретный поиск по ним.
+
+Номиналы хранятся как целые мантиссы, а вся "лестница" номиналов нумеруется
+сквозным индексом: idx = декада * len(ряда) + позиция. Это позволяет брать
+соседей по ряду простым сложением индексов и снапить массивы значений одним
+np.searchsorted.
+"""
+import itertools
+
+import numpy as np
+
+SERIES = {
+    'E12': [10, 12, 15, 18, 22, 27, 33, 39, 47, 56, 68, 82],
+    'E24': [10, 11, 12, 13, 15, 16, 18, 20, 22, 24, 27, 30,
+            33, 36, 39, 43, 47, 51, 56, 62, 68, 75, 82, 91],
+    'E48': [100, 105, 110, 115, 121, 127, 133, 140, 147, 154, 162, 169,
+            178, 187, 196, 205, 215, 226, 237, 249, 261, 274, 287, 301,
+            316, 332, 348, 365, 383, 402, 422, 442, 464, 487, 511, 536,
+            562, 590, 619, 649, 681, 715, 750, 787, 825, 866, 909, 953],
+    'E96': [100, 102, 105, 107, 110, 113, 115, 118, 121, 124, 127, 130,
+            133, 137, 140, 143, 147, 150, 154, 158, 162, 165, 169, 174,
+            178, 182, 187, 191, 196, 200, 205, 210, 215, 221, 226, 232,
+            237, 243, 249, 255, 261, 267, 274, 280, 287, 294, 301, 309,
+            316, 324, 332, 340, 348, 357, 365, 374, 383, 392, 402, 412,
+            422, 432, 442, 453, 464, 475, 487, 499, 511, 523, 536, 549,
+            562, 576, 590, 604, 619, 634, 649, 665, 681, 698, 715, 732,
+            750, 768, 787, 806, 825, 845, 866, 887, 909, 931, 953, 976],
+}
+
+_TABLES = {}
+
+
+def _table(series):
+    """Целые мантиссы ряда и их масштаб (10 для E12/E24, 100 для E48/E96)"""
+    if series not in _TABLES:
+        digits = SERIES[series]
+        scale = 10 if digits[0] == 10 else 100
+        _TABLES[series] = (np.array(digits, dtype=float), scale)
+    return _TABLES[series]
+
+
+def ladder_value(idx, series='E24'):
+    """Номинал по сквозному индексу (точно, без хвостов вида 27.000000000000004)"""
+    mant, scale = _table(series)
+    idx = np.asarray(idx)
+    decade, pos = np.divmod(idx, len(mant))
+    exp = decade - int(np.log10(scale))
+    m = mant[pos]
+    return np.where(exp >= 0, m * 10.0**np.abs(exp), m / 10.0**np.abs(exp))
+
+
+def ladder_index(values, series='E24'):
+    """Сквозной индекс ближайшего номинала (ближайший по линейной мантиссе, как get_closest_e24)"""
+    mant, scale = _table(series)
+    v = np.asarray(values, dtype=float)
+    exp = np.floor(np.log10(v))
+    base = v / 10**exp * scale
+    ext = np.append(mant, 10.0 * scale)
+    pos = np.clip(np.searchsorted(ext, base), 1, len(mant))
+    lower_closer = (base - ext[pos - 1]) <= (ext[pos] - base)
+    pos = np.where(lower_closer, pos - 1, pos)
+    return exp.astype(int) * len(mant) + pos
+
+
+def snap(values, series='E24'):
+    """Округление значения (или массива) до ближайшего номинала ряда; v <= 0 -> 0"""
+    v = np.asarray(values, dtype=float)
+    positive = v > 0
+    safe = np.where(positive, v, 1.0)
+    out = np.where(positive, ladder_value(ladder_index(safe, series), series), 0.0)
+    return float(out) if out.ndim == 0 else out
+
+
+def discrete_search(x0, feasible, cost, series='E24', width=2, max_width=6):
+    """
+    Поиск самой дешевой комбинации номиналов ряда вокруг непрерывного оптимума x0.
+
+    feasible(cands) -> bool (N,) - дорогая проверка ТЗ (симуляция), батчем;
+    cost(cands) -> (N,) - дешевая функция габаритов.
+    Окрестность +-width шагов по ряду расширяется до max_width, пока не найдется
+    выполнимая комбинация, и еще на один шаг после этого. Кандидаты не дешевле
+    уже найденного отсекаются по цене до симуляции (branch and bound).
+    Возвращает (номиналы, число проверенных кандидатов) или (None, число).
+    """
+    center = ladder_index(np.asarray(x0, dtype=float), series)
+    best, best_cost, checked = None, np.inf, 0
+    seen = set()
+    found_at = None
+    for w in range(width, max_width + 1):
+        offsets = np.array(list(itertools.product(range(-w, w + 1), repeat=len(center))))
+        idx = center + offsets
+        fresh = np.array([tuple(row) not in seen for row in idx])
+        idx = idx[fresh]
+        seen.update(map(tuple, idx))
+        cands = ladder_value(idx, series)
+        costs = cost(cands)
+        order = np.argsort(costs, kind='stable')
+        cands, costs = cands[order], costs[order]
+        keep = costs < best_cost
+        cands, costs = cands[keep], costs[keep]
+        if len(cands):
+            ok = feasible(cands)
+            checked += len(cands)
+            if ok.any():
+                first = np.argmax(ok)  # Отсортировано по цене: первый выполнимый - самый дешевый
+                best, best_cost = cands[first], costs[first]
+        if best is not None:
+            if found_at is not None:
+                break
+            found_at = w
+    return best, checked
@@ -0,0 +1,190 @@
+"""
+Пакетный расчет семейства фильтров: поток заданий -> поток результатов.
+
+Задания читаются построчно из JSONL или CSV (поля - аргументы api.optimize:
+target_freq_khz, target_db, max_leakage_ma, load_current_a, dcr, series, method;
+необязательный id). Одновременно в работе не больше window заданий, поэтому
+память не зависит от длины списка. Каждый результат сразу дописывается строкой
+в выходной файл (JSONL или CSV по расширению).
+
+Контрольная точка - "водяной знак": номер, до которого включительно все задания
+готовы, плюс готовые номера выше него (их не больше window). После прерывания
+запуск с тем же checkpoint пропускает готовые задания. Результат пишется до
+обновления контрольной точки, поэтому при сбое между ними строка может
+повториться - по полю index дубликат легко отбросить.
+"""
+import csv
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+JOB_FIELDS = ('target_freq_khz', 'target_db', 'max_leakage_ma', 'load_current_a', 'dcr', 'series', 'method')
+RESULT_FIELDS = ('index', 'id', 'status', 'error', *JOB_FIELDS,
+                 'ideal_cx_uF', 'ideal_lcm_mH', 'ideal_cy_nF', 'cx_uF', 'lcm_mH', 'cy_nF',
+                 'dm_db', 'cm_db', 'leakage_ma', 'p_loss_w', 'feasible')
+_TEXT_FIELDS = ('id', 'series', 'method')
+
+
+def _csv_job(row):
+    spec = {}
+    for k, v in row.items():
+        if v in ('', None):
+            continue
+        if k in _TEXT_FIELDS:
+            spec[k] = v
+            continue
+        try:
+            spec[k] = float(v)
+        except (TypeError, ValueError):
+            # Битая строка - сбой только этого задания, id сохраняется для отчета
+            return {'id': row.get('id') or None, '_error': f"поле {k}: не число ({v!r})"}
+    return spec
+
+
+def _json_job(line):
+    try:
+        spec = json.loads(line)
+    except ValueError as exc:
+        return {'_error': f"строка не JSON ({exc})"}
+    return spec if isinstance(spec, dict) else {'_error': "задание должно быть объектом JSON"}
+
+
+def read_jobs(path):
+    """
+    Генератор (номер, задание) из JSONL или CSV; пустые ячейки CSV - значения по умолчанию.
+    Неразборчивая строка не прерывает пакет: задание несет '_error' и в run_job завершается ошибкой.
+    """
+    with open(path, encoding='utf-8', newline='') as fh:
+        if path.endswith('.csv'):
+            for index, row in enumerate(csv.DictReader(fh)):
+                yield index, _csv_job(row)
+        else:
+            index = 0
+            for line in fh:
+                if line.strip():
+                    yield index, _json_job(line)
+                    index += 1
+
+
+def run_job(task):
+    """Одно задание -> плоская запись результата (ошибки не прерывают пакет)"""
+    index, spec = task
+    out = {'index': index, 'id': spec.get('id'), 'status': 'ok', 'error': None}
+    try:
+        if '_error' in spec:
+            raise ValueError(spec['_error'])
+        from .api import optimize
+        unknown = set(spec) - set(JOB_FIELDS) - {'id'}
+        if unknown:
+            raise ValueError(f"Неизвестные поля задания: {sorted(unknown)}")
+        kwargs = {k: spec[k] for k in JOB_FIELDS if k in spec}
+        design = optimize(**kwargs)
+        out.update(kwargs)
+        out.update({'ideal_cx_uF': design['continuous'][0], 'ideal_lcm_mH': design['continuous'][1],
+                    'ideal_cy_nF': design['continuous'][2],
+                    **{k: design[k] for k in ('cx_uF', 'lcm_mH', 'cy_nF', 'dm_db', 'cm_db', 'leakage_ma', 'feasible')},
+                    'p_loss_w': design['loss_w']})
+    except Exception as exc:
+        out.update(status='error', error=f'{type(exc).__name__}: {exc}')
+    return out
+
+
+class Checkpoint:
+    """Водяной знак + готовые номера выше него; запись атомарная (tmp + os.replace)"""
+    def __init__(self, path=None):
+        self.path = path
+        self.watermark = -1
+        self.done = set()
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as fh:
+                state = json.load(fh)
+            self.watermark, self.done = state['watermark'], set(state['done'])
+
+    def finished(self, index):
+        return index <= self.watermark or index in self.done
+
+    def mark(self, index):
+        self.done.add(index)
+        while self.watermark + 1 in self.done:
+            self.watermark += 1
+            self.done.remove(self.watermark)
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump({'watermark': self.watermark, 'done': sorted(self.done)}, fh)
+        os.replace(tmp, self.path)
+
+
+class _Writer:
+    def __init__(self, path):
+        self.csv = path.endswith('.csv')
+        fresh = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.fh = open(path, 'a', encoding='utf-8', newline='')
+        if self.csv:
+            self.writer = csv.DictWriter(self.fh, RESULT_FIELDS, extrasaction='ignore')
+            if fresh:
+                self.writer.writeheader()
+
+    def write(self, record):
+        if self.csv:
+            self.writer.writerow(record)
+        else:
+            self.fh.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.fh.flush()
+
+    def close(self):
+        self.fh.close()
+
+
+def run_jobs(source, output, checkpoint=None, workers=None, window=None, callback=None):
+    """
+    Выполнение заданий из source с дозаписью результатов в output.
+    checkpoint - путь к файлу контрольной точки (None - без возобновления).
+    window - предел заданий в работе (по умолчанию 4 на процесс).
+    Возвращает (выполнено сейчас, пропущено как готовые).
+    """
+    workers = workers or os.cpu_count()
+    window = window or 4 * workers
+    state = Checkpoint(checkpoint)
+    writer = _Writer(output)
+    done_now = skipped = 0
+
+    def finish(record):
+        nonlocal done_now
+        writer.write(record)
+        state.mark(record['index'])
+        state.save()
+        done_now += 1
+        if callback:
+            callback(record)
+
+    def pending_jobs():
+        nonlocal skipped
+        for index, spec in read_jobs(source):
+            if state.finished(index):
+                skipped += 1
+                continue
+            yield index, spec
+
+    jobs = pending_jobs()
+    try:
+        if workers == 1:
+            for task in jobs:
+                finish(run_job(task))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending = set()
+                for task in jobs:
+                    pending.add(pool.submit(run_job, task))
+                    if len(pending) >= window:
+                        finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for fut in finished:
+                            finish(fut.result())
+                for fut in wait(pending).done:
+                    finish(fut.result())
+    finally:
+        writer.close()
+    return done_now, skipped
@@ -0,0 +1,112 @@
+"""
+Проверка фильтра по маске требований во всей полосе кондуктивных помех.
+
+LimitMask задает кусочно-линейную (в логарифме частоты) границу допустимого
+коэффициента передачи фильтра, дБ. Запас считается как max(gain - mask) по
+сетке частот; сетка строится адаптивно: грубый лог-свип уточняется только
+там, где АЧХ резко меняется (резонансы ESL) или запас близок к худшему.
+Каждый раунд уточнения - одно батч-решение MNA для всех новых частот.
+"""
+import numpy as np
+
+MIN_STEP = 1e-3  # Минимальный шаг сетки в декадах (~0.23% частоты)
+
+
+class LimitMask:
+    """Граница допустимого затухания: точки (частота Гц, дБ), интерполяция по log(f)"""
+    def __init__(self, points):
+        points = sorted(points)
+        self.freqs = np.array([p[0] for p in points], dtype=float)
+        self.levels = np.array([p[1] for p in points], dtype=float)
+
+    @property
+    def band(self):
+        return self.freqs[0], self.freqs[-1]
+
+    def __call__(self, frequencies):
+        f = np.asarray(frequencies, dtype=float)
+        level = np.interp(np.log10(f), np.log10(self.freqs), self.levels)
+        # Вне полосы маски ограничений нет
+        return np.where((f < self.freqs[0]) | (f > self.freqs[-1]), np.inf, level)
+
+
+def cispr_style_mask(target_db=-60):
+    """
+    Пример маски 150 кГц - 30 МГц в духе CISPR: полное требование target_db на
+    150 кГц, ослабленное на 10 дБ к 500 кГц (лимит по квазипику падает, а спектр
+    помехи убывает быстрее) и на 20 дБ выше 5 МГц.
+    """
+    return LimitMask([(150e3, target_db), (500e3, target_db + 10),
+                      (5e6, target_db + 20), (30e6, target_db + 20)])
+
+
+def adaptive_sweep(response, f_min, f_max, points_per_decade=8, tol_db=0.5, max_rounds=8,
+                   mask=None):
+    """
+    Адаптивный лог-свип. response(freqs) -> дБ формы (..., F) (батч кандидатов допустим:
+    уточнение идет по объединенной сетке).
+    Интервал делится пополам, если линейная интерполяция ошибается больше tol_db,
+    если на нем экстремум АЧХ или если запас до маски в пределах tol_db от худшего.
+    Возвращает (freqs, gains).
+    """
+    decades = np.log10(f_max / f_min)
+    logf = np.linspace(np.log10(f_min), np.log10(f_max), max(3, int(np.ceil(decades * points_per_decade)) + 1))
+
+    def hz(x):
+        # 10**log10(f) может выйти за край полосы, где маска дает inf: края - точно f_min/f_max
+        return np.clip(10**x, f_min, f_max)
+
+    gains = np.asarray(response(hz(logf)))
+
+    # Начальные флаги: кривизна и смена знака наклона (резонансы)
+    slope = np.diff(gains, axis=-1)
+    curv = np.abs(np.diff(slope, axis=-1))
+    turn = np.sign(slope[..., 1:]) != np.sign(slope[..., :-1])
+    hot = _reduce((curv > tol_db) | turn)
+    flags = np.zeros(len(logf) - 1, dtype=bool)
+    flags[:-1] |= hot
+    flags[1:] |= hot
+
+    for _ in range(max_rounds):
+        flags |= _near_worst(hz(logf), gains, mask, tol_db)
+        flags &= np.diff(logf) > MIN_STEP  # Слишком узкие интервалы больше не делим
+        if not flags.any():
+            break
+        mids = (logf[:-1][flags] + logf[1:][flags]) / 2
+        new = np.asarray(response(hz(mids)))
+
+        # Ошибка линейной интерполяции в новой точке решает, делить ли половинки дальше
+        left, right = gains[..., :-1][..., flags], gains[..., 1:][..., flags]
+        err = _reduce(np.abs(new - (left + right) / 2) > tol_db)
+
+        logf = np.concatenate([logf, mids])
+        gains = np.concatenate([gains, new], axis=-1)
+        refined = np.concatenate([np.zeros(len(logf) - len(mids), dtype=bool), err])
+        order = np.argsort(logf, kind='stable')
+        logf, gains, refined = logf[order], gains[..., order], refined[order]
+
+        pos = np.nonzero(refined)[0]
+        flags = np.zeros(len(logf) - 1, dtype=bool)
+        flags[pos[pos > 0] - 1] = True
+        flags[pos[pos < len(logf) - 1]] = True
+    return hz(logf), gains
+
+
+def _reduce(mask):
+    # Батч кандидатов: интервал горячий, если горячий хотя бы у одного
+    return mask.reshape(-1, mask.shape[-1]).any(axis=0) if mask.ndim > 1 else mask
+
+
+def _near_worst(freqs, gains, mask, tol_db):
+    if mask is None:
+        return np.zeros(len(freqs) - 1, dtype=bool)
+    margin = gains - mask(freqs)
+    worst = margin.max(axis=-1, keepdims=True)
+    near = _reduce(margin >= worst - tol_db)
+    return near[:-1] | near[1:]
+
+
+def worst_margin(freqs, gains, mask):
+    """Худший запас до маски, дБ (> 0 - нарушение); форма батча gains без оси частот"""
+    margin = np.asarray(gains) - mask(freqs)
+    return margin.max(axis=-1)
@@ -0,0 +1,274 @@
+"""
+Встроенный решатель AC-анализа методом модифицированных узловых потенциалов (MNA).
+
+Схема описывается так же, как в PySpice (R, C, L, K, V; плюс Z - комплексный импеданс), но вместо запуска NgSpice
+система A(w) * x = b собирается в NumPy и решается одним батч-вызовом
+np.linalg.solve сразу для всех частот (и всех наборов номиналов, если значения
+элементов заданы массивами).
+
+Решатель линейный и точный, как и .ac в NgSpice: на фильтрах проекта расхождение
+с NgSpice не превышает MNA_TOLERANCE_DB.
+"""
+import numpy as np
+
+from .trace import traced
+
+MNA_TOLERANCE_DB = 0.01  # Допустимое расхождение с NgSpice (дБ)
+SPARSE_MIN_SIZE = 64     # С этого числа неизвестных compile() выбирает разреженный решатель
+
+
+class Netlist:
+    """Описание линейной схемы в стиле PySpice: имена элементов = тип + имя"""
+    gnd = '0'
+
+    def __init__(self, title='circuit'):
+        self.title = title
+        self.elements = {}  # полное имя -> (тип, узел+, узел-, значение)
+
+    def _add(self, kind, name, n1, n2, value):
+        full_name = kind + str(name)
+        if full_name in self.elements:
+            raise ValueError(f"Элемент {full_name} уже есть в схеме")
+        self.elements[full_name] = (kind, str(n1), str(n2), value)
+        return full_name
+
+    def R(self, name, n1, n2, value):
+        return self._add('R', name, n1, n2, value)
+
+    def C(self, name, n1, n2, value):
+        return self._add('C', name, n1, n2, value)
+
+    def L(self, name, n1, n2, value):
+        return self._add('L', name, n1, n2, value)
+
+    def K(self, name, l1, l2, coupling):
+        """Магнитная связь двух индуктивностей (точки на первых выводах, как в SPICE)"""
+        return self._add('K', name, l1, l2, coupling)
+
+    def Z(self, name, n1, n2, value):
+        """
+        Комплексный импеданс (Ом): число или массив с последней осью по частотам решения.
+        Позволяет задать реактивную нагрузку/источник без отдельных L/C в схеме.
+        """
+        return self._add('Z', name, n1, n2, value)
+
+    def V(self, name, n_plus, n_minus, ac=1.0):
+        """Источник напряжения с AC-амплитудой ac"""
+        return self._add('V', name, n_plus, n_minus, ac)
+
+    def compile(self, sparse=None):
+        """
+        Шаблон для решения. sparse=None - выбор по размеру системы: от SPARSE_MIN_SIZE
+        неизвестных разреженный путь (scipy.sparse, emc_power.sparse), иначе плотный батч.
+        """
+        if sparse is None:
+            sparse = index_netlist(self)[2] >= SPARSE_MIN_SIZE
+        if sparse:
+            from .sparse import SparseCompiledNetlist
+            return SparseCompiledNetlist(self)
+        return CompiledNetlist(self)
+
+
+def index_netlist(netlist):
+    """Номера неизвестных: узлы (кроме земли), затем токи ветвей L и V -> (nodes, branches, size)"""
+    nodes = {}
+    for kind, n1, n2, _ in netlist.elements.values():
+        if kind == 'K':
+            continue
+        for node in (n1, n2):
+            if node != Netlist.gnd:
+                nodes.setdefault(node, len(nodes))
+    # Токи ветвей индуктивностей и источников - дополнительные неизвестные
+    branches = [name for name, e in netlist.elements.items() if e[0] in ('L', 'V')]
+    return nodes, {name: len(nodes) + i for i, name in enumerate(branches)}, len(nodes) + len(branches)
+
+
+def merge_values(defaults, values):
+    """Значения по умолчанию + values -> (массивы по именам, форма батча)"""
+    merged = dict(defaults)
+    if values:
+        unknown = set(values) - set(merged)
+        if unknown:
+            raise ValueError(f"Неизвестные элементы: {sorted(unknown)}")
+        merged.update(values)
+    # Импедансы Z комплексные, их последняя ось - частоты, в форму батча она не входит
+    merged = {k: np.asarray(v, dtype=complex if k[0] == 'Z' else float) for k, v in merged.items()}
+    batch = np.broadcast_shapes(*(v.shape[:-1] if k[0] == 'Z' else v.shape for k, v in merged.items()))
+    return merged, batch
+
+
+class CompiledNetlist:
+    """
+    Шаблон схемы: индексы узлов и шаблоны штампов посчитаны один раз.
+    Номиналы подставляются при каждом решении через values={имя: значение}.
+    """
+    def __init__(self, netlist):
+        self.title = netlist.title
+        self.defaults = {name: e[3] for name, e in netlist.elements.items()}
+        self.nodes, self.branches, self.size = index_netlist(netlist)
+        n = self.size
+
+        self.g0 = np.zeros((n, n))  # Постоянные инциденции ветвей
+        self.r_names, self.c_names, self.l_names, self.k_names, self.z_names = [], [], [], [], []
+        self.k_pairs = []
+        r_pat, c_pat, l_pat, k_pat, z_pat = [], [], [], [], []
+
+        for name, (kind, n1, n2, _) in netlist.elements.items():
+            if kind == 'K':
+                if n1 not in self.branches or n2 not in self.branches:
+                    raise ValueError(f"{name}: связь должна ссылаться на индуктивности схемы")
+                i, j = self.branches[n1], self.branches[n2]
+                pat = np.zeros((n, n))
+                pat[i, j] = pat[j, i] = -1.0
+                self.k_names.append(name)
+                self.k_pairs.append((n1, n2))
+                k_pat.append(pat)
+                continue
+
+            a, c = self.nodes.get(n1), self.nodes.get(n2)
+            if kind in ('R', 'C', 'Z'):
+                pat = self._two_terminal(a, c)
+                {'R': r_pat, 'C': c_pat, 'Z': z_pat}[kind].append(pat)
+                {'R': self.r_names, 'C': self.c_names, 'Z': self.z_names}[kind].append(name)
+            else:
+                k = self.branches[name]
+                for node, sign in ((a, 1.0), (c, -1.0)):
+                    if node is not None:
+                        self.g0[node, k] += sign
+                        self.g0[k, node] += sign
+                if kind == 'L':
+                    pat = np.zeros((n, n))
+                    pat[k, k] = -1.0  # V(a) - V(b) - jwL * I = 0
+                    l_pat.append(pat)
+                    self.l_names.append(name)
+
+        empty = np.zeros((0, n, n))
+        self.r_pat = np.array(r_pat) if r_pat else empty
+        self.c_pat = np.array(c_pat) if c_pat else empty
+        self.l_pat = np.array(l_pat) if l_pat else empty
+        self.k_pat = np.array(k_pat) if k_pat else empty
+        self.z_pat = np.array(z_pat) if z_pat else empty
+        self.v_names = [name for name in self.branches if name.startswith('V')]
+
+    def _two_terminal(self, a, c):
+        pat = np.zeros((self.size, self.size))
+        if a is not None:
+            pat[a, a] += 1.0
+        if c is not None:
+            pat[c, c] += 1.0
+        if a is not None and c is not None:
+            pat[a, c] -= 1.0
+            pat[c, a] -= 1.0
+        return pat
+
+    def _values(self, values):
+        return merge_values(self.defaults, values)
+
+    @staticmethod
+    def _stamp(coeffs, pattern, batch):
+        if not coeffs:
+            return np.zeros(batch + pattern.shape[1:])
+        stacked = np.stack(np.broadcast_arrays(*coeffs), axis=-1)
+        stacked = np.broadcast_to(stacked, batch + (len(coeffs),))
+        return (stacked @ pattern.reshape(len(coeffs), -1)).reshape(batch + pattern.shape[1:])
+
+    def matrices(self, values=None):
+        """Возвращает G, Cm (A(w) = G + jw * Cm, размер batch + (n, n)), значения и форму батча"""
+        v, batch = self._values(values)
+        g = self.g0 + self._stamp([1.0 / v[name] for name in self.r_names], self.r_pat, batch)
+        m = [v[name] * np.sqrt(v[l1] * v[l2]) for name, (l1, l2) in zip(self.k_names, self.k_pairs)]
+        cm = (self._stamp([v[name] for name in self.c_names], self.c_pat, batch)
+              + self._stamp([v[name] for name in self.l_names], self.l_pat, batch)
+              + self._stamp(m, self.k_pat, batch))
+        return g, cm, v, batch
+
+    def excitation(self, v, batch):
+        b = np.zeros(batch + (self.size,), dtype=complex)
+        for name in self.v_names:
+            k = self.branches[name]
+            b[..., k] = np.broadcast_to(v[name], batch)
+        return b
+
+    def system(self, frequencies, values=None):
+        """A(w) и b для всех частот: формы batch + (F, n, n) и batch + (F, n)"""
+        freqs = np.atleast_1d(np.asarray(frequencies, dtype=float))
+        g, cm, v, batch = self.matrices(values)
+        omega = 2 * np.pi * freqs
+        # Действительная и мнимая части пишутся на месте: без промежуточных комплексных массивов
+        a = np.empty(batch + freqs.shape + (self.size, self.size), dtype=complex)
+        a.real[...] = g[..., None, :, :]
+        np.multiply(omega[:, None, None], cm[..., None, :, :], out=a.imag)
+        if self.z_names:
+            y = np.stack([np.broadcast_to(1.0 / v[name], batch + freqs.shape) for name in self.z_names], axis=-1)
+            a += (y @ self.z_pat.reshape(len(self.z_names), -1)).reshape(a.shape)
+        b = np.broadcast_to(self.excitation(v, batch)[..., None, :], a.shape[:-1])
+        return freqs, a, b, v, batch, omega
+
+    @traced('mna.solve')
+    def solve(self, frequencies, values=None):
+        """AC-анализ: все частоты (и все наборы номиналов) одним np.linalg.solve"""
+        freqs, a, b, _, _, _ = self.system(frequencies, values)
+        x = np.linalg.solve(a, b[..., None])[..., 0]
+        return AcSolution(self, freqs, x)
+
+    def _derivative(self, name, v, batch, omega):
+        """dA/dp для элемента name: форма batch + (F, n, n)"""
+        jw = 1j * omega[:, None, None]
+        kind = name[0]
+        if kind == 'R':
+            pat = self.r_pat[self.r_names.index(name)]
+            return (np.broadcast_to(-1.0 / v[name]**2, batch)[..., None, None, None] * pat).astype(complex)
+        if kind == 'C':
+            pat = self.c_pat[self.c_names.index(name)]
+            return np.ones(batch)[..., None, None, None] * jw * pat
+        if kind == 'L':
+            # Собственная индуктивность + все взаимные M = k * sqrt(L1 * L2): dM/dL1 = M / (2 * L1)
+            d = np.broadcast_to(self.l_pat[self.l_names.index(name)], batch + (self.size, self.size)).copy()
+            for kname, pair, pat in zip(self.k_names, self.k_pairs, self.k_pat):
+                if name in pair:
+                    other = pair[1] if pair[0] == name else pair[0]
+                    dm = v[kname] * np.sqrt(v[other] / v[name]) / 2
+                    d = d + np.broadcast_to(dm, batch)[..., None, None] * pat
+            return d[..., None, :, :] * jw
+        if kind == 'K':
+            i = self.k_names.index(name)
+            l1, l2 = self.k_pairs[i]
+            return np.broadcast_to(np.sqrt(v[l1] * v[l2]), batch)[..., None, None, None] * jw * self.k_pat[i]
+        raise ValueError(f"Чувствительность к {name} не поддерживается")
+
+    def solve_sensitivity(self, frequencies, values=None, names=()):
+        """
+        AC-анализ + прямая чувствительность dx/dp = -A^-1 (dA/dp) x по элементам names.
+        Все правые части решаются одним np.linalg.solve с той же матрицей A.
+        Возвращает (AcSolution, {имя: dx формы batch + (F, n)}).
+        """
+        freqs, a, b, v, batch, omega = self.system(frequencies, values)
+        x = np.linalg.solve(a, b[..., None])[..., 0]
+        rhs = [-(self._derivative(name, v, batch, omega) @ x[..., None])[..., 0] for name in names]
+        if not rhs:
+            return AcSolution(self, freqs, x), {}
+        dx = np.linalg.solve(a, np.stack(rhs, axis=-1))
+        return AcSolution(self, freqs, x), {name: dx[..., i] for i, name in enumerate(names)}
+
+
+class AcSolution:
+    """Результат AC-анализа; узлы доступны как атрибуты, как у анализа PySpice"""
+    def __init__(self, compiled, frequency, x):
+        self.frequency = frequency
+        self.x = x  # batch + (F, n)
+        self._nodes = compiled.nodes
+        self._branches = compiled.branches
+
+    def node(self, name):
+        if name == Netlist.gnd:
+            return np.zeros(self.x.shape[:-1], dtype=complex)
+        return self.x[..., self._nodes[name]]
+
+    def branch(self, name):
+        return self.x[..., self._branches[name]]
+
+    def __getattr__(self, name):
+        nodes = self.__dict__.get('_nodes', {})
+        if name in nodes:
+            return self.node(name)
+        raise AttributeError(name)
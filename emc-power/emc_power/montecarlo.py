@@ -0,0 +1,184 @@
+"""
+Монте-Карло анализ выхода годных для собранного (E-series) дизайна V5.
+
+Номиналы каждой детали разыгрываются независимо в пределах допусков (две
+обмотки дросселя и два Y-конденсатора - отдельно, поэтому учитывается и
+перетекание CM в DM из-за асимметрии). Выборка считается порциями: каждая
+порция - одно батч-решение MNA, а по результатам копится только потоковая
+статистика (Welford + гистограмма для перцентилей), так что память не растет
+с числом образцов. Порции можно раздать пулу процессов; у каждой порции свой
+поток случайных чисел из SeedSequence, поэтому результат не зависит от числа
+процессов.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .circuits import V5_DCR_OHM, v5_template, v5_values
+from .mask import adaptive_sweep, worst_margin
+from .objective import leakage_ma
+
+# Допуски: относительные (+-) для номиналов, абсолютный диапазон для k
+TOLERANCES = {'cx': 0.10, 'cy': 0.20, 'lcm': 0.30, 'k': (0.99, 0.998)}
+MASK_CHUNK = 512  # Порция при проверке по маске: свип на десятки частот вместо одной
+
+
+class RunningStats:
+    """Потоковая статистика одной величины: среднее/СКО (Welford), экстремумы, перцентили"""
+    def __init__(self, lo, hi, bins=4000):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.edges = np.linspace(lo, hi, bins + 1)
+        self.hist = np.zeros(bins + 2, dtype=np.int64)  # + хвосты за пределами диапазона
+
+    def update(self, values):
+        v = np.asarray(values, dtype=float).ravel()
+        if not len(v):
+            return
+        other = RunningStats(self.edges[0], self.edges[-1], len(self.edges) - 1)
+        other.count, other.mean = len(v), float(v.mean())
+        other.m2 = float(((v - other.mean)**2).sum())
+        other.min, other.max = float(v.min()), float(v.max())
+        other.hist += np.bincount(np.searchsorted(self.edges, v, side='right'),
+                                  minlength=len(self.hist))[:len(self.hist)]
+        self.merge(other)
+
+    def merge(self, other):
+        """Объединение (формула Чана) - для порций и процессов"""
+        if other.count == 0:
+            return
+        n = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta**2 * self.count * other.count / n
+        self.mean += delta * other.count / n
+        self.count = n
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        self.hist += other.hist
+
+    def percentile(self, q):
+        """Перцентиль по гистограмме (точность - ширина бина)"""
+        target = q / 100 * self.count
+        cum = np.cumsum(self.hist)
+        i = int(np.searchsorted(cum, target))
+        if i == 0:
+            return self.min
+        if i >= len(self.hist) - 1:
+            return self.max
+        return float(self.edges[i])
+
+    def summary(self, percentiles=(1, 50, 99)):
+        std = np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+        out = {'mean': self.mean, 'std': float(std), 'min': self.min, 'max': self.max}
+        out.update({f'p{q}': self.percentile(q) for q in percentiles})
+        return out
+
+
+class YieldStats:
+    def __init__(self):
+        self.samples = 0
+        self.passed = 0
+        self.dm = RunningStats(-200, 0)
+        self.cm = RunningStats(-200, 0)
+        self.leakage = RunningStats(0, 20)
+
+    def merge(self, other):
+        self.samples += other.samples
+        self.passed += other.passed
+        self.dm.merge(other.dm)
+        self.cm.merge(other.cm)
+        self.leakage.merge(other.leakage)
+
+    @property
+    def yield_(self):
+        return self.passed / self.samples if self.samples else 0.0
+
+    def summary(self):
+        return {'samples': self.samples, 'yield': self.yield_, 'dm_db': self.dm.summary(),
+                'cm_db': self.cm.summary(), 'leakage_ma': self.leakage.summary()}
+
+
+def _draw(rng, design, n, tolerances):
+    cx, lcm, cy = design
+
+    def spread(nominal, tol):
+        return nominal * (1 + rng.uniform(-tol, tol, n))
+
+    k_lo, k_hi = tolerances['k']
+    return {
+        'cx': spread(cx, tolerances['cx']),
+        'lcm1': spread(lcm, tolerances['lcm']), 'lcm2': spread(lcm, tolerances['lcm']),
+        'cy1': spread(cy, tolerances['cy']), 'cy2': spread(cy, tolerances['cy']),
+        'k': rng.uniform(k_lo, k_hi, n),
+    }
+
+
+def _evaluate_chunk(task):
+    design, n, seed_seq, tolerances, target_freq_khz, target_db, max_leakage_ma, dcr, mask, esl = task
+    rng = np.random.default_rng(seed_seq)
+    s = _draw(rng, design, n, tolerances)
+
+    parasitics = mask is not None and esl is not None
+    values = v5_values(np.zeros(3), dcr=dcr, esl=esl if parasitics else None)
+    values.update({'Cx1': s['cx'] * 1e-6, 'Lcm1': s['lcm1'] * 1e-3, 'Lcm2': s['lcm2'] * 1e-3,
+                   'Cy1': s['cy1'] * 1e-9, 'Cy2': s['cy2'] * 1e-9, 'Kk_core': s['k']})
+
+    def gain_db(mode, freqs):
+        res = v5_template(mode, parasitics).solve(freqs, values)
+        v_out = res.n3_p - res.n3_n if mode == 'DM' else res.n3_p
+        return 20 * np.log10(np.abs(v_out) + 1e-15)
+
+    gains = {mode: gain_db(mode, target_freq_khz * 1e3)[:, 0] for mode in ('DM', 'CM')}
+    leak = leakage_ma(np.maximum(s['cy1'], s['cy2']))
+    if mask is None:
+        ok = np.maximum(gains['DM'], gains['CM']) <= target_db
+    else:
+        # Годен - если худший из DM/CM укладывается в маску по всей ее полосе
+        freqs, worst = adaptive_sweep(lambda f: np.maximum(gain_db('DM', f), gain_db('CM', f)), *mask.band, mask=mask)
+        ok = worst_margin(freqs, worst, mask) <= 0
+
+    stats = YieldStats()
+    stats.samples = n
+    stats.passed = int(np.sum(ok & (leak <= max_leakage_ma)))
+    stats.dm.update(gains['DM'])
+    stats.cm.update(gains['CM'])
+    stats.leakage.update(leak)
+    return stats
+
+
+def yield_analysis(design, n_samples=20000, tolerances=None, seed=0, target_freq_khz=150,
+                   target_db=-60, max_leakage_ma=3.5, dcr=V5_DCR_OHM, chunk=4096, workers=1,
+                   callback=None, mask=None, esl=None):
+    """
+    design: [cx_uF, lcm_mH, cy_nF]. Возвращает сводку: выход годных, перцентили DM/CM и утечки.
+    mask (LimitMask, esl - ESL конденсаторов) - годность по всей полосе маски, а не в точке
+    target_freq_khz; перцентили DM/CM - по-прежнему в target_freq_khz.
+    callback(stats) вызывается после каждой порции - для потокового вывода прогресса.
+    """
+    tol = dict(TOLERANCES, **(tolerances or {}))
+    if mask is not None:
+        chunk = min(chunk, MASK_CHUNK)
+    sizes = [chunk] * (n_samples // chunk) + ([n_samples % chunk] if n_samples % chunk else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(list(design), n, sq, tol, target_freq_khz, target_db, max_leakage_ma, dcr, mask, esl)
+             for n, sq in zip(sizes, seeds)]
+
+    total = YieldStats()
+    if workers == 1:
+        results = map(_evaluate_chunk, tasks)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count())
+        results = pool.map(_evaluate_chunk, tasks)
+    try:
+        for stats in results:  # Порядок порций фиксирован - результат воспроизводим
+            total.merge(stats)
+            if callback:
+                callback(total)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return total.summary()
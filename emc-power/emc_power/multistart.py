@@ -0,0 +1,93 @@
+"""
+Мультистарт Nelder-Mead на пуле процессов.
+
+Стартовые точки - латинский гиперкуб в логарифмическом масштабе границ.
+Каждый процесс пула один раз прогревает свой симулятор (шаблоны MNA или сессию
+NgSpice), а прогоны идут раундами по chunk_iters итераций с продолжением от
+последнего симплекса. Между раундами явно проигрывающие старты снимаются.
+Порядок задач и решения о снятии зависят только от результатов, поэтому один
+и тот же seed дает один и тот же ответ при любом числе процессов.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.optimize import OptimizeResult, minimize
+from scipy.stats import qmc
+
+from .objective import v5_objective_batch
+
+INFEASIBLE = 1e6  # Оценки выше - ветка штрафа (ТЗ или утечка не выполнены)
+
+_WORKER = {}
+
+
+def _worker_init(objective_kwargs):
+    # Прогрев: первый вызов строит шаблоны MNA / загружает netlist в NgSpice
+    _WORKER['kwargs'] = objective_kwargs
+    v5_objective_batch([1.0, 1.0, 1.0], **objective_kwargs)
+
+
+def _objective(params):
+    return float(v5_objective_batch(params, **_WORKER['kwargs'])[0])
+
+
+def _run_chunk(task):
+    run_id, x0, simplex, iters, xatol, fatol = task
+    options = {'maxiter': iters, 'xatol': xatol, 'fatol': fatol}
+    if simplex is not None:
+        options['initial_simplex'] = simplex
+    res = minimize(_objective, x0, method='Nelder-Mead', options=options)
+    return {'id': run_id, 'x': res.x, 'fun': float(res.fun), 'nfev': res.nfev,
+            'simplex': res.final_simplex[0], 'converged': res.status == 0}
+
+
+def latin_starts(bounds, n_starts, seed=0):
+    """Стартовые точки: латинский гиперкуб в log-масштабе границ"""
+    lo = np.log10([b[0] for b in bounds])
+    hi = np.log10([b[1] for b in bounds])
+    unit = qmc.LatinHypercube(d=len(bounds), seed=seed).random(n_starts)
+    return 10**(lo + unit * (hi - lo))
+
+
+def multistart(bounds, n_starts=32, seed=0, workers=None, objective_kwargs=None,
+               chunk_iters=50, max_rounds=20, warmup_rounds=2, dominance=1.5,
+               xatol=1e-4, fatol=1e-3):
+    """
+    Мультистарт V5. objective_kwargs - аргументы v5_objective_batch (цели, backend, маска).
+    Старт снимается, если после warmup_rounds он в ветке штрафа при найденном
+    выполнимом решении или хуже лучшего в dominance раз.
+    Возвращает OptimizeResult (x, fun, success, nfev) + runs - сводку по стартам.
+    """
+    starts = latin_starts(bounds, n_starts, seed)
+    runs = [{'id': i, 'x': x, 'fun': np.inf, 'nfev': 0, 'simplex': None,
+             'converged': False, 'cancelled': False} for i, x in enumerate(starts)]
+    workers = workers or os.cpu_count()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_worker_init,
+                             initargs=(objective_kwargs or {},)) as pool:
+        for round_no in range(max_rounds):
+            active = [r for r in runs if not r['converged'] and not r['cancelled']]
+            if not active:
+                break
+            tasks = [(r['id'], r['x'], r['simplex'], chunk_iters, xatol, fatol) for r in active]
+            for out in pool.map(_run_chunk, tasks):  # map сохраняет порядок задач
+                run = runs[out['id']]
+                run.update(x=out['x'], fun=out['fun'], simplex=out['simplex'],
+                           converged=out['converged'], nfev=run['nfev'] + out['nfev'])
+
+            if round_no + 1 < warmup_rounds:
+                continue
+            best = min(r['fun'] for r in runs)
+            for r in active:
+                if r['converged']:
+                    continue
+                hopeless = best < INFEASIBLE <= r['fun']
+                if hopeless or r['fun'] > best * dominance:
+                    r['cancelled'] = True
+
+    ranked = sorted(runs, key=lambda r: (r['fun'], r['id']))
+    winner = ranked[0]
+    summary = [{k: r[k] for k in ('id', 'x', 'fun', 'nfev', 'converged', 'cancelled')} for r in ranked]
+    return OptimizeResult(x=winner['x'], fun=winner['fun'], success=winner['fun'] < INFEASIBLE,
+                          nfev=sum(r['nfev'] for r in runs), runs=summary)
@@ -0,0 +1,147 @@
+"""
+Батч-версии целевых функций V2-V5.
+
+Каждая функция принимает массив кандидатов (N, 3) и возвращает N оценок,
+совпадающих со скалярной objective() соответствующего скрипта. Штрафы считаются
+масками NumPy, а DM/CM (или обе нагрузки) - одним решением MNA на всю популяцию.
+"""
+import numpy as np
+
+from .circuits import V5_DCR_OHM, pi_gain_db, v5_gain_db
+from .mask import adaptive_sweep, worst_margin
+from .spice_session import spice_session
+
+MAINS_VOLTAGE = 230.0  # Сеть для расчета тока утечки, В
+MAINS_FREQ = 50.0      # Гц
+
+
+def leakage_ma(cy_nf):
+    """Ток утечки через Y-конденсатор (мА) при 230 В / 50 Гц"""
+    return MAINS_VOLTAGE * 2 * np.pi * MAINS_FREQ * (np.asarray(cy_nf) * 1e-9) * 1000
+
+
+def v5_size_cost(candidates):
+    """Условные габариты V5 (как size_cost в objective)"""
+    p = np.asarray(candidates, dtype=float)
+    return p[..., 1] * 1 + p[..., 0] * 1 + p[..., 2] * 1
+
+
+def v5_mask_margin(candidates, mask, tol_db=0.5, **model):
+    """
+    Худший запас DM/CM до маски по всей ее полосе (> 0 - нарушение), (N,).
+    Один адаптивный свип на всю популяцию; model - как у v5_gain_db (dcr, esr, esl, ...).
+    """
+    p = np.atleast_2d(np.asarray(candidates, dtype=float))
+
+    def response(freqs):
+        return np.maximum(v5_gain_db(p, 'DM', freqs, **model), v5_gain_db(p, 'CM', freqs, **model))
+
+    freqs, gains = adaptive_sweep(response, *mask.band, tol_db=tol_db, mask=mask)
+    return worst_margin(freqs, gains, mask)
+
+
+def _v5_excess(p, target_freq_khz, target_db, dcr, mask, esl, backend='mna', corners=None):
+    # Превышение требования, дБ: в точке target_freq_khz или по всей маске (худший из углов, если заданы)
+    if corners is not None:
+        from .corners import v5_corner_margin
+        return v5_corner_margin(p, corners, target_freq_khz, target_db, dcr, mask=mask,
+                                esl=esl if mask is not None else None)
+    if mask is not None:
+        return v5_mask_margin(p, mask, dcr=dcr, esl=esl)
+    f = target_freq_khz * 1e3
+    if backend == 'session':
+        session = spice_session('v5', dcr=dcr)
+        worst = np.array([max(session.simulate(q, 'DM', frequencies=f), session.simulate(q, 'CM', frequencies=f))
+                          for q in p])
+    else:
+        worst = np.maximum(v5_gain_db(p, 'DM', f, dcr=dcr)[:, 0], v5_gain_db(p, 'CM', f, dcr=dcr)[:, 0])
+    return worst - target_db
+
+
+def v5_objective_batch(candidates, target_freq_khz=150, target_db=-60, max_leakage_ma=3.5,
+                       dcr=V5_DCR_OHM, mask=None, esl=None, backend='mna', corners=None):
+    """
+    Оценка популяции [cx_uF, lcm_mH, cy_nF] по правилам objective() из V5.
+    mask (LimitMask) заменяет точку target_freq_khz проверкой всей полосы;
+    backend='session' считает точку через прогретую сессию NgSpice;
+    corners (см. corners.V5_CORNERS) - требование в худшем из углов (MNA).
+    """
+    p = np.atleast_2d(np.asarray(candidates, dtype=float))
+    scores = np.empty(len(p))
+
+    tiny = np.any(p <= 0.001, axis=1)
+    leak = leakage_ma(p[:, 2])
+    leaky = ~tiny & (leak > max_leakage_ma)
+    valid = ~tiny & ~leaky
+    scores[tiny] = 1e12
+    scores[leaky] = 1e9 + (leak[leaky] - max_leakage_ma) * 1000
+
+    if valid.any():
+        excess = _v5_excess(p[valid], target_freq_khz, target_db, dcr, mask, esl, backend, corners)
+        penalty = np.where(excess > 0, 5e6 + excess**2 * 5000, 0.0)
+        scores[valid] = penalty + v5_size_cost(p[valid])
+    return scores
+
+
+def v5_feasible(candidates, target_freq_khz=150, target_db=-60, max_leakage_ma=3.5, dcr=V5_DCR_OHM,
+                mask=None, esl=None, corners=None):
+    """Маска кандидатов V5, реально выполняющих ТЗ по DM/CM и току утечки (во всех углах corners)"""
+    p = np.atleast_2d(np.asarray(candidates, dtype=float))
+    ok = ~np.any(p <= 0.001, axis=1) & (leakage_ma(p[:, 2]) <= max_leakage_ma)
+    if ok.any():
+        ok[ok] = _v5_excess(p[ok], target_freq_khz, target_db, dcr, mask, esl, corners=corners) <= 0
+    return ok
+
+
+def v2_objective_batch(candidates, target_freq_khz=150, target_db=-60):
+    """Оценка популяции [L_uH, C1_uF, C2_uF] по правилам objective() из V2"""
+    p = np.atleast_2d(np.asarray(candidates, dtype=float))
+    scores = np.full(len(p), 1e6)
+    valid = ~np.any(p <= 0.1, axis=1)
+    if valid.any():
+        gain = pi_gain_db(p[valid], 'v2', target_freq_khz * 1e3)[:, 0]
+        scores[valid] = np.where(gain > target_db, (gain - target_db)**2, 0.0)
+    return scores
+
+
+def _pi_worst_gain(p, version, target_freq_khz, loads):
+    # Нагрузки - отдельная ось батча: (нагрузки, N) за одно решение
+    r_load = np.asarray(loads, dtype=float)[:, None]
+    gains = pi_gain_db(p[None, :, :], version, target_freq_khz * 1e3, r_load=r_load)[..., 0]
+    return gains.max(axis=0)
+
+
+def v3_objective_batch(candidates, target_freq_khz=150, target_db=-60, loads=(50, 10)):
+    """Оценка популяции [L_uH, C1_uF, C2_uF] по правилам objective() из V3"""
+    p = np.atleast_2d(np.asarray(candidates, dtype=float))
+    scores = np.full(len(p), 1e9)
+    valid = ~np.any(p < 0.1, axis=1)
+    if valid.any():
+        q = p[valid]
+        worst = _pi_worst_gain(q, 'v3', target_freq_khz, loads)
+        error = np.where(worst > target_db, (worst - target_db)**2, 0.0)
+        scores[valid] = error + q[:, 0] * 0.8 + (q[:, 1] + q[:, 2]) * 1.2
+    return scores
+
+
+def v4_objective_batch(candidates, target_freq_khz=150, target_db=-60, loads=(50, 10)):
+    """Оценка популяции [L_uH, C1_uF, C2_uF] по правилам objective() из V4"""
+    p = np.atleast_2d(np.asarray(candidates, dtype=float))
+    scores = np.full(len(p), 1e12)
+    valid = ~np.any(p < 0.05, axis=1)
+    if valid.any():
+        q = p[valid]
+        worst = _pi_worst_gain(q, 'v4', target_freq_khz, loads)
+        size = q[:, 0] * 10.0 + q[:, 1] * 1.0 + q[:, 2] * 1.0
+        scores[valid] = np.where(worst > target_db, 1e9 + (worst - target_db)**2 * 1000, size)
+    return scores
+
+
+def vectorized(objective_batch, **kwargs):
+    """
+    Адаптер для scipy.optimize.differential_evolution(vectorized=True):
+    SciPy передает кандидатов как (3, S), батч-функции ждут (S, 3).
+    """
+    def wrapper(x):
+        return objective_batch(np.asarray(x).T, **kwargs)
+    return wrapper
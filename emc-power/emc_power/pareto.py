@@ -0,0 +1,159 @@
+"""
+Многокритериальный режим V5: архив недоминируемых решений.
+
+Вместо одной скалярной оценки с подобранными весами (габариты + 5e6 штрафа)
+каждый кандидат получает вектор критериев (все минимизируются):
+габариты, худший запас DM/CM до ТЗ, ток утечки, потери в меди 2*I^2*DCR.
+Архив хранит параметры и критерии в двух растущих массивах NumPy; проверка
+доминирования - плоские булевы маски (батч x архив), по одной на критерий.
+Компромиссы (например "самый маленький фильтр с запасом 3 дБ") выбираются
+запросом к архиву после одного прогона.
+"""
+import numpy as np
+from scipy.stats import qmc
+
+from .circuits import V5_DCR_OHM, v5_gain_db
+from .objective import leakage_ma, v5_size_cost
+
+OBJECTIVES = ('size', 'margin_db', 'leakage_ma', 'loss_w')
+DCR_REF_LCM_MH = 10.0  # DCR_OHM задан для дросселя этой индуктивности
+
+
+def winding_dcr(lcm_mh, dcr=V5_DCR_OHM, ref_mh=DCR_REF_LCM_MH):
+    """DCR обмотки: на том же сердечнике витки ~ sqrt(L), длина провода ~ виткам"""
+    return dcr * np.sqrt(np.asarray(lcm_mh, dtype=float) / ref_mh)
+
+
+class ParetoArchive:
+    """Архив недоминируемых точек: params (N, P) и objectives (N, M) в массивах"""
+    def __init__(self, n_params=3, names=OBJECTIVES, capacity=256):
+        self.names = tuple(names)
+        self._params = np.empty((capacity, n_params))
+        self._objectives = np.empty((capacity, len(self.names)))
+        self.size = 0
+        self.offered = 0
+
+    @property
+    def params(self):
+        return self._params[:self.size]
+
+    @property
+    def objectives(self):
+        return self._objectives[:self.size]
+
+    def __len__(self):
+        return self.size
+
+    def add(self, params, objectives):
+        """Добавление батча; возвращает число точек, вошедших в архив"""
+        x = np.atleast_2d(np.asarray(params, dtype=float))
+        f = np.atleast_2d(np.asarray(objectives, dtype=float))
+        ok = np.all(np.isfinite(f), axis=1)
+        x, f = x[ok], f[ok]
+        self.offered += len(x)
+        if not len(x):
+            return 0
+
+        # Недоминируемые внутри батча (и без дублей)
+        keep = ~_dominated_by(f, f)
+        _, first = np.unique(f[keep], axis=0, return_index=True)
+        x, f = x[keep][np.sort(first)], f[keep][np.sort(first)]
+
+        # Против архива: новые, которых никто не доминирует (и не совпадающие), вытесняют доминируемых ими
+        old = self.objectives
+        fresh = ~_dominated_by(f, old) & ~_equal_any(f, old)
+        x, f = x[fresh], f[fresh]
+        if not len(x):
+            return 0
+        survive = ~_dominated_by(old, f)
+        n_keep = int(survive.sum())
+        self._params[:n_keep] = self.params[survive]
+        self._objectives[:n_keep] = old[survive]
+        self.size = n_keep
+
+        need = self.size + len(x)
+        if need > len(self._params):
+            cap = max(need, 2 * len(self._params))
+            self._params = np.resize(self._params, (cap, self._params.shape[1]))
+            self._objectives = np.resize(self._objectives, (cap, self._objectives.shape[1]))
+        self._params[self.size:need] = x
+        self._objectives[self.size:need] = f
+        self.size = need
+        return len(x)
+
+    def query(self, sort_by='size', **limits):
+        """
+        Точки фронта с ограничениями вида margin_db=0.0 (критерий <= значения),
+        отсортированные по критерию sort_by. Возвращает (params, objectives).
+        """
+        sel = np.ones(self.size, dtype=bool)
+        for name, bound in limits.items():
+            sel &= self.objectives[:, self.names.index(name)] <= bound
+        x, f = self.params[sel], self.objectives[sel]
+        order = np.argsort(f[:, self.names.index(sort_by)], kind='stable')
+        return x[order], f[order]
+
+    def best(self, sort_by='size', **limits):
+        """Лучшая точка по sort_by при ограничениях или (None, None)"""
+        x, f = self.query(sort_by, **limits)
+        return (x[0], f[0]) if len(x) else (None, None)
+
+
+def _dominated_by(f, ref):
+    """Маска строк f, доминируемых хотя бы одной строкой ref (минимизация)"""
+    if not len(ref) or not len(f):
+        return np.zeros(len(f), dtype=bool)
+    # Цикл по критериям (их единицы) вместо 3D-броадкаста: только плоские маски (N, архив)
+    le = np.ones((len(f), len(ref)), dtype=bool)
+    eq = np.ones((len(f), len(ref)), dtype=bool)
+    for k in range(f.shape[1]):
+        col, fk = ref[:, k], f[:, k, None]
+        le &= col <= fk
+        eq &= col == fk
+    return np.any(le & ~eq, axis=1)
+
+
+def _equal_any(f, ref):
+    if not len(ref) or not len(f):
+        return np.zeros(len(f), dtype=bool)
+    return np.any(np.all(ref[None, :, :] == f[:, None, :], axis=2), axis=1)
+
+
+def v5_objectives(candidates, target_freq_khz=150, target_db=-60, load_current_a=10.0,
+                  dcr=V5_DCR_OHM):
+    """Критерии V5 для популяции (N, 3) -> (N, 4) в порядке OBJECTIVES"""
+    p = np.atleast_2d(np.asarray(candidates, dtype=float))
+    r = winding_dcr(p[:, 1], dcr)
+    f = target_freq_khz * 1e3
+    worst = np.maximum(v5_gain_db(p, 'DM', f, dcr=r)[:, 0], v5_gain_db(p, 'CM', f, dcr=r)[:, 0])
+    return np.column_stack([v5_size_cost(p), worst - target_db, leakage_ma(p[:, 2]),
+                            2 * load_current_a**2 * r])
+
+
+def explore(bounds, objectives, n_initial=512, generations=30, batch=256, max_leakage_ma=3.5,
+            sigma=0.15, seed=0, archive=None):
+    """
+    Заполнение фронта: латинский гиперкуб в log-масштабе, затем поколения
+    лог-нормальных мутаций случайных точек архива. objectives(cands) -> (N, M);
+    кандидаты с утечкой выше max_leakage_ma (нормы безопасности) в архив не идут.
+    Каждое поколение - один батч-вызов objectives.
+    """
+    rng = np.random.default_rng(seed)
+    lo = np.log10([b[0] for b in bounds])
+    hi = np.log10([b[1] for b in bounds])
+    if archive is None:
+        archive = ParetoArchive(len(bounds))
+
+    def offer(logx):
+        x = 10**np.clip(logx, lo, hi)
+        f = objectives(x)
+        safe = f[:, OBJECTIVES.index('leakage_ma')] <= max_leakage_ma
+        archive.add(x[safe], f[safe])
+
+    offer(lo + qmc.LatinHypercube(d=len(bounds), seed=seed).random(n_initial) * (hi - lo))
+    for _ in range(generations):
+        if not len(archive):
+            break
+        parents = np.log10(archive.params[rng.integers(0, len(archive), batch)])
+        offer(parents + rng.normal(0, sigma, parents.shape) * (hi - lo) / 4)
+    return archive
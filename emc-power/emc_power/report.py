@@ -0,0 +1,90 @@
+"""
+Данные отчета отдельно от картинки.
+
+Проверочный свип итогового дизайна считается один раз и сохраняется как
+компактный .npz (частоты, кривые АЧХ, параметры графика в JSON). PNG - отдельный
+необязательный этап: сразу, в фоновом процессе или никогда (пакетные прогоны).
+matplotlib загружается только при рендере.
+
+    python -m emc_power.report emc_report.npz [emc_report.png]
+"""
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+REPORT_MODES = (None, 'data', 'sync', 'background')
+
+
+def save_sweep(path, frequency, curves, **meta):
+    """
+    curves: {подпись: дБ (F,)} в порядке отрисовки; meta (JSON): title, styles
+    {подпись: kwargs plot}, hlines/vlines [kwargs axhline/axvline], mask [(f, дБ), ...],
+    dpi, grid_alpha и любые данные дизайна (params, target_db, ...).
+    """
+    arrays = {f'curve_{i}': np.asarray(v, dtype=np.float32) for i, v in enumerate(curves.values())}
+    meta = dict(meta, labels=list(curves))
+    np.savez_compressed(path, frequency=np.asarray(frequency, dtype=float), meta=json.dumps(meta), **arrays)
+    return path
+
+
+def load_sweep(path):
+    """-> (frequency, {подпись: дБ}, meta)"""
+    with np.load(path) as data:
+        meta = json.loads(str(data['meta']))
+        curves = {label: data[f'curve_{i}'] for i, label in enumerate(meta['labels'])}
+        return data['frequency'], curves, meta
+
+
+def render(sweep_path, png_path=None):
+    """PNG из сохраненного свипа (без дисплея, backend Agg)"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    freqs, curves, meta = load_sweep(sweep_path)
+    png_path = png_path or os.path.splitext(sweep_path)[0] + '.png'
+    styles = meta.get('styles', {})
+
+    plt.figure(figsize=(10, 6))
+    for label, gain in curves.items():
+        plt.semilogx(freqs, gain, label=label, **styles.get(label, {}))
+    for line in meta.get('vlines', []):
+        plt.axvline(**line)
+    for line in meta.get('hlines', []):
+        plt.axhline(**line)
+    if meta.get('mask'):
+        mask = np.array(meta['mask'])
+        plt.semilogx(mask[:, 0], mask[:, 1], color='black', lw=1, label='Limit mask')
+    plt.title(meta.get('title', ''))
+    plt.xlabel(meta.get('xlabel', 'Frequency (Hz)'))
+    plt.ylabel(meta.get('ylabel', 'Attenuation (dB)'))
+    plt.grid(True, which="both", ls="-", alpha=meta.get('grid_alpha', 0.5))
+    plt.legend()
+    plt.savefig(png_path, dpi=meta.get('dpi', 100))
+    plt.close()
+    return png_path
+
+
+def finish(sweep_path, mode='background', png_path=None):
+    """
+    Этап рендера по настройке скрипта: 'data' - только .npz, 'sync' - PNG сейчас,
+    'background' - PNG в отдельном процессе (скрипт его не ждет).
+    Возвращает путь PNG (или None, если картинка не строится).
+    """
+    png_path = png_path or os.path.splitext(sweep_path)[0] + '.png'
+    if mode == 'sync':
+        return render(sweep_path, png_path)
+    if mode == 'background':
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+        subprocess.Popen([sys.executable, '-m', 'emc_power.report', sweep_path, png_path], env=env,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+        return png_path
+    return None
+
+
+if __name__ == '__main__':
+    print(render(*sys.argv[1:3]))
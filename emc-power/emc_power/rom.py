@@ -0,0 +1,196 @@
+"""
+Модель пониженного порядка (ROM) АЧХ фильтра: рациональная аппроксимация вида
+полюса-вычеты по рассчитанному свипу (vector fitting, Gustavsen/Semlyen).
+
+    H(s) = d + sum_i r_i / (s - p_i),   s = j*2*pi*f
+
+Модель подгоняется один раз по комплексной передаточной функции DM и CM,
+хранится вместе с дизайном (to_dict -> JSON) и дальше отвечает на запросы
+затухания на любой частоте и проверку маски без повторной симуляции:
+вычисление - одна операция над массивом (частоты x полюса).
+"""
+import numpy as np
+
+from .circuits import V5_DCR_OHM, v5_response
+from .mask import worst_margin
+
+ROM_BAND = (10e3, 30e6)  # Полоса подгонки по умолчанию, Гц (как свип отчета V5)
+ROM_POINTS = 400         # Точек подгоночного свипа
+ROM_TOL_DB = 0.05        # Допустимая ошибка модели на сетке подгонки, дБ
+MAX_POLES = 20
+
+
+def _basis(s, poles):
+    # Действительный базис для полюсов: пара (p, p*) -> 1/(s-p) + 1/(s-p*), j/(s-p) - j/(s-p*)
+    cols = []
+    for p in poles:
+        if p.imag == 0:
+            cols.append(1 / (s - p))
+        elif p.imag > 0:
+            a, b = 1 / (s - p), 1 / (s - p.conjugate())
+            cols += [a + b, 1j * a - 1j * b]
+    return np.stack(cols, axis=-1)
+
+
+def _pairs(values, tol=1e-9):
+    # Собственные числа -> действительные и пары (только p.imag > 0, сопряженные подразумеваются)
+    values = np.where(np.abs(values.imag) <= tol * np.abs(values), values.real, values)
+    return np.concatenate([values[values.imag == 0], values[values.imag > 0]])
+
+
+def _real_lstsq(m, rhs, weight):
+    # Комплексные уравнения с весами -> действительная МНК-система с масштабированием столбцов
+    m, rhs = m * weight[:, None], rhs * weight
+    a = np.vstack([m.real, m.imag])
+    scale = np.linalg.norm(a, axis=0)
+    scale[scale == 0] = 1
+    x = np.linalg.lstsq(a / scale, np.concatenate([rhs.real, rhs.imag]), rcond=None)[0]
+    return x / scale
+
+
+def _residues(poles, coefs):
+    out = []
+    i = 0
+    for p in poles:
+        if p.imag == 0:
+            out.append(complex(coefs[i]))
+            i += 1
+        else:
+            out.append(complex(coefs[i], coefs[i + 1]))
+            i += 2
+    return np.array(out)
+
+
+def vector_fit(frequencies, response, n_poles=6, iterations=15, weight=None):
+    """
+    Vector fitting: frequencies (F,) Гц, response (F,) комплексная -> RationalModel.
+    weight (F,) - веса уравнений; по умолчанию 1/|H| (относительная ошибка, т.е. в дБ).
+    """
+    f = np.asarray(frequencies, dtype=float)
+    h = np.asarray(response, dtype=complex)
+    w = 1 / np.maximum(np.abs(h), 1e-300) if weight is None else np.asarray(weight, dtype=float)
+    # Нормировка частоты для обусловленности: полюса ищутся в единицах w0
+    w0 = 2 * np.pi * np.sqrt(f[0] * f[-1])
+    s = 2j * np.pi * f / w0
+
+    # Стартовые полюса: слабо затухающие пары, лог-равномерно по полосе (+ действительный при нечетном порядке)
+    beta = 2 * np.pi * np.logspace(np.log10(f[0]), np.log10(f[-1]), n_poles // 2) / w0
+    poles = np.concatenate([[-2 * np.pi * np.sqrt(f[0] * f[-1]) / w0] if n_poles % 2 else [], -beta / 100 + 1j * beta])
+
+    for _ in range(iterations):
+        phi = _basis(s, poles)
+        n = phi.shape[1]
+        # sigma(s) * H(s) = (sum c phi + d),  sigma = 1 + sum c~ phi
+        m = np.hstack([phi, np.ones((len(s), 1)), -h[:, None] * phi])
+        x = _real_lstsq(m, h, w)
+        ct = x[n + 1:]
+        # Нули sigma -> новые полюса: eig(A - b c~^T) в действительной блочной форме
+        a = np.zeros((n, n))
+        b = np.zeros(n)
+        i = 0
+        for p in poles:
+            if p.imag == 0:
+                a[i, i], b[i] = p.real, 1
+                i += 1
+            else:
+                a[i:i + 2, i:i + 2] = [[p.real, p.imag], [-p.imag, p.real]]
+                b[i] = 2
+                i += 2
+        new = np.linalg.eigvals(a - np.outer(b, ct))
+        # Неустойчивые полюса отражаются в левую полуплоскость
+        poles = _pairs(-np.abs(new.real) + 1j * new.imag)
+
+    phi = _basis(s, poles)
+    x = _real_lstsq(np.hstack([phi, np.ones((len(s), 1))]), h, w)
+    return RationalModel(poles * w0, _residues(poles, x[:-1]) * w0, x[-1])
+
+
+class RationalModel:
+    """H(s) = d + sum r/(s - p); хранятся полюса с p.imag >= 0, сопряженные подразумеваются"""
+    def __init__(self, poles, residues, d=0.0):
+        self.poles = np.asarray(poles, dtype=complex)
+        self.residues = np.asarray(residues, dtype=complex)
+        self.d = float(d)
+
+    @property
+    def order(self):
+        return int(np.sum(np.where(self.poles.imag == 0, 1, 2)))
+
+    def __call__(self, frequencies):
+        """Комплексная передаточная функция, форма как у frequencies"""
+        s = 2j * np.pi * np.asarray(frequencies, dtype=float)[..., None]
+        p, r = self.poles, self.residues
+        h = r / (s - p) + np.where(p.imag != 0, r.conjugate() / (s - p.conjugate()), 0)
+        return self.d + h.sum(axis=-1)
+
+    def gain_db(self, frequencies):
+        return 20 * np.log10(np.abs(self(frequencies)) + 1e-15)
+
+    def to_dict(self):
+        return {'poles': [[p.real, p.imag] for p in self.poles.tolist()],
+                'residues': [[r.real, r.imag] for r in self.residues.tolist()], 'd': self.d}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls([complex(*p) for p in data['poles']], [complex(*r) for r in data['residues']], data['d'])
+
+
+def fit_response(frequencies, response, tol_db=ROM_TOL_DB, max_poles=MAX_POLES):
+    """
+    Порядок подбирается сам: от 2 полюсов с шагом 2, пока ошибка в дБ на сетке
+    больше tol_db. Возвращает (модель, ошибка дБ) - лучшую из опробованных.
+    """
+    target = 20 * np.log10(np.abs(response) + 1e-15)
+    best = None
+    for n in range(2, max_poles + 1, 2):
+        model = vector_fit(frequencies, response, n)
+        error = float(np.max(np.abs(model.gain_db(frequencies) - target)))
+        if best is None or error < best[1]:
+            best = (model, error)
+        if error <= tol_db:
+            break
+    return best
+
+
+class FilterRom:
+    """ROM фильтра: модели DM и CM, полоса подгонки и ошибка подгонки"""
+    def __init__(self, models, band, error_db):
+        self.models, self.band, self.error_db = models, tuple(band), error_db
+
+    def gain_db(self, frequencies, mode='DM'):
+        """Затухание, дБ. Вне полосы подгонки модель экстраполирует"""
+        return self.models[mode].gain_db(frequencies)
+
+    def worst_db(self, frequencies):
+        """Худшее из DM/CM, дБ"""
+        return np.maximum(self.gain_db(frequencies, 'DM'), self.gain_db(frequencies, 'CM'))
+
+    def margin(self, mask, points_per_decade=200):
+        """Худший запас до маски по плотной сетке в полосе маски, дБ (> 0 - нарушение)"""
+        f_min, f_max = mask.band
+        freqs = np.logspace(np.log10(f_min), np.log10(f_max), int(np.log10(f_max / f_min) * points_per_decade) + 1)
+        freqs = np.clip(freqs, f_min, f_max)  # Край 10**log10(f) может выйти за полосу, где маска - inf
+        return float(worst_margin(freqs, self.worst_db(freqs), mask))
+
+    def to_dict(self):
+        return {'band': list(self.band), 'error_db': self.error_db,
+                **{mode: model.to_dict() for mode, model in self.models.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls({mode: RationalModel.from_dict(data[mode]) for mode in ('DM', 'CM')}, data['band'], data['error_db'])
+
+
+def fit_filter_rom(response, band=ROM_BAND, points=ROM_POINTS, tol_db=ROM_TOL_DB):
+    """ROM по любой модели: response(mode, freqs) -> комплексная передаточная функция (F,)"""
+    freqs = np.logspace(np.log10(band[0]), np.log10(band[1]), points)
+    models, errors = {}, []
+    for mode in ('DM', 'CM'):
+        models[mode], error = fit_response(freqs, response(mode, freqs), tol_db)
+        errors.append(error)
+    return FilterRom(models, band, max(errors))
+
+
+def fit_v5_rom(params, band=ROM_BAND, points=ROM_POINTS, tol_db=ROM_TOL_DB, dcr=V5_DCR_OHM, **model):
+    """ROM дизайна V5 по свипу MNA (model - как у v5_values: esl/esr, r_load, ...)"""
+    return fit_filter_rom(lambda mode, freqs: v5_response(params, mode, freqs, dcr=dcr, **model), band, points, tol_db)
@@ -0,0 +1,286 @@
+"""
+Локальный сервис расчетов V5: asyncio HTTP (TCP на localhost или Unix-сокет), только stdlib.
+
+Запросы - JSON, POST:
+    /optimize  - аргументы api.optimize (+ "mask": true, "corners": true, "catalog": путь)
+    /sweep     - АЧХ DM/CM дизайна: params [cx_uF, lcm_mH, cy_nF], f_min, f_max, points, dcr, esl
+    /verify    - проверка дизайна: params, target_freq_khz, target_db, max_leakage_ma, dcr, mask, esl
+    /batch     - {"requests": [{"kind": "optimize" | "sweep" | "verify", "params": {...}, "id": ...}, ...]};
+                 ответ - NDJSON (chunked), строка на запрос по мере готовности
+GET /health - число процессов, запросов, объединенных запросов.
+
+Расчеты идут в пуле процессов, прогретых при старте (SciPy загружен, шаблоны MNA
+скомпилированы, каталоги кэшируются в процессе). Одинаковые запросы, пришедшие
+пока первый еще считается, ждут один и тот же результат.
+
+    python -m emc_power --serve --port 8765 --workers 4
+    python -m emc_power --serve --socket /tmp/emc.sock
+"""
+import asyncio
+import http.client
+import json
+import os
+import signal
+import socket
+from concurrent.futures import ProcessPoolExecutor
+
+KINDS = ('optimize', 'sweep', 'verify')
+DEFAULT_PORT = 8765
+MAX_BODY = 16 * 1024 * 1024
+_STATUS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large'}
+
+_CATALOGS = {}  # Каталоги деталей, загруженные в процессе-исполнителе (путь -> Catalog)
+
+
+def _warm_worker():
+    # Инициализатор процесса пула: тяжелые импорты и компиляция шаблонов один раз
+    import scipy.optimize  # noqa: F401
+    from .circuits import v5_gain_db, v5_template
+    for mode in ('DM', 'CM'):
+        v5_template(mode)
+        v5_template(mode, True)
+    v5_gain_db([1.0, 1.0, 1.0], 'DM', 150e3)
+
+
+def _ping():
+    return os.getpid()
+
+
+def _model_kwargs(params):
+    # JSON-флаги -> объекты: маска в духе CISPR, сетка углов, каталог деталей (кэш процесса)
+    params = dict(params)
+    if params.pop('mask', False):
+        from .mask import cispr_style_mask
+        params['mask'] = cispr_style_mask(params.get('target_db', -60))
+        params.setdefault('esl', 3e-9)
+    if params.pop('corners', False):
+        from .corners import V5_CORNERS
+        params['corners'] = V5_CORNERS
+    if isinstance(params.get('catalog'), str):
+        from .catalog import load_catalog
+        path = params['catalog']
+        if path not in _CATALOGS:
+            _CATALOGS[path] = load_catalog(path)
+        params['catalog'] = _CATALOGS[path]
+    return params
+
+
+def run_request(kind, params):
+    """Один запрос в процессе пула -> JSON-совместимый dict (исключения уходят в ответ как ошибка)"""
+    import numpy as np
+    from .api import optimize, simulate
+
+    if kind not in KINDS:
+        raise ValueError(f"Неизвестный тип запроса: {kind}")
+    params = _model_kwargs(params or {})
+    if kind == 'optimize':
+        return optimize(**params)
+    design = params.pop('params', None)
+    if design is None or np.shape(design) != (3,):
+        raise ValueError("Нужен params: [cx_uF, lcm_mH, cy_nF]")
+    dcr = params.get('dcr', 0.005)
+    model = {'esl': params['esl']} if params.get('esl') is not None else {}
+    if kind == 'sweep':
+        freqs = np.logspace(np.log10(params.get('f_min', 10e3)), np.log10(params.get('f_max', 30e6)),
+                            int(params.get('points', 400)))
+        return {'frequency': freqs.tolist(), 'dm_db': simulate(design, 'DM', freqs, dcr=dcr, **model).tolist(),
+                'cm_db': simulate(design, 'CM', freqs, dcr=dcr, **model).tolist()}
+    if kind == 'verify':
+        from .objective import leakage_ma, v5_feasible, v5_mask_margin
+        f = params.get('target_freq_khz', 150) * 1e3
+        out = {'dm_db': simulate(design, 'DM', f, dcr=dcr, **model), 'cm_db': simulate(design, 'CM', f, dcr=dcr, **model),
+               'leakage_ma': float(leakage_ma(design[2]))}
+        checks = {k: params[k] for k in ('target_freq_khz', 'target_db', 'max_leakage_ma', 'mask', 'esl')
+                  if k in params}
+        out['feasible'] = bool(v5_feasible(design, dcr=dcr, **checks)[0])
+        if params.get('mask') is not None:
+            out['mask_margin_db'] = float(v5_mask_margin(design, params['mask'], dcr=dcr, **model)[0])
+        return out
+
+
+def _safe_run(kind, params):
+    try:
+        return {'status': 'ok', 'result': run_request(kind, params)}
+    except Exception as exc:
+        return {'status': 'error', 'error': f'{type(exc).__name__}: {exc}'}
+
+
+class EmcService:
+    """HTTP-сервис поверх прогретого пула процессов с объединением одинаковых запросов"""
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count()
+        self.pool = None
+        self.server = None
+        self.inflight = {}
+        self.stats = {'requests': 0, 'coalesced': 0, 'errors': 0}
+
+    async def start(self, host='127.0.0.1', port=DEFAULT_PORT, path=None):
+        """Запуск пула (процессы стартуют и прогреваются сразу) и сервера; возвращает адрес"""
+        loop = asyncio.get_running_loop()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+        # Пул создает процессы по мере отправки задач: workers пингов поднимают их все до первого запроса
+        await asyncio.gather(*(loop.run_in_executor(self.pool, _ping) for _ in range(self.workers)))
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self._handle, path=path)
+            return path
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+
+    def submit(self, kind, params):
+        """Future результата; одинаковый запрос в работе -> тот же future"""
+        key = json.dumps([kind, params], sort_keys=True)
+        self.stats['requests'] += 1
+        if key in self.inflight:
+            self.stats['coalesced'] += 1
+            return self.inflight[key]
+        future = asyncio.ensure_future(asyncio.get_running_loop().run_in_executor(self.pool, _safe_run, kind, params))
+        self.inflight[key] = future
+        future.add_done_callback(lambda _: self.inflight.pop(key, None))
+        return future
+
+    async def _handle(self, reader, writer):
+        try:
+            method, path, headers, body = await _read_request(reader)
+            if path == '/health' and method == 'GET':
+                await _send_json(writer, 200, {'workers': self.workers, 'inflight': len(self.inflight), **self.stats})
+            elif method != 'POST':
+                await _send_json(writer, 405, {'error': 'Ожидается POST'})
+            elif path == '/batch':
+                await self._batch(writer, json.loads(body or b'{}'))
+            elif path.strip('/') in KINDS:
+                reply = await self.submit(path.strip('/'), json.loads(body or b'{}'))
+                self.stats['errors'] += reply['status'] == 'error'
+                await _send_json(writer, 200 if reply['status'] == 'ok' else 400, reply)
+            else:
+                await _send_json(writer, 404, {'error': f'Нет такого пути: {path}'})
+        except _HttpError as exc:
+            await _send_json(writer, exc.status, {'error': str(exc)})
+        except (ValueError, TypeError) as exc:
+            await _send_json(writer, 400, {'error': f'{type(exc).__name__}: {exc}'})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _batch(self, writer, payload):
+        # Ответ идет частями (chunked NDJSON): каждая строка - как только готов ее запрос
+        # Проверка до заголовка 200: после него ошибку можно отдать только строкой потока
+        requests = payload.get('requests') if isinstance(payload, dict) else None
+        if not isinstance(requests, list) or not all(isinstance(req, dict) for req in requests):
+            raise ValueError("Ожидается {'requests': [{'kind': ..., 'params': {...}}, ...]}")
+
+        async def tagged(i, req):
+            try:
+                reply = await self.submit(req.get('kind'), req.get('params', {}))
+            except Exception as exc:  # Сбой одного запроса не обрывает поток остальных
+                reply = {'status': 'error', 'error': f'{type(exc).__name__}: {exc}'}
+            return dict(reply, index=i, id=req.get('id'), kind=req.get('kind'))
+
+        writer.write(_head(200, 'application/x-ndjson', chunked=True))
+        for next_done in asyncio.as_completed([tagged(i, req) for i, req in enumerate(requests)]):
+            reply = await next_done
+            self.stats['errors'] += reply['status'] == 'error'
+            data = (json.dumps(reply, ensure_ascii=False) + '\n').encode()
+            writer.write(b'%x\r\n%s\r\n' % (len(data), data))
+            await writer.drain()
+        writer.write(b'0\r\n\r\n')
+        await writer.drain()
+
+
+class _HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+async def _read_request(reader):
+    line = (await reader.readline()).decode('latin-1').split()
+    if len(line) != 3:
+        raise _HttpError(400, 'Некорректная строка запроса')
+    method, path, _ = line
+    headers = {}
+    while True:
+        raw = await reader.readline()
+        if raw in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = raw.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0))
+    if length > MAX_BODY:
+        raise _HttpError(413, 'Слишком большой запрос')
+    body = await reader.readexactly(length) if length else b''
+    return method, path.split('?')[0], headers, body
+
+
+def _head(status, content_type, length=None, chunked=False):
+    lines = [f'HTTP/1.1 {status} {_STATUS.get(status, "")}', f'Content-Type: {content_type}', 'Connection: close']
+    lines.append('Transfer-Encoding: chunked' if chunked else f'Content-Length: {length}')
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode()
+
+
+async def _send_json(writer, status, obj):
+    data = json.dumps(obj, ensure_ascii=False).encode()
+    writer.write(_head(status, 'application/json', len(data)) + data)
+    await writer.drain()
+
+
+def serve(host='127.0.0.1', port=DEFAULT_PORT, path=None, workers=None):
+    """Блокирующий запуск сервиса (Ctrl+C - остановка)"""
+    async def main():
+        service = EmcService(workers)
+        address = await service.start(host, port, path)
+        print(f"EMC-сервис: {address}, процессов {service.workers}", flush=True)
+        # SIGTERM - штатная остановка: иначе процессы пула переживают сервис
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        try:
+            await service.server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await service.close()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+
+class _UnixConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+def call(path, payload=None, host='127.0.0.1', port=DEFAULT_PORT, socket_path=None, timeout=60):
+    """
+    Клиент для скриптов и проверки на localhost: POST JSON (GET при payload=None).
+    Для /batch - генератор ответов по мере их прихода, иначе dict.
+    """
+    conn = _UnixConnection(socket_path, timeout) if socket_path else http.client.HTTPConnection(host, port, timeout=timeout)
+    body = None if payload is None else json.dumps(payload).encode()
+    conn.request('GET' if body is None else 'POST', path, body=body, headers={'Content-Type': 'application/json'})
+    response = conn.getresponse()
+    if path == '/batch' and response.status == 200:
+        def lines():
+            try:
+                for line in response:
+                    yield json.loads(line)
+            finally:
+                conn.close()
+        return lines()
+    try:
+        return json.loads(response.read())
+    finally:
+        conn.close()
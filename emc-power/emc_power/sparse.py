@@ -0,0 +1,218 @@
+"""
+Разреженный путь MNA для больших извлеченных цепей (сотни узлов: паразиты дорожек,
+несколько ступеней, ESR/ESL у каждого конденсатора).
+
+Все, что зависит только от структуры схемы, считается один раз при компиляции:
+  - позиции ненулевых элементов A = G + jwCm и операторы "значения элементов ->
+    данные ненулевых" (при смене номиналов перештамповываются только данные);
+  - упорядочение и выбор ведущих элементов: одна факторизация SuperLU (COLAMD +
+    частичный выбор) на пробных данных той же структуры;
+  - символьная факторизация: шаблон заполнения L/U и расписание исключения.
+Численное LU идет без выбора ведущих (статический порядок) сразу для всех частот
+и всех наборов номиналов - векторно по оси точек. Точки, где статический порядок
+дал плохую невязку, пересчитываются обычным splu.
+"""
+import numpy as np
+from scipy.sparse import csc_matrix, csr_matrix
+from scipy.sparse.linalg import splu
+
+from .mna import AcSolution, index_netlist, merge_values
+from .trace import traced
+
+_KINDS = ('R', 'C', 'L', 'K', 'Z')
+CHUNK_ENTRIES = 4_000_000  # Предел (точек x ячеек LU) на один проход, ~64 МБ complex128
+RESIDUAL_TOL = 1e-9        # Относительная невязка, выше которой точка пересчитывается splu
+
+
+class SparseCompiledNetlist:
+    """
+    Разреженный шаблон схемы с тем же интерфейсом solve(frequencies, values), что у
+    CompiledNetlist (Netlist.compile выбирает его сам от SPARSE_MIN_SIZE неизвестных).
+    """
+    def __init__(self, netlist, probe_freq=1e6):
+        self.title = netlist.title
+        self.defaults = {name: e[3] for name, e in netlist.elements.items()}
+        self.nodes, self.branches, self.size = index_netlist(netlist)
+        self.names = {kind: [] for kind in _KINDS}
+        self.k_pairs = []
+        self._stamp_structure(netlist)
+        self._order_and_pivots(probe_freq)
+        self._symbolic()
+        self.fallbacks = 0  # Счетчик точек, пересчитанных splu из-за статического порядка
+
+    def _stamp_structure(self, netlist):
+        entries = []  # (строка, столбец, тип, номер элемента этого типа, коэффициент); тип '' - константа
+
+        def add(kind, name):
+            self.names[kind].append(name)
+            return len(self.names[kind]) - 1
+
+        for name, (kind, n1, n2, _) in netlist.elements.items():
+            if kind == 'K':
+                if n1 not in self.branches or n2 not in self.branches:
+                    raise ValueError(f"{name}: связь должна ссылаться на индуктивности схемы")
+                i, j = self.branches[n1], self.branches[n2]
+                idx = add('K', name)
+                self.k_pairs.append((n1, n2))
+                entries += [(i, j, 'K', idx, -1.0), (j, i, 'K', idx, -1.0)]
+                continue
+            a, c = self.nodes.get(n1), self.nodes.get(n2)
+            if kind in ('R', 'C', 'Z'):
+                idx = add(kind, name)
+                for r, col, sign in ((a, a, 1.0), (c, c, 1.0), (a, c, -1.0), (c, a, -1.0)):
+                    if r is not None and col is not None:
+                        entries.append((r, col, kind, idx, sign))
+                continue
+            k = self.branches[name]
+            for node, sign in ((a, 1.0), (c, -1.0)):
+                if node is not None:
+                    entries += [(node, k, '', 0, sign), (k, node, '', 0, sign)]
+            if kind == 'L':
+                entries.append((k, k, 'L', add('L', name), -1.0))
+
+        n = self.size
+        rows, cols, kinds, elems, coefs = (np.array(x) for x in zip(*entries))
+        flat, pos = np.unique(rows.astype(int) * n + cols.astype(int), return_inverse=True)
+        self.nnz = len(flat)
+        self.rows, self.cols = np.divmod(flat, n)
+        elems, coefs = elems.astype(int), coefs.astype(float)
+
+        # Операторы (nnz, число элементов типа): значения элементов -> вклад в данные ненулевых
+        const = kinds == ''
+        self.g0 = np.bincount(pos[const], weights=coefs[const], minlength=self.nnz)
+        self.ops = {kind: csr_matrix((coefs[kinds == kind], (pos[kinds == kind], elems[kinds == kind])),
+                                     shape=(self.nnz, len(self.names[kind]))) for kind in _KINDS}
+        # Сборка A x по данным ненулевых: (точки, nnz) -> (точки, n)
+        self._scatter = csr_matrix((np.ones(self.nnz), (np.arange(self.nnz), self.rows)), shape=(self.nnz, n))
+        self.v_names = [name for name in self.branches if name.startswith('V')]
+
+    def _order_and_pivots(self, probe_freq):
+        # Перестановки строк/столбцов из одной факторизации SuperLU: Pr A Pc = L U
+        v, batch = merge_values(self.defaults, None)
+        g, cm, z = self._data(v, batch, np.array([2 * np.pi * probe_freq]))
+        data = g[:, 0] + 1j * 2 * np.pi * probe_freq * cm[:, 0] + (z[:, 0, 0] if z is not None else 0)
+        lu = splu(csc_matrix((data, (self.rows, self.cols)), shape=(self.size, self.size)), permc_spec='COLAMD')
+        self.perm_r, self.perm_c = lu.perm_r, lu.perm_c
+
+    def _symbolic(self):
+        # Шаблон заполнения LU переставленной матрицы и расписание исключения по столбцам
+        n = self.size
+        r, c = self.perm_r[self.rows], self.perm_c[self.cols]
+        row_cols = [set() for _ in range(n)]
+        col_rows = [set() for _ in range(n)]
+        for i, j in zip(r, c):
+            row_cols[i].add(j)
+            col_rows[j].add(i)
+        for k in range(n):
+            row_cols[k].add(k)
+            col_rows[k].add(k)
+        steps = []
+        for k in range(n):
+            below = sorted(i for i in col_rows[k] if i > k)
+            right = sorted(j for j in row_cols[k] if j > k)
+            for i in below:
+                row_cols[i].update(right)
+            for j in right:
+                col_rows[j].update(below)
+            steps.append((k, below, right))
+
+        slot = {}
+        for i in range(n):
+            for j in sorted(row_cols[i]):
+                slot[(i, j)] = len(slot)
+        self.slots = len(slot)
+        self._entry_slots = np.array([slot[(i, j)] for i, j in zip(r, c)])
+        self._pivots = np.array([slot[(k, k)] for k in range(n)])
+
+        self._elim, self._forward = [], []
+        for k, below, right in steps:
+            if not below:
+                continue
+            l_slots = np.array([slot[(i, k)] for i in below])
+            self._forward.append((k, np.array(below), l_slots))
+            if right:
+                u_slots = np.array([slot[(k, j)] for j in right])
+                targets = np.array([slot[(i, j)] for i in below for j in right])
+                self._elim.append((k, l_slots, np.repeat(l_slots, len(right)), np.tile(u_slots, len(below)), targets))
+            else:
+                self._elim.append((k, l_slots, None, None, None))
+        self._backward = []
+        for k in range(n - 1, -1, -1):
+            above = sorted(i for i in col_rows[k] if i < k)
+            self._backward.append((k, np.array(above, dtype=int), np.array([slot[(i, k)] for i in above], dtype=int)))
+
+    def _data(self, v, batch, omega):
+        # Данные ненулевых по точкам батча: G (nnz, B), Cm (nnz, B), Z (nnz, B, F) или None
+        size = int(np.prod(batch))
+
+        def stamp(kind, values):
+            if not values:
+                return np.zeros((self.nnz, size))
+            return self.ops[kind] @ np.stack([np.broadcast_to(x, batch).reshape(size) for x in values])
+
+        g = self.g0[:, None] + stamp('R', [1.0 / v[name] for name in self.names['R']])
+        m = [v[name] * np.sqrt(v[l1] * v[l2]) for name, (l1, l2) in zip(self.names['K'], self.k_pairs)]
+        cm = (stamp('C', [v[name] for name in self.names['C']])
+              + stamp('L', [v[name] for name in self.names['L']]) + stamp('K', m))
+        z = None
+        if self.names['Z']:
+            f = len(omega)
+            y = np.stack([np.broadcast_to(1.0 / v[name], batch + (f,)).reshape(size * f) for name in self.names['Z']])
+            z = (self.ops['Z'] @ y).reshape(self.nnz, size, f)
+        return g, cm, z
+
+    def _factor_solve(self, data, rhs):
+        # Численное LU со статическим порядком для всех точек сразу: data (nnz, P), rhs (n, P).
+        # Точки - последняя ось: каждый шаг исключения берет непрерывные строки массива
+        lu = np.zeros((self.slots, data.shape[1]), dtype=complex)
+        lu[self._entry_slots] = data
+        for k, l_slots, li, uj, targets in self._elim:
+            lu[l_slots] /= lu[self._pivots[k]]
+            if targets is not None:
+                lu[targets] -= lu[li] * lu[uj]
+        y = np.empty_like(rhs)
+        y[self.perm_r] = rhs
+        for k, rows, l_slots in self._forward:
+            y[rows] -= lu[l_slots] * y[k]
+        for k, rows, u_slots in self._backward:
+            y[k] /= lu[self._pivots[k]]
+            if len(rows):
+                y[rows] -= lu[u_slots] * y[k]
+        return y[self.perm_c]
+
+    def _residual(self, data, x, rhs):
+        ax = self._scatter.T @ (data * x[self.cols])
+        return np.linalg.norm(ax - rhs, axis=0) / np.maximum(np.linalg.norm(rhs, axis=0), 1e-300)
+
+    @traced('mna.solve_sparse')
+    def solve(self, frequencies, values=None):
+        """AC-анализ: все частоты и наборы номиналов одним векторным проходом LU"""
+        freqs = np.atleast_1d(np.asarray(frequencies, dtype=float))
+        v, batch = merge_values(self.defaults, values)
+        size, nf = int(np.prod(batch)), len(freqs)
+        omega = 2 * np.pi * freqs
+        g, cm, z = self._data(v, batch, omega)
+
+        rhs = np.zeros((self.size, size), dtype=complex)
+        for name in self.v_names:
+            rhs[self.branches[name]] = np.broadcast_to(v[name], batch).reshape(size)
+
+        # Точки = (набор номиналов, частота) подряд; порции ограничены CHUNK_ENTRIES
+        x = np.empty((self.size, size * nf), dtype=complex)
+        step = max(1, CHUNK_ENTRIES // self.slots)
+        for start in range(0, size * nf, step):
+            idx = np.arange(start, min(start + step, size * nf))
+            b, f = np.divmod(idx, nf)
+            data = g[:, b] + 1j * omega[f] * cm[:, b]
+            if z is not None:
+                data += z[:, b, f]
+            with np.errstate(all='ignore'):
+                xs = self._factor_solve(data, rhs[:, b])
+                bad = ~(self._residual(data, xs, rhs[:, b]) <= RESIDUAL_TOL)
+            for p in np.flatnonzero(bad):
+                a = csc_matrix((data[:, p], (self.rows, self.cols)), shape=(self.size, self.size))
+                xs[:, p] = splu(a, permc_spec='COLAMD').solve(rhs[:, b[p]])
+            self.fallbacks += int(bad.sum())
+            x[:, idx] = xs
+        x = np.moveaxis(x.reshape((self.size,) + batch + (nf,)), 0, -1)
+        return AcSolution(self, freqs, x)
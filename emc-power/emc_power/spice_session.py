@@ -0,0 +1,170 @@
+"""
+Постоянная сессия NgSpice (shared library) для расчетов с SPICE-точностью.
+
+Netlist фильтра загружается в ngspice один раз, между расчетами номиналы меняются
+командой alter, а вывод симулятора глушится через callback'и библиотеки, без
+перенаправления файловых дескрипторов (SuppressOutput).
+
+Для V5 оба режима (DM и CM) живут в одной схеме с раздельными узлами, поэтому
+один запуск .ac отдает оба результата; повторный вызов с теми же номиналами
+для второго режима берется из последнего прогона.
+"""
+import logging
+
+import numpy as np
+
+from .circuits import PI_MODELS, PI_R_SOURCE, V5_COUPLING, V5_DCR_OHM, V5_R_LOAD, V5_R_SOURCE
+from .trace import traced
+
+_ACTIVE = {'ngspice': None, 'owner': None}
+_SESSIONS = {}
+
+
+def _v5_netlist(dcr=V5_DCR_OHM, k=V5_COUPLING):
+    lines = ['.title emc_v5_session']
+    for mode in ('dm', 'cm'):
+        if mode == 'dm':
+            lines += ['Vin_dm n_in_p_dm n_in_n_dm dc 0 ac 1',
+                      f'Rrs1_dm n_in_p_dm n1_p_dm {V5_R_SOURCE}',
+                      f'Rrs2_dm n_in_n_dm n1_n_dm {V5_R_SOURCE}']
+        else:
+            lines += ['Vin_cm n_common_cm 0 dc 0 ac 1',
+                      f'Rrs1_cm n_common_cm n1_p_cm {V5_R_SOURCE}',
+                      f'Rrs2_cm n_common_cm n1_n_cm {V5_R_SOURCE}']
+        lines += [f'Cx1_{mode} n1_p_{mode} n1_n_{mode} 1u',
+                  f'Lcm1_{mode} n1_p_{mode} n2_p_{mode} 1m',
+                  f'Lcm2_{mode} n1_n_{mode} n2_n_{mode} 1m',
+                  f'Kk_core_{mode} Lcm1_{mode} Lcm2_{mode} {k}',
+                  f'Rdcr1_{mode} n2_p_{mode} n3_p_{mode} {dcr}',
+                  f'Rdcr2_{mode} n2_n_{mode} n3_n_{mode} {dcr}',
+                  f'Cy1_{mode} n3_p_{mode} 0 1n',
+                  f'Cy2_{mode} n3_n_{mode} 0 1n',
+                  f'Rload_{mode} n3_p_{mode} n3_n_{mode} {V5_R_LOAD}']
+    return '\n'.join(lines + ['.end'])
+
+
+def _pi_netlist(version):
+    m = PI_MODELS[version]
+    return '\n'.join([
+        f'.title emc_pi_{version}_session',
+        'Vinput input_gen 0 dc 0 ac 1',
+        f'Rsource input_gen n1 {PI_R_SOURCE}',
+        'C1 n1 c1_i 1u', f'Rc1r c1_i c1_l {m["esr"]}', f'Lc1l c1_l 0 {m["esl"]}',
+        'L1 n1 l1_i 1u', f'Rl1r l1_i n2 {m["dcr"]}',
+        'C2 n2 c2_i 1u', f'Rc2r c2_i c2_l {m["esr"]}', f'Lc2l c2_l 0 {m["esl"]}',
+        'Rload n2 0 50',
+        '.end',
+    ])
+
+
+def _ngspice():
+    """Один экземпляр libngspice на процесс, вывод которого никуда не печатается"""
+    if _ACTIVE['ngspice'] is None:
+        from PySpice.Spice.NgSpice.Shared import NgSpiceShared
+
+        class QuietNgSpice(NgSpiceShared):
+            def send_char(self, message, ngspice_id):
+                return 0
+
+            def send_stat(self, message, ngspice_id):
+                return 0
+
+        # Сообщения ngspice PySpice дублирует в свой логгер - глушим и его
+        logging.getLogger('PySpice.Spice.NgSpice.Shared').setLevel(logging.CRITICAL)
+        _ACTIVE['ngspice'] = QuietNgSpice(ngspice_id=0, send_data=False)
+    return _ACTIVE['ngspice']
+
+
+class SpiceSession:
+    """
+    Прогретая SPICE-модель одной топологии: 'v5' или 'v2'/'v3'/'v4' (П-фильтр).
+    simulate(params, mode, r_load) - тот же контракт, что у simulate_full_filter/simulate_filter.
+    """
+    def __init__(self, topology='v5', **model):
+        self.topology = topology
+        self.netlist = _v5_netlist(**model) if topology == 'v5' else _pi_netlist(topology)
+        self.runs = 0
+        self._last_key = None
+        self._last_plot = None
+
+    def _activate(self):
+        ngspice = _ngspice()
+        if _ACTIVE['owner'] is not self:
+            if _ACTIVE['owner'] is not None:
+                ngspice.remove_circuit()
+            ngspice.load_circuit(self.netlist)
+            _ACTIVE['owner'] = self
+            self._last_key = None
+        return ngspice
+
+    def _alter_commands(self, params, r_load):
+        if self.topology == 'v5':
+            cx, lcm, cy = params
+            cmds = []
+            for mode in ('dm', 'cm'):
+                cmds += [f'alter cx1_{mode} = {cx * 1e-6:.12g}',
+                         f'alter lcm1_{mode} = {lcm * 1e-3:.12g}',
+                         f'alter lcm2_{mode} = {lcm * 1e-3:.12g}',
+                         f'alter cy1_{mode} = {cy * 1e-9:.12g}',
+                         f'alter cy2_{mode} = {cy * 1e-9:.12g}',
+                         f'alter rload_{mode} = {r_load:.12g}']
+            return cmds
+        l_val, c1_val, c2_val = params
+        return [f'alter l1 = {l_val * 1e-6:.12g}',
+                f'alter c1 = {c1_val * 1e-6:.12g}',
+                f'alter c2 = {c2_val * 1e-6:.12g}',
+                f'alter rload = {r_load:.12g}']
+
+    @staticmethod
+    def _ac_command(freqs):
+        if len(freqs) == 1:
+            return f'ac lin 1 {freqs[0]:.12g} {freqs[0]:.12g}'
+        # Логарифмическая сетка ngspice не реже запрошенной; результат интерполируется в simulate
+        decades = np.log10(freqs[-1] / freqs[0])
+        points = max(1, int(np.ceil((len(freqs) - 1) / max(decades, 1e-12))))
+        return f'ac dec {points} {freqs[0]:.12g} {freqs[-1]:.12g}'
+
+    @traced('spice_session.run')
+    def _run(self, params, r_load, freqs):
+        key = (tuple(float(p) for p in params), float(r_load), tuple(freqs))
+        if key == self._last_key:
+            return self._last_plot
+        ngspice = self._activate()
+        for cmd in self._alter_commands(params, r_load):
+            ngspice.exec_command(cmd)
+        ngspice.exec_command(self._ac_command(freqs))
+        plot_name = ngspice.last_plot
+        plot = ngspice.plot(None, plot_name)
+        vectors = {name: np.asarray(vec.to_waveform()) for name, vec in plot.items()}
+        ngspice.destroy(plot_name)  # Не копим результаты в памяти ngspice
+        self.runs += 1
+        self._last_key, self._last_plot = key, vectors
+        return vectors
+
+    def simulate(self, params, mode='DM', r_load=None, frequencies=150e3):
+        """Затухание в дБ: float для одной частоты, массив для сетки частот"""
+        freqs = [float(f) for f in np.atleast_1d(frequencies)]
+        if r_load is None:
+            r_load = V5_R_LOAD if self.topology == 'v5' else 50.0
+        vec = self._run(params, r_load, freqs)
+        if self.topology == 'v5':
+            sfx = mode.lower()
+            v_out = vec[f'n3_p_{sfx}'] - vec[f'n3_n_{sfx}'] if mode == 'DM' else vec[f'n3_p_{sfx}']
+        else:
+            v_out = vec['n2']
+        gain = 20 * np.log10(np.abs(v_out) + 1e-15)
+        if np.ndim(frequencies) == 0:
+            return float(gain[0])
+        if len(freqs) == 1:
+            return gain
+        # ac dec считает свою сетку (другие длина и шаг) - на запрошенные частоты, как ветка ngspice V5
+        grid = np.asarray(vec['frequency']).real
+        return np.interp(np.log10(freqs), np.log10(grid), gain)
+
+
+def spice_session(topology='v5', **model):
+    """Сессия на процесс для каждой топологии и модели (dcr, k для V5); создается при первом обращении"""
+    key = (topology, tuple(sorted(model.items())))
+    if key not in _SESSIONS:
+        _SESSIONS[key] = SpiceSession(topology, **model)
+    return _SESSIONS[key]
@@ -0,0 +1,126 @@
+"""
+Оптимизация с суррогатной моделью: меньше обращений к дорогому симулятору.
+
+Штраф 5e6 + excess^2 * 5000 делает целевую функцию V5 плато, на котором
+Nelder-Mead тратит сотни симуляций. Здесь функции разделены: габариты и ток
+утечки известны аналитически, моделируется только гладкая величина -
+превышение ТЗ, дБ (constraint(x) <= 0 - ТЗ выполнено). Модель - гауссовский
+процесс (NumPy) по log-масштабированным [cx, lcm, cy]. Следующая точка -
+максимум ожидаемого улучшения габаритов с учетом вероятности выполнения ТЗ
+(constrained EI); симулятор вызывается только для этой точки.
+"""
+import numpy as np
+from scipy.optimize import OptimizeResult, minimize
+from scipy.special import ndtr
+from scipy.stats import qmc
+
+JITTER = 1e-8  # Симулятор детерминированный: шум модели - только для устойчивости Холецкого
+
+
+class GaussianProcess:
+    """ГП с квадратично-экспоненциальным ядром и своей длиной корреляции по каждой оси"""
+    def __init__(self, restarts=3, seed=0):
+        self.restarts = restarts
+        self.rng = np.random.default_rng(seed)
+
+    def _kernel(self, a, b, log_ell, log_amp):
+        d = (a[:, None, :] - b[None, :, :]) / np.exp(log_ell)
+        return np.exp(log_amp) * np.exp(-0.5 * np.sum(d**2, axis=-1))
+
+    def _nll(self, theta, u, y):
+        k = self._kernel(u, u, theta[:-1], theta[-1]) + JITTER * np.eye(len(u))
+        try:
+            chol = np.linalg.cholesky(k)
+        except np.linalg.LinAlgError:
+            return 1e10
+        alpha = np.linalg.solve(chol.T, np.linalg.solve(chol, y))
+        return 0.5 * y @ alpha + np.log(np.diag(chol)).sum()
+
+    def fit(self, u, y):
+        self.u = np.asarray(u, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.y_mean, self.y_std = y.mean(), y.std() or 1.0
+        ys = (y - self.y_mean) / self.y_std
+
+        dim = self.u.shape[1]
+        bounds = [(np.log(0.02), np.log(10.0))] * dim + [(np.log(0.1), np.log(10.0))]
+        starts = [np.r_[np.full(dim, np.log(0.3)), 0.0]]
+        starts += [np.array([self.rng.uniform(*b) for b in bounds]) for _ in range(self.restarts - 1)]
+        best = min((minimize(self._nll, s, args=(self.u, ys), method='L-BFGS-B', bounds=bounds)
+                    for s in starts), key=lambda r: r.fun)
+        self.theta = best.x
+
+        k = self._kernel(self.u, self.u, self.theta[:-1], self.theta[-1]) + JITTER * np.eye(len(self.u))
+        self.chol = np.linalg.cholesky(k)
+        self.alpha = np.linalg.solve(self.chol.T, np.linalg.solve(self.chol, ys))
+        return self
+
+    def predict(self, u):
+        """Среднее и СКО прогноза в точках u (N, dim)"""
+        ks = self._kernel(np.asarray(u, dtype=float), self.u, self.theta[:-1], self.theta[-1])
+        mu = ks @ self.alpha
+        v = np.linalg.solve(self.chol, ks.T)
+        var = np.maximum(np.exp(self.theta[-1]) - np.sum(v**2, axis=0), 1e-12)
+        return self.y_mean + mu * self.y_std, np.sqrt(var) * self.y_std
+
+
+def constrained_ei(cost, mu, sigma, best_cost):
+    """
+    Ожидаемое улучшение по габаритам x вероятность выполнения ТЗ.
+    Габариты известны точно, поэтому улучшение детерминированное;
+    пока выполнимых точек нет - чистая вероятность выполнения.
+    """
+    feasible = ndtr(-mu / sigma)
+    if not np.isfinite(best_cost):
+        return feasible
+    return np.maximum(best_cost - cost, 0.0) * feasible
+
+
+def surrogate_minimize(constraint, cost, bounds, max_evals=60, n_initial=12, n_candidates=8192,
+                       seed=0, tol=1e-3):
+    """
+    Минимум cost(x) при constraint(x) <= 0 с вызовами constraint только в выбранных точках.
+    constraint(x) -> float (превышение ТЗ, дБ; дорогой симулятор), cost(cands) -> (N,)
+    (дешевая батч-функция). bounds - в тех же единицах, что x (log-масштаб внутри);
+    известные ограничения (ток утечки) задаются через bounds.
+    Останов - бюджет max_evals или ожидаемое улучшение меньше tol от лучшей цены.
+    """
+    rng = np.random.default_rng(seed)
+    lo = np.log10([b[0] for b in bounds])
+    hi = np.log10([b[1] for b in bounds])
+
+    def to_x(u):
+        return 10**(lo + np.asarray(u) * (hi - lo))
+
+    u_all = qmc.LatinHypercube(d=len(bounds), seed=seed).random(n_initial)
+    g_all = np.array([constraint(x) for x in to_x(u_all)])
+    gp = GaussianProcess(seed=seed)
+
+    while len(g_all) < max_evals:
+        costs = cost(to_x(u_all))
+        ok = g_all <= 0
+        best_cost = costs[ok].min() if ok.any() else np.inf
+
+        gp.fit(u_all, g_all)
+        # Кандидаты: равномерно по области + облако вокруг лучших известных точек
+        anchors = u_all[ok][np.argsort(costs[ok])[:3]] if ok.any() else u_all[np.argsort(g_all)[:3]]
+        local = (anchors[rng.integers(0, len(anchors), n_candidates // 2)]
+                 + rng.normal(0, 0.03, (n_candidates // 2, len(bounds))))
+        cands = np.clip(np.vstack([rng.random((n_candidates // 2, len(bounds))), local]), 0, 1)
+        mu, sigma = gp.predict(cands)
+        acq = constrained_ei(cost(to_x(cands)), mu, sigma, best_cost)
+
+        pick = int(np.argmax(acq))
+        if np.isfinite(best_cost) and acq[pick] < tol * best_cost:
+            break
+        u_all = np.vstack([u_all, cands[pick]])
+        g_all = np.append(g_all, constraint(to_x(cands[pick])))
+
+    costs = cost(to_x(u_all))
+    ok = g_all <= 0
+    if ok.any():
+        i = np.flatnonzero(ok)[np.argmin(costs[ok])]
+    else:
+        i = int(np.argmin(g_all))
+    return OptimizeResult(x=to_x(u_all[i]), fun=float(costs[i]), success=bool(ok.any()),
+                          nfev=len(g_all), constraint=float(g_all[i]))
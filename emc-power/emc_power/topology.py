@@ -0,0 +1,240 @@
+"""
+Синтез топологии фильтра: структуры-кандидаты описываются данными, а не кодом.
+
+Топология - последовательность элементов от источника к нагрузке:
+  'Cx'  - X-конденсатор между линиями, uF;
+  'Cy'  - пара Y-конденсаторов линия-земля, nF;
+  'CMC' - синфазный дроссель (две связанные обмотки + DCR), mH;
+  'DM'  - дифференциальный дроссель (по обмотке в каждой линии, без связи, + DCR), uH.
+Каждый элемент - свой параметр оптимизации. Описание компилируется в шаблон MNA
+один раз на (топология, режим), дальше меняются только значения элементов.
+Кандидаты оптимизируются параллельно (процесс на топологию) и ранжируются по
+габаритам при одинаковом требовании к запасу.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .circuits import V5_COUPLING, V5_DCR_OHM, V5_R_LOAD, V5_R_SOURCE
+from .mask import adaptive_sweep, worst_margin
+from .mna import Netlist
+from .objective import leakage_ma
+
+# Тип элемента -> единица, множитель в СИ, границы поиска, условные габариты на единицу
+ELEMENT_TYPES = {
+    'Cx': {'unit': 'uF', 'scale': 1e-6, 'bounds': (0.01, 20.0), 'size': 1.0},
+    'Cy': {'unit': 'nF', 'scale': 1e-9, 'bounds': (0.1, 48.0), 'size': 1.0},
+    'CMC': {'unit': 'mH', 'scale': 1e-3, 'bounds': (0.1, 50.0), 'size': 1.0},
+    'DM': {'unit': 'uH', 'scale': 1e-6, 'bounds': (1.0, 500.0), 'size': 0.05},
+}
+
+TOPOLOGIES = {
+    'cmc': ('Cx', 'CMC', 'Cy'),                            # V5
+    'cmc_x2': ('Cx', 'CMC', 'Cy', 'Cx'),                   # + второй X-конденсатор
+    'dm_cmc': ('Cx', 'DM', 'Cx', 'CMC', 'Cy'),             # + DM-дроссель
+    'two_stage': ('Cx', 'CMC', 'Cy', 'Cx', 'CMC', 'Cy'),   # две ступени
+}
+
+_TEMPLATES = {}
+
+
+def build_topology(elements, mode='DM'):
+    """
+    Netlist топологии (источник и нагрузка как в V5). Номиналы - заглушки,
+    реальные значения подставляются при решении; выход - узлы out_p / out_n.
+    """
+    circuit = Netlist(f"EMC_{'_'.join(elements)}_{mode}")
+    if mode == 'DM':
+        circuit.V('input', 'n_in_p', 'n_in_n')
+        circuit.R('rs1', 'n_in_p', 'n0_p', V5_R_SOURCE)
+        circuit.R('rs2', 'n_in_n', 'n0_n', V5_R_SOURCE)
+    else:  # Common Mode
+        circuit.V('input', 'n_common', circuit.gnd)
+        circuit.R('rs1', 'n_common', 'n0_p', V5_R_SOURCE)
+        circuit.R('rs2', 'n_common', 'n0_n', V5_R_SOURCE)
+
+    node = 0
+    for i, kind in enumerate(elements):
+        p, n = f'n{node}_p', f'n{node}_n'
+        if kind == 'Cx':
+            circuit.C(f'e{i}', p, n, 1e-6)
+        elif kind == 'Cy':
+            circuit.C(f'e{i}_p', p, circuit.gnd, 1e-9)
+            circuit.C(f'e{i}_n', n, circuit.gnd, 1e-9)
+        elif kind in ('CMC', 'DM'):
+            node += 1
+            circuit.L(f'e{i}_p', p, f'e{i}_p_i', 1e-3)
+            circuit.L(f'e{i}_n', n, f'e{i}_n_i', 1e-3)
+            if kind == 'CMC':
+                circuit.K(f'e{i}', f'Le{i}_p', f'Le{i}_n', V5_COUPLING)
+            circuit.R(f'e{i}_p_dcr', f'e{i}_p_i', f'n{node}_p', V5_DCR_OHM)
+            circuit.R(f'e{i}_n_dcr', f'e{i}_n_i', f'n{node}_n', V5_DCR_OHM)
+        else:
+            raise ValueError(f"Неизвестный тип элемента: {kind}")
+    circuit.R('load', f'n{node}_p', f'n{node}_n', V5_R_LOAD)
+    circuit.out_nodes = (f'n{node}_p', f'n{node}_n')
+    return circuit
+
+
+def topology_template(elements, mode='DM'):
+    """Скомпилированный шаблон топологии и ее выходные узлы (кэш на процесс)"""
+    key = (tuple(elements), mode)
+    if key not in _TEMPLATES:
+        circuit = build_topology(elements, mode)
+        _TEMPLATES[key] = (circuit.compile(), circuit.out_nodes)
+    return _TEMPLATES[key]
+
+
+def topology_values(elements, params, dcr=V5_DCR_OHM, k=V5_COUPLING):
+    """params (..., len(elements)) в единицах ELEMENT_TYPES -> значения элементов шаблона"""
+    p = np.asarray(params, dtype=float)
+    values = {}
+    for i, kind in enumerate(elements):
+        v = p[..., i] * ELEMENT_TYPES[kind]['scale']
+        if kind == 'Cx':
+            values[f'Ce{i}'] = v
+        elif kind == 'Cy':
+            values[f'Ce{i}_p'] = values[f'Ce{i}_n'] = v
+        else:
+            values[f'Le{i}_p'] = values[f'Le{i}_n'] = v
+            values[f'Re{i}_p_dcr'] = values[f'Re{i}_n_dcr'] = dcr
+            if kind == 'CMC':
+                values[f'Ke{i}'] = k
+    return values
+
+
+def topology_gain_db(elements, params, mode='DM', frequencies=150e3, dcr=V5_DCR_OHM):
+    """Затухание топологии в дБ (DM: V(out_p) - V(out_n), CM: V(out_p)), форма (..., F)"""
+    tpl, (out_p, out_n) = topology_template(elements, mode)
+    res = tpl.solve(frequencies, topology_values(elements, params, dcr))
+    v = res.node(out_p) - res.node(out_n) if mode == 'DM' else res.node(out_p)
+    return 20 * np.log10(np.abs(v) + 1e-15)
+
+
+def topology_labels(elements):
+    """Подписи параметров: Cx1, CMC1, Cy1, Cx2, ... с единицами"""
+    seen = {}
+    labels = []
+    for kind in elements:
+        seen[kind] = seen.get(kind, 0) + 1
+        labels.append(f"{kind}{seen[kind]}, {ELEMENT_TYPES[kind]['unit']}")
+    return labels
+
+
+def topology_bounds(elements):
+    return [ELEMENT_TYPES[kind]['bounds'] for kind in elements]
+
+
+def topology_size_cost(elements, candidates):
+    """Условные габариты: сумма значений с весами типов"""
+    weights = np.array([ELEMENT_TYPES[kind]['size'] for kind in elements])
+    return np.asarray(candidates, dtype=float) @ weights
+
+
+def topology_leakage_ma(elements, candidates):
+    """Утечка на линию: все Y-конденсаторы топологии параллельно"""
+    p = np.asarray(candidates, dtype=float)
+    cy = [i for i, kind in enumerate(elements) if kind == 'Cy']
+    return leakage_ma(p[..., cy].sum(axis=-1)) if cy else np.zeros(p.shape[:-1])
+
+
+def topology_excess(elements, candidates, target_freq_khz=150, target_db=-60, dcr=V5_DCR_OHM, mask=None):
+    """Худшее из DM/CM превышение требования, дБ (> 0 - нарушение), (N,)"""
+    p = np.atleast_2d(np.asarray(candidates, dtype=float))
+
+    def response(freqs):
+        return np.maximum(topology_gain_db(elements, p, 'DM', freqs, dcr),
+                          topology_gain_db(elements, p, 'CM', freqs, dcr))
+
+    if mask is None:
+        return response(target_freq_khz * 1e3)[:, 0] - target_db
+    freqs, gains = adaptive_sweep(response, *mask.band, mask=mask)
+    return worst_margin(freqs, gains, mask)
+
+
+def topology_objective_batch(elements, candidates, target_freq_khz=150, target_db=-60, max_leakage_ma=3.5,
+                             dcr=V5_DCR_OHM, mask=None):
+    """Оценка популяции по правилам objective() V5: габариты + штрафы за ТЗ и утечку"""
+    p = np.atleast_2d(np.asarray(candidates, dtype=float))
+    scores = np.empty(len(p))
+    leak = topology_leakage_ma(elements, p)
+    leaky = leak > max_leakage_ma
+    scores[leaky] = 1e9 + (leak[leaky] - max_leakage_ma) * 1000
+    valid = ~leaky
+    if valid.any():
+        excess = topology_excess(elements, p[valid], target_freq_khz, target_db, dcr, mask)
+        penalty = np.where(excess > 0, 5e6 + excess**2 * 5000, 0.0)
+        scores[valid] = penalty + topology_size_cost(elements, p[valid])
+    return scores
+
+
+def optimize_topology(name, elements, target_freq_khz=150, target_db=-60, max_leakage_ma=3.5,
+                      load_current_a=10.0, dcr=V5_DCR_OHM, series='E24', margin_db=0.0, mask=None, seed=0,
+                      maxiter=300):
+    """
+    Одна топология: DE в log-масштабе границ (батч-популяция), затем дискретный
+    поиск по ряду. margin_db - требуемый запас ниже target_db. Возвращает dict.
+    """
+    from scipy.optimize import differential_evolution
+    from .eseries import discrete_search, snap
+
+    elements = tuple(elements)
+    kwargs = dict(target_freq_khz=target_freq_khz, target_db=target_db - margin_db, dcr=dcr, mask=mask)
+    log_bounds = np.log10(topology_bounds(elements))
+
+    def batch(x):
+        return topology_objective_batch(elements, 10**np.asarray(x).T, max_leakage_ma=max_leakage_ma, **kwargs)
+
+    res = differential_evolution(batch, log_bounds, vectorized=True, updating='deferred', seed=seed,
+                                 tol=1e-6, maxiter=maxiter)
+    x = 10**res.x
+
+    def feasible(cands):
+        ok = topology_leakage_ma(elements, cands) <= max_leakage_ma
+        if ok.any():
+            ok[ok] = topology_excess(elements, cands[ok], **kwargs) <= 0
+        return ok
+
+    # Окрестность дискретного поиска растет как (2w+1)^n - для длинных топологий она уже
+    width = (2, 6) if len(elements) <= 3 else (1, 2)
+    best, checked = discrete_search(x, feasible, lambda c: topology_size_cost(elements, c), series,
+                                    width=width[0], max_width=width[1])
+    as_built = best if best is not None else snap(x, series)
+    f = target_freq_khz * 1e3
+    chokes = sum(kind in ('CMC', 'DM') for kind in elements)
+    return {
+        'topology': name, 'elements': list(elements),
+        'labels': topology_labels(elements),
+        'continuous': [float(v) for v in x],
+        'values': [float(v) for v in np.atleast_1d(as_built)],
+        'feasible': best is not None, 'checked': checked, 'nfev': int(res.nfev),
+        'size_cost': float(topology_size_cost(elements, as_built)),
+        'dm_db': float(topology_gain_db(elements, as_built, 'DM', f, dcr)[0]),
+        'cm_db': float(topology_gain_db(elements, as_built, 'CM', f, dcr)[0]),
+        'margin_db': float(-topology_excess(elements, as_built, target_freq_khz, target_db, dcr, mask)[0]),
+        'leakage_ma': float(topology_leakage_ma(elements, as_built)),
+        'loss_w': 2 * load_current_a**2 * chokes * dcr,
+    }
+
+
+def _optimize_task(task):
+    name, elements, kwargs = task
+    return optimize_topology(name, elements, **kwargs)
+
+
+def synthesize(topologies=None, workers=None, **kwargs):
+    """
+    Оптимизация всех топологий-кандидатов параллельно (процесс на топологию).
+    kwargs - аргументы optimize_topology (цели, ряд, margin_db, маска).
+    Возвращает результаты по возрастанию габаритов; невыполнимые - в конце.
+    """
+    topologies = TOPOLOGIES if topologies is None else topologies
+    tasks = [(name, tuple(elements), kwargs) for name, elements in topologies.items()]
+    workers = min(workers or os.cpu_count(), len(tasks))
+    if workers == 1:
+        results = [_optimize_task(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_optimize_task, tasks))
+    return sorted(results, key=lambda r: (not r['feasible'], r['size_cost']))
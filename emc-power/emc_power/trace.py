@@ -0,0 +1,122 @@
+"""
+Опциональная трассировка горячих путей (включается переменной окружения).
+
+EMC_TRACE=trace.json python emc_optimizer_v5.py - счетчики вызовов и суммарное
+время по этапам, журнал вычислений objective (параметры, ветка штрафа, оценка)
+и файл Chrome trace (chrome://tracing, Perfetto) в конце прогона.
+
+Без EMC_TRACE декоратор traced возвращает функцию как есть, span - общий
+пустой контекст, event - ранний return: в рабочем режиме накладных расходов
+практически нет.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from functools import wraps
+
+TRACE_ENV = 'EMC_TRACE'
+PATH = os.environ.get(TRACE_ENV) or None
+ENABLED = PATH is not None
+
+_NULL = nullcontext()
+_EVENTS = []
+_STATS = {}  # имя -> [вызовов, суммарное время, с]
+_T0 = time.perf_counter()
+
+
+def _now_us():
+    return (time.perf_counter() - _T0) * 1e6
+
+
+def _record(name, start_us, args):
+    dur = _now_us() - start_us
+    stat = _STATS.setdefault(name, [0, 0.0])
+    stat[0] += 1
+    stat[1] += dur / 1e6
+    _EVENTS.append({'name': name, 'ph': 'X', 'ts': start_us, 'dur': dur, 'pid': os.getpid(),
+                    'tid': threading.get_ident(), 'args': args})
+
+
+class _Span:
+    __slots__ = ('name', 'args', 'start')
+
+    def __init__(self, name, args):
+        self.name, self.args = name, args
+
+    def __enter__(self):
+        self.start = _now_us()
+        return self
+
+    def __exit__(self, *exc):
+        _record(self.name, self.start, self.args)
+
+
+def span(name, **args):
+    """Контекст этапа: with span('v5.netlist'): ..."""
+    return _Span(name, args) if ENABLED else _NULL
+
+
+def traced(name=None):
+    """Декоратор функции; без EMC_TRACE функция не оборачивается вовсе"""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+        label = name or fn.__qualname__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = _now_us()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _record(label, start, {})
+        return wrapper
+    return decorate
+
+
+def event(name, **args):
+    """Мгновенное событие с данными (например, одно вычисление objective)"""
+    if not ENABLED:
+        return
+    stat = _STATS.setdefault(name, [0, 0.0])
+    stat[0] += 1
+    _EVENTS.append({'name': name, 'ph': 'i', 's': 't', 'ts': _now_us(), 'pid': os.getpid(),
+                    'tid': threading.get_ident(), 'args': _plain(args)})
+
+
+def _plain(value):
+    # Массивы NumPy и числа NumPy -> JSON-совместимые типы
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return value
+
+
+def stats():
+    """Сводка по этапам: {имя: {'calls', 'total_s', 'mean_ms'}}"""
+    return {name: {'calls': n, 'total_s': total, 'mean_ms': total / n * 1e3 if n else 0.0}
+            for name, (n, total) in sorted(_STATS.items(), key=lambda kv: -kv[1][1])}
+
+
+def dump(path=None):
+    """Запись Chrome trace (+ сводка в поле stats); в дочерних процессах - path.<pid>"""
+    import multiprocessing
+
+    path = path or PATH
+    if not path:
+        return None
+    if multiprocessing.parent_process() is not None:
+        path = f'{path}.{os.getpid()}'
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump({'traceEvents': _EVENTS, 'displayTimeUnit': 'ms', 'stats': stats()}, fh)
+    return path
+
+
+if ENABLED:
+    atexit.register(dump)
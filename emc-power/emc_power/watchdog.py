@@ -0,0 +1,186 @@
+"""
+Изолированный запуск симулятора с дедлайном на каждый расчет.
+
+Вызов функции симуляции уходит в отдельный процесс-исполнитель (ngspice живет там,
+а не в процессе оптимизатора). Если ответа нет за timeout секунд или процесс упал,
+он убивается и при следующем вызове поднимается заново; такие сбои повторяются
+не более retries раз. Исключение самого симулятора (нет сходимости, ошибка
+netlist) детерминировано для данных номиналов и не повторяется.
+
+Вместо числа при сбое возвращается SimFailure - целевая функция штрафует его явно,
+а кэш расчетов его не запоминает. Счетчики сбоев и задержки (по окну последних
+LATENCY_WINDOW расчетов) - report() в конце прогона.
+"""
+import atexit
+import multiprocessing
+import time
+from collections import Counter, deque
+from functools import wraps
+
+import numpy as np
+
+SIM_TIMEOUT_S = 10.0  # Дедлайн одного расчета, с
+SIM_RETRIES = 2       # Повторы после зависания/падения исполнителя
+FAILURE_PENALTY = 1e12
+LATENCY_WINDOW = 10000  # Перцентили задержки - по последним N расчетам (память не растет)
+
+
+class SimFailure:
+    """Результат несостоявшегося расчета: kind - 'timeout', 'crash' или 'error'"""
+    def __init__(self, kind, message='', attempts=1):
+        self.kind, self.message, self.attempts = kind, message, attempts
+
+    def __repr__(self):
+        return f"SimFailure({self.kind!r}, {self.message!r}, attempts={self.attempts})"
+
+    def __str__(self):
+        return f"сбой симуляции ({self.kind}{': ' + self.message if self.message else ''})"
+
+    def __format__(self, spec):
+        # f"{gain:.2f} dB" в отчетах скриптов печатает причину вместо TypeError
+        return str(self)
+
+
+def is_failure(value):
+    return isinstance(value, SimFailure)
+
+
+def _worker_loop(conn, func):
+    # Процесс-исполнитель: (args, kwargs) -> ('ok', значение) | ('error', текст); None - выход
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            return
+        if job is None:
+            return
+        args, kwargs = job
+        try:
+            reply = ('ok', func(*args, **kwargs))
+        except Exception as exc:
+            reply = ('error', f'{type(exc).__name__}: {exc}')
+        try:
+            conn.send(reply)
+        except Exception as exc:  # Непиклуемый результат
+            conn.send(('error', f'{type(exc).__name__}: {exc}'))
+
+
+def _context():
+    # fork: функция симуляции из __main__ скрипта не обязана пиклиться
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+
+
+class Watchdog:
+    """
+    Исполнитель одной функции симуляции в отдельном процессе с дедлайном и повторами.
+    retry_errors=True - повторять и исключения симулятора (по умолчанию только зависание/падение).
+    """
+    def __init__(self, timeout=SIM_TIMEOUT_S, retries=SIM_RETRIES, retry_errors=False):
+        self.timeout, self.retries, self.retry_errors = timeout, retries, retry_errors
+        self.calls = 0
+        self.failures = Counter()   # Итоговые сбои по типу
+        self.incidents = Counter()  # Все попытки со сбоем, включая повторенные
+        self.retried = 0
+        self.spawns = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)  # Время расчета с повторами, с
+        self._workers = {}          # func -> (процесс, канал)
+        atexit.register(self.close)
+
+    def _worker(self, func):
+        if func not in self._workers:
+            ctx = _context()
+            parent, child = ctx.Pipe()
+            # Демон умирает вместе с оптимизатором; из процесса-демона (пул) детей-демонов создавать нельзя
+            proc = ctx.Process(target=_worker_loop, args=(child, func), daemon=not ctx.current_process().daemon)
+            proc.start()
+            child.close()
+            self._workers[func] = (proc, parent)
+            self.spawns += 1
+        return self._workers[func]
+
+    def _kill(self, func):
+        proc, conn = self._workers.pop(func)
+        conn.close()
+        proc.terminate()
+        proc.join(1.0)
+        if proc.is_alive():
+            proc.kill()
+            proc.join()
+
+    def _attempt(self, func, args, kwargs):
+        proc, conn = self._worker(func)
+        try:
+            conn.send((args, kwargs))
+            if conn.poll(self.timeout):
+                return conn.recv()
+            kind, message = 'timeout', f'нет ответа за {self.timeout:g} с'
+        except (EOFError, OSError, BrokenPipeError):
+            # Канал уже закрыт, но процесс может еще не завершиться: без join exitcode - None
+            proc.join(self.timeout)
+            kind, message = 'crash', f'исполнитель завершился (код {proc.exitcode})'
+        # Зависший или упавший исполнитель не переиспользуется
+        self._kill(func)
+        return kind, message
+
+    def run(self, func, *args, **kwargs):
+        """Один расчет func(*args, **kwargs) -> значение или SimFailure"""
+        self.calls += 1
+        t0 = time.perf_counter()
+        for attempt in range(1, self.retries + 2):
+            status, value = self._attempt(func, args, kwargs)
+            if status == 'ok':
+                break
+            self.incidents[status] += 1
+            if attempt > self.retries or (status == 'error' and not self.retry_errors):
+                value = SimFailure(status, value, attempt)
+                self.failures[status] += 1
+                break
+            self.retried += 1
+        self.latencies.append(time.perf_counter() - t0)
+        return value
+
+    def wrap(self, simulate, inline=('full_scan',)):
+        """
+        Изолированная версия simulate(params, ...). Вызовы с истинным флагом из inline
+        (свип для графика: объект анализа PySpice не передается между процессами)
+        идут в текущем процессе как раньше.
+        """
+        @wraps(simulate)
+        def guarded(*args, **kwargs):
+            if any(kwargs.get(name) for name in inline):
+                return simulate(*args, **kwargs)
+            return self.run(simulate, *args, **kwargs)
+
+        guarded.watchdog = self
+        return guarded
+
+    def close(self):
+        for func in list(self._workers):
+            proc, conn = self._workers[func]
+            try:
+                conn.send(None)
+            except (OSError, BrokenPipeError):
+                pass
+            proc.join(1.0)
+            if proc.is_alive():
+                self._kill(func)
+            else:
+                self._workers.pop(func)
+                conn.close()
+
+    def stats(self):
+        lat = np.array(self.latencies) * 1e3
+        pct = dict(zip(('p50_ms', 'p95_ms', 'p99_ms', 'max_ms'),
+                       np.percentile(lat, [50, 95, 99, 100]).tolist() if len(lat) else [0.0] * 4))
+        return {'calls': self.calls, 'failures': dict(self.failures), 'incidents': dict(self.incidents),
+                'retried': self.retried, 'spawns': self.spawns, **pct}
+
+    def report(self):
+        """Строка итогов для конца прогона"""
+        s = self.stats()
+        failed = sum(self.failures.values())
+        kinds = ', '.join(f'{k} {v}' for k, v in sorted(self.failures.items()))
+        return (f"Симуляций {s['calls']}, сбоев {failed}" + (f" ({kinds})" if kinds else '')
+                + f", повторов {s['retried']}, запусков исполнителя {s['spawns']}; "
+                f"задержка p50 {s['p50_ms']:.1f} / p95 {s['p95_ms']:.1f} / p99 {s['p99_ms']:.1f} / max {s['max_ms']:.1f} мс")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Пакет emc_power и скрипты лежат в корне emc-power (без установки)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,15 @@
+from emc_power.api import optimize, simulate
+from emc_power.corners import v5_worst_corner
+
+ESL = 3e-9
+CORNERS = {'k': (0.99, 0.998)}
+
+
+def test_reported_figures_use_the_optimized_parasitic_model():
+    design = optimize(method='nelder-mead', esl=ESL, corners=CORNERS)
+    as_built = [design['cx_uF'], design['lcm_mH'], design['cy_nF']]
+    assert design['dm_db'] == simulate(as_built, 'DM', 150e3, esl=ESL)
+    assert design['cm_db'] == simulate(as_built, 'CM', 150e3, esl=ESL)
+    assert design['dm_db'] != simulate(as_built, 'DM', 150e3)
+    worst = v5_worst_corner(as_built, CORNERS, esl=ESL)
+    assert design['worst_corner']['dm_db'] == worst['dm_db'] and design['worst_corner']['cm_db'] == worst['cm_db']
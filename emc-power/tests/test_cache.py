@@ -0,0 +1,78 @@
+import numpy as np
+
+from emc_power.cache import EvaluationCache
+from emc_power.watchdog import SimFailure
+
+
+def counted(result=lambda params: float(sum(params))):
+    calls = []
+
+    def simulate(params, mode='DM', frequencies=None):
+        calls.append(list(params))
+        return result(params)
+
+    return simulate, calls
+
+
+def test_key_quantizes_params_and_hashes_grid():
+    cache = EvaluationCache(digits=6)
+    base = cache.key([4.7, 24.0, 24.0], {'dcr_ohm': 0.05}, mode='DM')
+    assert cache.key([4.7 + 1e-9, 24.0, 24.0], {'dcr_ohm': 0.05}, mode='DM') == base
+    assert cache.key([4.71, 24.0, 24.0], {'dcr_ohm': 0.05}, mode='DM') != base
+    assert cache.key([4.7, 24.0, 24.0], {'dcr_ohm': 0.06}, mode='DM') != base
+    assert cache.key([4.7, 24.0, 24.0], {'dcr_ohm': 0.05}, mode='CM') != base
+    grid = np.logspace(4, 7, 50)
+    assert (cache.key([1.0], frequencies=grid) == cache.key([1.0], frequencies=list(grid))
+            != cache.key([1.0], frequencies=grid * 1.01))
+
+
+def test_wrap_hits_on_equivalent_calls():
+    cache = EvaluationCache()
+    simulate, calls = counted()
+    f = cache.wrap(simulate, model={'topology': 'v5'})
+    assert f([1.0, 2.0, 3.0]) == f([1.0, 2.0, 3.0], 'DM') == f([1.0, 2.0, 3.0], mode='DM') == 6.0
+    f([1.0, 2.0, 3.0], mode='CM')
+    assert len(calls) == 2
+    assert cache.stats()['hits'] == 2
+
+
+def test_callable_model_is_read_at_call_time():
+    # Глобал скрипта (BACKEND, TARGET_FREQ) меняется после обертки - ключ должен смениться
+    settings = {'backend': 'mna', 'target_freq_khz': 150}
+    cache = EvaluationCache()
+    simulate, calls = counted()
+    f = cache.wrap(simulate, model=lambda: dict(settings))
+    f([1.0, 2.0, 3.0])
+    settings['target_freq_khz'] = 500
+    f([1.0, 2.0, 3.0])
+    settings['backend'] = 'session'
+    f([1.0, 2.0, 3.0])
+    assert len(calls) == 3
+    settings.update(backend='mna', target_freq_khz=150)
+    f([1.0, 2.0, 3.0])
+    assert len(calls) == 3
+
+
+def test_arrays_are_copied_and_failures_not_stored():
+    cache = EvaluationCache()
+    simulate, calls = counted(lambda params: np.ones(4))
+    f = cache.wrap(simulate)
+    f([1.0], frequencies=np.arange(4.0))[:] = 0
+    assert np.all(f([1.0], frequencies=np.arange(4.0)) == 1)
+
+    failing, failed = counted(lambda params: SimFailure('timeout'))
+    g = cache.wrap(failing)
+    assert isinstance(g([1.0]), SimFailure) and isinstance(g([1.0]), SimFailure)
+    assert len(failed) == 2 and cache.stats()['size'] == 1
+
+
+def test_sqlite_survives_restart(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    first = EvaluationCache(path=path)
+    simulate, calls = counted()
+    first.wrap(simulate)([2.0, 3.0])
+    first.close()
+    second = EvaluationCache(path=path)
+    assert second.wrap(simulate)([2.0, 3.0]) == 5.0
+    assert len(calls) == 1 and second.stats()['disk_hits'] == 1
+    second.close()
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from emc_power.catalog import catalog_search, demo_catalog, part_excess, part_values
+
+V5_OPTIMUM = [4.7, 24.0, 24.0]  # Непрерывный оптимум V5 (uF, mH, nF)
+
+
+@pytest.fixture(scope='module')
+def catalog():
+    return demo_catalog()
+
+
+def test_nearest_counts_distinct_values(catalog):
+    rows = catalog.nearest('choke', 24e-3, count=3, min_current=10.0)
+    values = catalog['value'][rows]
+    assert len(np.unique(values)) == 3
+    assert set(np.round(values * 1e3, 6)) == {22.0, 27.0, 18.0}
+    assert np.all(catalog['rated_current_a'][rows] >= 10.0)
+
+
+@pytest.mark.parametrize('load_current_a', [10.0, 3.0])
+def test_search_finds_feasible_design_near_v5_optimum(catalog, load_current_a):
+    rows, checked = catalog_search(V5_OPTIMUM, catalog, load_current_a)
+    assert rows is not None and checked > 0
+    assert catalog['rated_current_a'][rows[1]] >= load_current_a
+    assert part_excess(catalog, rows[None])[0] <= 0
+    params, _ = part_values(catalog, rows)
+    assert 230 * 2 * np.pi * 50 * params[0, 2] * 1e-9 * 1000 <= 3.5
+
+
+def test_search_memory_bounded_for_wide_neighbourhood(catalog):
+    rows, _ = catalog_search(V5_OPTIMUM, catalog, 10.0, counts=(200, 400))
+    assert rows is not None
@@ -0,0 +1,34 @@
+import json
+
+from emc_power.jobs import read_jobs, run_jobs
+
+
+def records(path):
+    with open(path, encoding='utf-8') as fh:
+        return sorted((json.loads(line) for line in fh), key=lambda r: r['index'])
+
+
+def test_bad_csv_cell_fails_only_its_job(tmp_path):
+    source = tmp_path / 'jobs.csv'
+    source.write_text('id,target_db,series\na,-60,E24\nb,abc,E24\nc,,E12\n', encoding='utf-8')
+    jobs = list(read_jobs(str(source)))
+    assert [index for index, _ in jobs] == [0, 1, 2]
+    assert jobs[2][1] == {'id': 'c', 'series': 'E12'}
+
+    out = tmp_path / 'out.jsonl'
+    assert run_jobs(str(source), str(out), workers=1) == (3, 0)
+    status = {r['id']: (r['status'], r['error']) for r in records(out)}
+    assert status['a'] == status['c'] == ('ok', None)
+    assert status['b'][0] == 'error' and 'target_db' in status['b'][1]
+
+
+def test_malformed_jsonl_lines_and_resume(tmp_path):
+    source = tmp_path / 'jobs.jsonl'
+    source.write_text('{"id": "x", "target_db": -60}\n{bad\n[1]\n\n{"id": "y", "colour": 1}\n', encoding='utf-8')
+    out, ckpt = tmp_path / 'out.jsonl', tmp_path / 'jobs.ckpt'
+    assert run_jobs(str(source), str(out), checkpoint=str(ckpt), workers=2) == (4, 0)
+    got = records(out)
+    assert [r['status'] for r in got] == ['ok', 'error', 'error', 'error']
+    assert 'colour' in got[3]['error']
+    # Повторный запуск с той же контрольной точкой ничего не пересчитывает
+    assert run_jobs(str(source), str(out), checkpoint=str(ckpt), workers=1) == (0, 4)
@@ -0,0 +1,29 @@
+import numpy as np
+
+from emc_power.circuits import v5_gain_db
+from emc_power.mask import LimitMask, adaptive_sweep, cispr_style_mask, worst_margin
+
+
+def test_sweep_checks_both_band_edges():
+    mask = cispr_style_mask(-60)
+    freqs, gains = adaptive_sweep(lambda f: np.zeros_like(f), *mask.band, mask=mask)
+    assert np.isclose(freqs[0], 150e3) and np.isclose(freqs[-1], 30e6)
+    assert np.all(np.isfinite(mask(freqs)))
+    # Ровная АЧХ 0 дБ: худший запас - на самом строгом краю (150 кГц, -60 дБ)
+    assert worst_margin(freqs, gains, mask) == 60
+
+
+def test_violation_at_top_edge_is_reported():
+    mask = LimitMask([(1e6, 0.0), (30e6, -20.0)])
+    freqs, gains = adaptive_sweep(lambda f: np.zeros_like(f), *mask.band, mask=mask)
+    assert worst_margin(freqs, gains, mask) == 20
+
+
+def test_sweep_refines_resonance_for_batch():
+    mask = cispr_style_mask(-60)
+    designs = np.array([[4.7, 24.0, 24.0], [2.2, 33.0, 18.0]])
+    freqs, gains = adaptive_sweep(lambda f: v5_gain_db(designs, 'DM', f, esl=3e-9), *mask.band, mask=mask)
+    assert gains.shape == (2, len(freqs)) and np.all(np.diff(freqs) > 0)
+    dense = np.logspace(np.log10(150e3), np.log10(30e6), 4000)
+    exact = worst_margin(dense, v5_gain_db(designs, 'DM', dense, esl=3e-9), mask)
+    np.testing.assert_allclose(worst_margin(freqs, gains, mask), exact, atol=0.5)
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from emc_power.circuits import V5_COUPLING, V5_DCR_OHM, V5_R_LOAD, V5_R_SOURCE, v5_response
+from emc_power.mna import Netlist
+
+FREQS = np.logspace(4, 7.5, 60)
+DESIGNS = [[4.7, 24.0, 24.0], [2.2, 33.0, 18.0], [10.0, 1.5, 4.7]]
+
+
+def nodal_v5(params, mode, freqs, r_source=V5_R_SOURCE, r_load=V5_R_LOAD, k=V5_COUPLING, dcr=V5_DCR_OHM):
+    """
+    Эталон без MNA: чисто узловой анализ V5. Источник с Rs - эквивалент Нортона,
+    связанные индуктивности - через обратную матрицу индуктивностей (без токов ветвей).
+    """
+    cx, lcm, cy = params[0] * 1e-6, params[1] * 1e-3, params[2] * 1e-9
+    n1p, n1n, n2p, n2n, n3p, n3n = range(6)
+    gamma = np.linalg.inv([[lcm, k * lcm], [k * lcm, lcm]])
+    inc = np.zeros((6, 2))
+    inc[n1p, 0], inc[n2p, 0], inc[n1n, 1], inc[n2n, 1] = 1, -1, 1, -1
+    out = []
+    for f in freqs:
+        jw = 2j * np.pi * f
+        y = np.zeros((6, 6), dtype=complex)
+        i = np.zeros(6, dtype=complex)
+
+        def admit(a, b, g):
+            y[a, a] += g
+            if b is not None:
+                y[b, b] += g
+                y[a, b] -= g
+                y[b, a] -= g
+
+        if mode == 'DM':
+            # 1 В между n_in_p/n_in_n через Rs1 + Rs2
+            admit(n1p, n1n, 1 / (2 * r_source))
+            i[n1p], i[n1n] = 1 / (2 * r_source), -1 / (2 * r_source)
+        else:
+            admit(n1p, None, 1 / r_source)
+            admit(n1n, None, 1 / r_source)
+            i[n1p] = i[n1n] = 1 / r_source
+        admit(n1p, n1n, jw * cx)
+        y += inc @ (gamma / jw) @ inc.T
+        admit(n2p, n3p, 1 / dcr)
+        admit(n2n, n3n, 1 / dcr)
+        admit(n3p, None, jw * cy)
+        admit(n3n, None, jw * cy)
+        admit(n3p, n3n, 1 / r_load)
+        v = np.linalg.solve(y, i)
+        out.append(v[n3p] - v[n3n] if mode == 'DM' else v[n3p])
+    return np.array(out)
+
+
+@pytest.mark.parametrize('mode', ['DM', 'CM'])
+@pytest.mark.parametrize('params', DESIGNS)
+def test_v5_matches_reference_nodal_solve(params, mode):
+    np.testing.assert_allclose(v5_response(params, mode, FREQS), nodal_v5(params, mode, FREQS), rtol=1e-9, atol=1e-15)
+
+
+def test_v5_model_constants_and_batch():
+    model = {'r_source': 10.0, 'r_load': 100.0, 'k': 0.99, 'dcr': 0.2}
+    batch = v5_response(np.array(DESIGNS), 'DM', FREQS, **model)
+    assert batch.shape == (len(DESIGNS), len(FREQS))
+    for row, params in zip(batch, DESIGNS):
+        np.testing.assert_allclose(row, nodal_v5(params, 'DM', FREQS, **model), rtol=1e-9, atol=1e-15)
+
+
+def test_rc_lowpass_is_analytic():
+    circuit = Netlist('rc')
+    circuit.V('in', 'a', circuit.gnd)
+    circuit.R('1', 'a', 'b', 1e3)
+    circuit.C('1', 'b', circuit.gnd, 1e-9)
+    c = np.array([1e-9, 2e-9])
+    res = circuit.compile().solve(FREQS, {'C1': c})
+    jwc = 2j * np.pi * FREQS * c[:, None]
+    np.testing.assert_allclose(res.b, 1 / (1 + 1e3 * jwc), rtol=1e-12)
+    np.testing.assert_allclose(np.abs(res.branch('Vin')), np.abs(1 / (1e3 + 1 / jwc)), rtol=1e-12)
@@ -0,0 +1,27 @@
+import numpy as np
+
+from emc_power.api import attenuation, simulate
+from emc_power.mask import LimitMask, cispr_style_mask
+from emc_power.rom import FilterRom, fit_v5_rom
+
+DESIGN = [4.7, 22.0, 22.0]
+
+
+def test_rom_reproduces_sweep_and_round_trips():
+    rom = fit_v5_rom(DESIGN, esl=3e-9)
+    freqs = np.logspace(4, np.log10(30e6), 300)
+    for mode in ('DM', 'CM'):
+        np.testing.assert_allclose(rom.gain_db(freqs, mode), simulate(DESIGN, mode, freqs, esl=3e-9), atol=0.05)
+    again = FilterRom.from_dict(rom.to_dict())
+    assert attenuation({'rom': rom.to_dict()}, 150e3) == float(again.gain_db(150e3, 'DM'))
+
+
+def test_margin_checks_both_band_edges():
+    rom = fit_v5_rom(DESIGN)
+    mask = cispr_style_mask(-60)
+    dense = np.clip(np.logspace(np.log10(150e3), np.log10(30e6), 5000), 150e3, 30e6)
+    exact = np.max(np.maximum(simulate(DESIGN, 'DM', dense), simulate(DESIGN, 'CM', dense)) - mask(dense))
+    assert abs(rom.margin(mask) - exact) < 0.05
+    # Маска, строгая только в самой верхней точке полосы
+    edge = LimitMask([(150e3, 0.0), (29.9e6, 0.0), (30e6, -400.0)])
+    assert rom.margin(edge) > 100
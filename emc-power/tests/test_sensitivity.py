@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from emc_power.circuits import v5_gain_db, v5_gain_db_grad, v5_template, v5_values
+from emc_power.constrained import v5_constrained_minimize
+from emc_power.objective import leakage_ma
+
+FREQS = np.logspace(np.log10(150e3), np.log10(30e6), 25)
+DESIGNS = [[4.7, 24.0, 24.0], [2.2, 33.0, 18.0], [10.0, 1.5, 4.7]]
+
+
+def central_difference(params, mode, model, rel=1e-4):
+    grad = []
+    for i in range(3):
+        step = np.zeros(3)
+        step[i] = rel * params[i]
+        up = v5_gain_db(np.add(params, step), mode, FREQS, **model)
+        down = v5_gain_db(np.subtract(params, step), mode, FREQS, **model)
+        grad.append((up - down) / (2 * step[i]))
+    return np.stack(grad, axis=-1)
+
+
+@pytest.mark.parametrize('model', [{}, {'esl': 3e-9}, {'k': 0.99, 'dcr': 0.2}], ids=['ideal', 'esl', 'model'])
+@pytest.mark.parametrize('mode', ['DM', 'CM'])
+@pytest.mark.parametrize('params', DESIGNS)
+def test_v5_gradient_matches_finite_differences(params, mode, model):
+    gain, grad = v5_gain_db_grad(params, mode, FREQS, **model)
+    np.testing.assert_allclose(gain, v5_gain_db(params, mode, FREQS, **model))
+    assert grad.shape == (len(FREQS), 3)
+    fd = central_difference(params, mode, model)
+    # Около нулей производной - абсолютный допуск по масштабу; 1e-15 в v5_gain_db дает ~1e-6 на -180 дБ
+    np.testing.assert_allclose(grad, fd, rtol=1e-3, atol=1e-4 * np.abs(fd).max())
+
+
+def test_element_sensitivities_include_resistors_and_coupling():
+    tpl = v5_template('DM')
+    values = v5_values([4.7, 24.0, 24.0])
+    names = ['Rrs1', 'Rdcr1', 'Rload', 'Kk_core']
+    _, dx = tpl.solve_sensitivity(FREQS, values, names)
+    out = [tpl.nodes['n3_p'], tpl.nodes['n3_n']]
+    for name in names:
+        h = values[name] * 1e-5
+        up, down = dict(values), dict(values)
+        up[name], down[name] = values[name] + h, values[name] - h
+        fd = (tpl.solve(FREQS, up).x - tpl.solve(FREQS, down).x)[:, out] / (2 * h)
+        np.testing.assert_allclose(dx[name][:, out], fd, rtol=1e-3, atol=1e-4 * np.abs(fd).max())
+
+
+def test_slsqp_reaches_a_feasible_design():
+    res = v5_constrained_minimize([1.0, 10.0, 10.0])
+    assert res.success and res.margin_db >= -1e-3
+    assert np.all(v5_gain_db(res.x, 'DM', 150e3) <= -60 + 1e-3)
+    assert np.all(v5_gain_db(res.x, 'CM', 150e3) <= -60 + 1e-3)
+    assert leakage_ma(res.x[2]) <= 3.5 + 1e-6
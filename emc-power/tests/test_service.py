@@ -0,0 +1,64 @@
+import asyncio
+import threading
+
+import pytest
+
+from emc_power.service import EmcService, call
+
+
+@pytest.fixture(scope='module')
+def port():
+    # Сервис на localhost (порт выбирает ОС) в отдельном потоке с собственным циклом событий
+    loop = asyncio.new_event_loop()
+    service = EmcService(workers=1)
+    address = loop.run_until_complete(service.start('127.0.0.1', 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield address[1]
+    asyncio.run_coroutine_threadsafe(service.close(), loop).result(30)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+
+
+def test_optimize_round_trip(port):
+    reply = call('/optimize', {'target_db': -60}, port=port)
+    assert reply['status'] == 'ok'
+    design = reply['result']
+    assert design['feasible'] and max(design['dm_db'], design['cm_db']) <= -60
+
+
+def test_sweep_and_bad_params(port):
+    reply = call('/sweep', {'params': [4.7, 22, 22], 'points': 50}, port=port)
+    assert reply['status'] == 'ok' and len(reply['result']['dm_db']) == 50
+    reply = call('/sweep', {'params': [1, 2]}, port=port)
+    assert reply['status'] == 'error'
+
+
+def test_batch_streams_every_request(port):
+    requests = [{'kind': 'verify', 'params': {'params': [4.7, 22, 22]}, 'id': 'a'},
+                {'kind': 'bogus', 'id': 'b'},
+                {'kind': 'sweep', 'params': {'params': [4.7, 22, 22], 'points': 10}, 'id': 'c'}]
+    lines = {line['id']: line for line in call('/batch', {'requests': requests}, port=port)}
+    assert set(lines) == {'a', 'b', 'c'}
+    assert lines['a']['status'] == 'ok' and lines['c']['status'] == 'ok'
+    assert lines['b']['status'] == 'error'
+
+
+@pytest.mark.parametrize('payload', [{'requests': [1, 'x']}, {'requests': {}}, [1, 2]])
+def test_malformed_batch_is_400(port, payload):
+    reply = call('/batch', payload, port=port)
+    assert 'error' in reply
+
+
+def test_health(port):
+    assert call('/health', port=port)['workers'] == 1
+
+
+def test_verify_uses_requested_esl(port):
+    from emc_power.api import simulate
+
+    reply = call('/verify', {'params': [4.7, 22, 22], 'esl': 3e-9, 'mask': True}, port=port)
+    assert reply['status'] == 'ok'
+    result = reply['result']
+    assert result['dm_db'] == simulate([4.7, 22, 22], 'DM', 150e3, esl=3e-9)
+    assert result['cm_db'] == simulate([4.7, 22, 22], 'CM', 150e3, esl=3e-9)
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+import emc_power.sparse as sparse
+from emc_power.circuits import build_v5_board, build_v5_filter, v5_values
+from emc_power.corners import Impedance
+from emc_power.mna import CompiledNetlist
+from emc_power.sparse import SparseCompiledNetlist
+
+FREQS = np.logspace(4, np.log10(30e6), 60)
+DESIGNS = np.array([[4.7, 24.0, 24.0], [2.2, 33.0, 18.0], [10.0, 1.5, 4.7]])
+
+
+def both(netlist):
+    return netlist.compile(sparse=True), netlist.compile(sparse=False)
+
+
+def assert_same(a, b, rtol=1e-8):
+    # Малые токи/напряжения глубоко в полосе заграждения - по масштабу решения
+    np.testing.assert_allclose(a.x, b.x, rtol=rtol, atol=rtol * np.abs(b.x).max())
+
+
+def test_compile_picks_solver_by_size():
+    assert isinstance(build_v5_filter().compile(), CompiledNetlist)
+    assert isinstance(build_v5_board().compile(), SparseCompiledNetlist)
+
+
+@pytest.mark.parametrize('mode', ['DM', 'CM'])
+def test_board_sparse_matches_dense(mode):
+    fast, dense = both(build_v5_board(mode))
+    values = v5_values(DESIGNS, esl=3e-9)
+    res = fast.solve(FREQS, values)
+    assert res.x.shape == (len(DESIGNS), len(FREQS), fast.size)
+    assert_same(res, dense.solve(FREQS, values))
+    # Новые номиналы - только перештамповка данных в том же шаблоне
+    values = v5_values(DESIGNS[::-1] * 1.3, k=0.99, dcr=0.1)
+    assert_same(fast.solve(FREQS, values), dense.solve(FREQS, values))
+
+
+def test_complex_impedances_sparse_matches_dense():
+    fast, dense = both(build_v5_filter('CM', cap_parasitics=True, impedances=True))
+    values = {k: v for k, v in v5_values(DESIGNS[0], esl=3e-9).items() if k not in ('Rrs1', 'Rrs2', 'Rload')}
+    lisn = Impedance(50.0, l=50e-6, parallel=True)
+    motor = Impedance(10.0, l=2e-3)
+    values.update({'Zrs1': lisn(FREQS), 'Zrs2': lisn(FREQS), 'Zload': motor(FREQS)})
+    assert_same(fast.solve(FREQS, values), dense.solve(FREQS, values))
+
+
+def test_splu_fallback_gives_same_result(monkeypatch):
+    fast, dense = both(build_v5_board('DM', segments=3))
+    values = v5_values(DESIGNS, esl=3e-9)
+    monkeypatch.setattr(sparse, 'RESIDUAL_TOL', -1.0)  # Каждая точка идет через splu
+    res = fast.solve(FREQS[::5], values)
+    assert fast.fallbacks == len(DESIGNS) * len(FREQS[::5])
+    assert_same(res, dense.solve(FREQS[::5], values))
@@ -0,0 +1,79 @@
+import os
+import time
+
+import pytest
+
+from emc_power.watchdog import SimFailure, Watchdog, is_failure
+
+
+# Функции уровня модуля: исполнитель может стартовать и через spawn
+def square(x):
+    return x * x
+
+
+def hang(x):
+    time.sleep(60)
+
+
+def crash(x):
+    os._exit(3)
+
+
+def diverge(x):
+    raise RuntimeError('нет сходимости')
+
+
+@pytest.fixture
+def watchdog():
+    wd = Watchdog(timeout=0.5, retries=1)
+    yield wd
+    wd.close()
+
+
+def test_result_passes_through_and_worker_is_reused(watchdog):
+    assert [watchdog.run(square, x) for x in (2, 3)] == [4, 9]
+    assert watchdog.spawns == 1 and not watchdog.failures
+
+
+def test_timeout_kills_retries_and_fails(watchdog):
+    t0 = time.perf_counter()
+    value = watchdog.run(hang, 1)
+    assert is_failure(value) and value.kind == 'timeout' and value.attempts == 2
+    assert time.perf_counter() - t0 < 5
+    assert watchdog.incidents['timeout'] == 2 and watchdog.retried == 1 and watchdog.spawns == 2
+    # После сбоя новый исполнитель работает как обычно
+    assert watchdog.run(square, 4) == 16
+
+
+def test_crash_reports_exit_code(watchdog):
+    value = watchdog.run(crash, 1)
+    assert isinstance(value, SimFailure) and value.kind == 'crash'
+    assert 'код 3' in value.message
+    assert watchdog.failures['crash'] == 1 and watchdog.spawns == 2
+
+
+def test_simulator_error_is_not_retried(watchdog):
+    value = watchdog.run(diverge, 1)
+    assert value.kind == 'error' and value.attempts == 1 and 'нет сходимости' in value.message
+    assert f'{value:.2f}'.startswith('сбой симуляции')
+
+
+def test_wrap_keeps_full_scan_inline(watchdog):
+    guarded = watchdog.wrap(lambda params, full_scan=False: (os.getpid(), params))
+    assert guarded(1, full_scan=True) == (os.getpid(), 1)
+    assert guarded(1)[0] != os.getpid()
+    assert watchdog.stats()['calls'] == 1
+
+
+def test_latency_window_is_bounded(monkeypatch):
+    import emc_power.watchdog as watchdog_module
+    monkeypatch.setattr(watchdog_module, 'LATENCY_WINDOW', 5)
+    wd = Watchdog(timeout=0.5)
+    try:
+        for x in range(12):
+            wd.run(square, x)
+        stats = wd.stats()
+        assert len(wd.latencies) == 5 and stats['calls'] == 12
+        assert 0 < stats['p50_ms'] <= stats['max_ms']
+    finally:
+        wd.close()